@@ -0,0 +1,119 @@
+"""
+Benchmark du modèle prédictif sur un jeu de données à vérité terrain
+Données : python etl/generate_data.py --profil realiste --output-dir data/realiste [--transactions N]
+Mesure le débit de train_all_accounts (préparation, entraînement, prévision) puis l'erreur des prévisions sur
+l'horizon, par rapport au flux net quotidien réalisé et attendu de verite_terrain (convertis en EUR)
+Tout est au grain de la vérité terrain : le modèle est entraîné sur le flux net quotidien de chaque compte
+(jours sans flux à zéro) et non sur les transactions, et les trois prévisions sont notées sur les mêmes
+cellules compte × jour de l'horizon
+Référence naïve : flux net quotidien moyen de l'historique de chaque compte
+Usage : python benchmarks/bench_forecast.py --data-dir data/realiste [--workers 4]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cresus.fx_rates import FxRateTable  # noqa: E402
+from cresus.model import MODEL_WORKERS, TRAINING_COLUMNS, train_all_accounts  # noqa: E402
+from cresus.streaming import read_fact_source, resolve_fact_source  # noqa: E402
+from cresus.transformations import transform_fact_flux_tresorerie  # noqa: E402
+
+
+def read_truth(data_dir):
+    """Vérité terrain : répertoire de parts verite_terrain/ ou fichier verite_terrain.csv / .parquet"""
+    for candidate in (data_dir / "verite_terrain", data_dir / "verite_terrain.csv",
+                      data_dir / "verite_terrain.parquet"):
+        if candidate.exists():
+            truth = read_fact_source(candidate)
+            truth["date_operation"] = pd.to_datetime(truth["date_operation"])
+            return truth
+    raise FileNotFoundError(f"Vérité terrain absente de {data_dir} (generate_data.py --profil realiste)")
+
+
+def truth_in_eur(truth, df_compte, df_devise, fx_table):
+    """Flux attendus et réalisés convertis en EUR (devise du compte, taux du jour ou dernier taux connu)"""
+    codes = truth["id_compte"].map(df_compte.set_index("id_compte")["id_devise"]).map(
+        df_devise.set_index("id_devise")["code_iso"]
+    )
+    truth = truth.copy()
+    for column in ("flux_attendu", "flux_realise"):
+        truth[column] = fx_table.convert(truth[column], truth["date_operation"], codes.to_numpy())
+    return truth
+
+
+def daily_net_history(historique, truth):
+    """
+    Historique au grain de la vérité terrain : flux net quotidien réalisé par compte, une ligne par
+    cellule compte × jour de la période (hors horizon), jours sans flux à zéro
+    """
+    historique = historique.assign(date_operation=pd.to_datetime(historique["date_operation"]))
+    flux = historique.groupby(["date_operation", "id_compte"], as_index=False)["montant_consolide_eur"].sum()
+    cellules = truth.loc[~truth["horizon"], ["date_operation", "id_compte"]]
+    daily = cellules.merge(flux, on=["date_operation", "id_compte"], how="left")
+    daily["montant_consolide_eur"] = daily["montant_consolide_eur"].fillna(0.0)
+    return daily[TRAINING_COLUMNS]
+
+
+def errors(prevu, reel):
+    """MAE et WAPE (somme des écarts absolus / somme des valeurs absolues réelles)"""
+    ecarts = np.abs(np.asarray(prevu) - np.asarray(reel))
+    return ecarts.mean(), ecarts.sum() / max(np.abs(reel).sum(), 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du modèle prédictif (débit et erreur)")
+    parser.add_argument("--data-dir", type=Path, default=Path("data/realiste"),
+                        help="Répertoire généré avec --profil realiste")
+    parser.add_argument("--workers", type=int, default=MODEL_WORKERS, help="Processus d'entraînement")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"Benchmark modèle prédictif ({args.data_dir})")
+    print("=" * 60)
+
+    df_compte = pd.read_csv(args.data_dir / "dim_compte.csv")
+    df_devise = pd.read_csv(args.data_dir / "dim_devise.csv")
+    fx_table = FxRateTable.from_dataframe(pd.read_csv(args.data_dir / "taux_de_change.csv"))
+    df_fact = transform_fact_flux_tresorerie(
+        read_fact_source(resolve_fact_source(args.data_dir)), df_compte, df_devise, fx_table
+    )
+    historique = df_fact.loc[df_fact["statut"] == "Réalisé", TRAINING_COLUMNS].dropna()
+    truth = truth_in_eur(read_truth(args.data_dir), df_compte, df_devise, fx_table)
+    daily = daily_net_history(historique, truth)
+
+    # Débit : préparation des features, entraînement parallèle et prévision groupée
+    start = time.perf_counter()
+    forecasts, nb_comptes, erreurs = train_all_accounts(daily, workers=args.workers)
+    duree = time.perf_counter() - start
+    print(f"✓ {len(historique):,} flux ({len(daily):,} jours × compte), {nb_comptes} comptes entraînés "
+          f"({len(erreurs)} en échec) en {duree:.2f} s : {len(daily) / duree:,.0f} lignes/s, "
+          f"{nb_comptes / duree:,.1f} comptes/s")
+
+    # Erreur sur l'horizon : cellules compte × jour postérieures à la période et prévues par le modèle,
+    # communes aux trois prévisions
+    horizon = truth[truth["horizon"]]
+    compare = horizon.merge(forecasts, on=["date_operation", "id_compte"], how="inner")
+    moyennes = daily.groupby("id_compte")["montant_consolide_eur"].mean()
+    print(f"Horizon : {len(compare):,} cellules notées sur {len(horizon):,} "
+          f"({(compare['flux_realise'] == 0).mean():.0%} sans flux réalisé)")
+
+    print(f"{'prévision':<28} | {'MAE réalisé':>12} | {'WAPE':>6} | {'MAE attendu':>12}")
+    lignes = [
+        ("modèle (régression)", compare["montant_consolide_eur"]),
+        ("moyenne historique", compare["id_compte"].map(moyennes).fillna(0)),
+        ("flux attendu (oracle)", compare["flux_attendu"]),
+    ]
+    for label, prevu in lignes:
+        mae, wape = errors(prevu, compare["flux_realise"])
+        mae_attendu, _ = errors(prevu, compare["flux_attendu"])
+        print(f"{label:<28} | {mae:>12,.0f} | {wape:>6.2f} | {mae_attendu:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Benchmark des index de FACT_FLUX_TRESORERIE (EXPLAIN ANALYZE)
+Génère un jeu de données dans un schéma dédié (create_tables.sql + partitions mensuelles), mesure les
+requêtes réelles avec les index historiques, applique database/migrations/005_index_requetes.sql puis
+mesure à nouveau. Le schéma est supprimé à la fin (sauf --keep)
+Usage : python benchmarks/bench_indexes.py [--rows 10000000] [--repeat 3]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import psycopg2
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+from cresus.config import DB_CONFIG  # noqa: E402
+from cresus.partitions import ensure_monthly_partitions  # noqa: E402
+
+BENCH_SCHEMA = "bench_index"
+CREATE_TABLES_SQL = ROOT_DIR / "database" / "create_tables.sql"
+MIGRATION_SQL = ROOT_DIR / "database" / "migrations" / "005_index_requetes.sql"
+
+# Période couverte par le jeu de données (comme etl/generate_data.py)
+DATE_DEBUT = "2022-01-01"
+NB_JOURS = 1096
+
+# Index de FACT_FLUX_TRESORERIE avant la migration 005
+BASELINE_INDEXES = [
+    "CREATE INDEX idx_fact_date_operation ON FACT_FLUX_TRESORERIE(date_operation)",
+    "CREATE INDEX idx_fact_statut ON FACT_FLUX_TRESORERIE(statut)",
+    "CREATE INDEX idx_fact_type_operation ON FACT_FLUX_TRESORERIE(type_operation)",
+    "CREATE INDEX idx_fact_id_scenario ON FACT_FLUX_TRESORERIE(id_scenario)",
+]
+
+# Requêtes mesurées : (libellé, requête, écriture annulée après mesure)
+QUERIES = [
+    ("modèle : historique réalisé", """
+        SELECT f.date_operation, f.montant_consolide_eur, f.id_compte, c.id_filiale, t.annee, t.mois, t.jour
+        FROM FACT_FLUX_TRESORERIE f
+        JOIN DIM_COMPTE c ON f.id_compte = c.id_compte
+        JOIN DIM_TEMPS t ON f.id_temps = t.id_temps
+        WHERE f.statut = 'Réalisé' AND f.montant_consolide_eur IS NOT NULL
+        ORDER BY f.date_operation, f.id_compte
+    """, False),
+    ("Power BI : mois par filiale", """
+        SELECT c.id_filiale, f.statut, SUM(f.montant_consolide_eur)
+        FROM FACT_FLUX_TRESORERIE f
+        JOIN DIM_COMPTE c ON f.id_compte = c.id_compte
+        JOIN DIM_TEMPS t ON f.id_temps = t.id_temps
+        WHERE t.annee = 2023 AND t.mois = 6
+        GROUP BY c.id_filiale, f.statut
+    """, False),
+    ("Power BI : détail d'un compte", """
+        SELECT f.date_operation, SUM(f.montant_consolide_eur)
+        FROM FACT_FLUX_TRESORERIE f
+        WHERE f.id_compte = 42 AND f.date_operation BETWEEN '2023-01-01' AND '2023-03-31'
+        GROUP BY f.date_operation
+    """, False),
+    ("Power BI : contrepartie", """
+        SELECT f.type_operation, SUM(f.montant_consolide_eur)
+        FROM FACT_FLUX_TRESORERIE f
+        JOIN DIM_CONTREPARTIE p ON f.id_contrepartie = p.id_contrepartie
+        WHERE p.id_contrepartie = 7
+        GROUP BY f.type_operation
+    """, False),
+    ("période d'une semaine", """
+        SELECT f.statut, COUNT(*), SUM(f.montant_consolide_eur)
+        FROM FACT_FLUX_TRESORERIE f
+        WHERE f.date_operation >= '2024-03-04' AND f.date_operation < '2024-03-11'
+        GROUP BY f.statut
+    """, False),
+    ("insertion de 100 000 flux", f"""
+        INSERT INTO FACT_FLUX_TRESORERIE
+            (date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+             id_compte, id_devise, id_scenario, id_temps, id_contrepartie)
+        SELECT DATE '{DATE_DEBUT}' + (g % {NB_JOURS}), 100, 100, 'virement reçu', 'Réalisé',
+               1 + g % 90, 1, 1, 1 + g % {NB_JOURS}, 1 + g % 44
+        FROM generate_series(1, 100000) g
+    """, True),
+]
+
+
+def create_schema(cursor):
+    """Schéma dédié contenant les tables de create_tables.sql (sans les index de la table de faits)"""
+    cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    # Schéma dédié seul dans le search_path : les DROP TABLE de create_tables.sql ne touchent pas public
+    cursor.execute(f"SET search_path TO {BENCH_SCHEMA}")
+    cursor.execute(CREATE_TABLES_SQL.read_text(encoding="utf-8"))
+    cursor.execute(f"""
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = '{BENCH_SCHEMA}' AND tablename = 'fact_flux_tresorerie'
+          AND indexname NOT IN (SELECT conname FROM pg_constraint)
+    """)
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"DROP INDEX {name}")
+
+
+def generate_data(cursor, num_rows):
+    """Dimensions et faits générés côté serveur (generate_series), triés par date comme un chargement réel"""
+    cursor.execute("INSERT INTO DIM_DEVISE (code_iso) VALUES ('EUR'), ('USD'), ('GBP'), ('CHF')")
+    cursor.execute("INSERT INTO DIM_FILIALE (nom_filiale) SELECT 'Filiale ' || g FROM generate_series(1, 6) g")
+    cursor.execute("INSERT INTO DIM_SCENARIO (nom_scenario) VALUES ('Réalisé'), ('Prévisionnel'), ('Simulation')")
+    cursor.execute("INSERT INTO DIM_CONTREPARTIE (nom_contrepartie) "
+                   "SELECT 'Contrepartie ' || g FROM generate_series(1, 44) g")
+    cursor.execute(f"""
+        INSERT INTO DIM_TEMPS (jour, mois, annee)
+        SELECT EXTRACT(DAY FROM d), EXTRACT(MONTH FROM d), EXTRACT(YEAR FROM d)
+        FROM generate_series(DATE '{DATE_DEBUT}', DATE '{DATE_DEBUT}' + {NB_JOURS - 1}, INTERVAL '1 day') d
+    """)
+    cursor.execute("INSERT INTO DIM_COMPTE (numero_compte, id_devise, id_filiale) "
+                   "SELECT 'FR76' || g, 1 + g % 4, 1 + g % 6 FROM generate_series(0, 89) g")
+
+    ensure_monthly_partitions(cursor, "FACT_FLUX_TRESORERIE",
+                              pd.date_range(DATE_DEBUT, periods=NB_JOURS, freq="D"))
+    cursor.execute(f"""
+        INSERT INTO FACT_FLUX_TRESORERIE
+            (date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+             id_compte, id_devise, id_scenario, id_temps, id_contrepartie)
+        SELECT DATE '{DATE_DEBUT}' + jour, montant, montant,
+               (ARRAY['virement reçu', 'virement émis', 'frais bancaires', 'prélèvement'])[1 + (g % 4)],
+               CASE WHEN random() < 0.9 THEN 'Réalisé' ELSE 'Prévisionnel' END,
+               1 + (random() * 89)::int, 1, 1 + (g % 3), 1 + jour, 1 + (random() * 43)::int
+        FROM (
+            SELECT g, (g::bigint * {NB_JOURS} / {num_rows})::int AS jour,
+                   round((random() * 350000 - 150000)::numeric, 2) AS montant
+            FROM generate_series(0, {num_rows - 1}) g
+        ) s
+    """)
+    cursor.execute("VACUUM ANALYZE")
+
+
+def explain(cursor, sql, rollback):
+    """Durée d'exécution (ms) mesurée par EXPLAIN ANALYZE et premier nœud du plan"""
+    cursor.execute("BEGIN")
+    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+    plan = cursor.fetchone()[0]
+    cursor.execute("ROLLBACK" if rollback else "COMMIT")
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Execution Time"], plan[0]["Plan"]["Node Type"]
+
+
+def measure(cursor, repeat):
+    """Médiane des durées de chaque requête"""
+    results = {}
+    for label, sql, rollback in QUERIES:
+        runs = [explain(cursor, sql, rollback) for _ in range(repeat)]
+        results[label] = (statistics.median(duration for duration, _ in runs), runs[-1][1])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des index de FACT_FLUX_TRESORERIE")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Nombre de flux générés")
+    parser.add_argument("--repeat", type=int, default=3, help="Exécutions par requête (médiane)")
+    parser.add_argument("--keep", action="store_true", help=f"Conserver le schéma {BENCH_SCHEMA}")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    print("=" * 60)
+    print(f"Benchmark index FACT_FLUX_TRESORERIE ({args.rows:,} flux)")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    create_schema(cursor)
+    generate_data(cursor, args.rows)
+    print(f"✓ Données générées en {time.perf_counter() - start:.1f} s")
+
+    for ddl in BASELINE_INDEXES:
+        cursor.execute(ddl)
+    cursor.execute("VACUUM ANALYZE FACT_FLUX_TRESORERIE")
+    before = measure(cursor, args.repeat)
+
+    start = time.perf_counter()
+    cursor.execute(MIGRATION_SQL.read_text(encoding="utf-8"))
+    cursor.execute("VACUUM ANALYZE FACT_FLUX_TRESORERIE")
+    print(f"✓ Migration 005 appliquée en {time.perf_counter() - start:.1f} s")
+    after = measure(cursor, args.repeat)
+
+    print(f"{'requête':<32} | {'avant (ms)':>11} | {'après (ms)':>11} | {'gain':>7} | plan après")
+    for label, _, _ in QUERIES:
+        (avant, _), (apres, noeud) = before[label], after[label]
+        print(f"{label:<32} | {avant:>11.1f} | {apres:>11.1f} | {avant / apres:>6.1f}x | {noeud}")
+
+    if not args.keep:
+        cursor.execute(f"DROP SCHEMA {BENCH_SCHEMA} CASCADE")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark du chargement de FACT_FLUX_TRESORERIE dans PostgreSQL
+Compare le chemin historique (convert_row + execute_values) au chargement COPY de cresus/bulk_load.py
+Les lignes sont écrites dans une table temporaire (LIKE FACT_FLUX_TRESORERIE, sans clés étrangères) puis annulées
+Usage : python benchmarks/bench_load.py [--sizes 100000 1000000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cresus.bulk_load import copy_dataframe  # noqa: E402
+from cresus.config import DB_CONFIG  # noqa: E402
+
+FACT_COLUMNS = [
+    "date_operation", "montant_transaction", "montant_consolide_eur",
+    "type_operation", "statut", "id_compte", "id_devise",
+    "id_scenario", "id_temps", "id_contrepartie",
+]
+
+BENCH_TABLE = "bench_fact_flux_tresorerie"
+
+
+def build_transformed_facts(num_rows, seed=42):
+    """Construit un DataFrame de faits tel qu'il sort de l'étape Transform"""
+    rng = np.random.default_rng(seed)
+    montants = np.round(rng.uniform(-150000, 200000, num_rows), 2)
+    return pd.DataFrame({
+        "date_operation": pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 1096, num_rows), unit="D"),
+        "montant_transaction": montants,
+        "montant_consolide_eur": np.round(montants * 0.91, 2),
+        "type_operation": rng.choice(["virement émis", "virement reçu", "frais bancaires"], num_rows),
+        "statut": rng.choice(["Réalisé", "Prévisionnel"], num_rows, p=[0.9, 0.1]),
+        "id_compte": rng.integers(1, 91, num_rows),
+        "id_devise": rng.integers(1, 5, num_rows),
+        "id_scenario": rng.integers(1, 4, num_rows),
+        "id_temps": rng.integers(1, 1097, num_rows),
+        "id_contrepartie": rng.integers(1, 45, num_rows),
+    })
+
+
+def legacy_load(cursor, df):
+    """Chemin historique du DAG : conversion Python valeur par valeur puis execute_values"""
+    def convert_value(val):
+        if pd.isna(val):
+            return None
+        elif isinstance(val, (np.integer, np.int64, np.int32)):
+            return int(val)
+        elif isinstance(val, (np.floating, np.float64, np.float32)):
+            return float(val)
+        return val
+
+    rows = [tuple(convert_value(val) for val in row) for row in df[FACT_COLUMNS].values]
+    execute_values(
+        cursor,
+        f"INSERT INTO {BENCH_TABLE} ({', '.join(FACT_COLUMNS)}) VALUES %s",
+        rows
+    )
+
+
+def copy_load(cursor, df):
+    """Chargement COPY depuis un tampon mémoire"""
+    copy_dataframe(cursor, df, BENCH_TABLE, FACT_COLUMNS)
+
+
+def time_load(conn, func, df):
+    """Durée (s) d'un chargement dans une table temporaire, transaction annulée ensuite"""
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE TEMP TABLE {BENCH_TABLE} (LIKE FACT_FLUX_TRESORERIE INCLUDING DEFAULTS)")
+    start = time.perf_counter()
+    func(cursor, df)
+    duration = time.perf_counter() - start
+    conn.rollback()
+    cursor.close()
+    return duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du chargement FACT_FLUX_TRESORERIE")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000],
+                        help="Nombres de lignes à charger")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    print("=" * 60)
+    print("Benchmark chargement FACT_FLUX_TRESORERIE")
+    print("=" * 60)
+    print(f"{'lignes':>12} | {'méthode':<15} | {'durée (s)':>10} | {'lignes/s':>12}")
+
+    for num_rows in args.sizes:
+        df = build_transformed_facts(num_rows)
+        for label, func in [("execute_values", legacy_load), ("COPY", copy_load)]:
+            duration = time_load(conn, func, df)
+            print(f"{num_rows:>12,} | {label:<15} | {duration:>10.2f} | {num_rows / duration:>12,.0f}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Benchmark du pipeline complet sur le moteur partagé (package cresus, commun au DAG et aux scripts CLI)
+Mesure chaque étape : extract (lecture), transform (dimensions, faits, conversion EUR, clés), load (COPY, dans un
+schéma dédié supprimé à la fin), aggregates et model (entraînement et prévision de tous les comptes)
+- sources : un répertoire existant (--data-dir), ou des jeux générés par etl/generate_data.py à plusieurs échelles
+  (--scales, graine fixe : mêmes données d'une exécution à l'autre), conservés dans --datasets-dir et réutilisés
+- mesures de cresus/metrics.py : durée, lignes, débit et pic de RSS de chaque étape, détail par table et par lot
+  de comptes ; --repeat N retient la meilleure durée de chaque étape
+- rapport JSON (--report) : environnement, paramètres et mesures de chaque échelle
+- garde-fou (--baseline, rapport d'une exécution de référence) : code de sortie 1 si une étape est plus lente
+  que la référence de plus de --threshold (et d'au moins --min-seconds)
+Usage : python benchmarks/bench_pipeline.py [--data-dir data/sources] [--no-db] [--workers 4]
+        python benchmarks/bench_pipeline.py --scales 10000 1000000 10000000 --report rapport.json
+                                            [--baseline benchmarks/baseline.json] [--threshold 0.2]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+from cresus.aggregates import refresh_aggregates  # noqa: E402
+from cresus.config import DATA_DIR  # noqa: E402
+from cresus.db import get_connection, release_connection  # noqa: E402
+from cresus.extract import extract_sources  # noqa: E402
+from cresus.fx_rates import FxRateTable  # noqa: E402
+from cresus.load import load_dimensions, load_fact_frame  # noqa: E402
+from cresus.metrics import measure, start_run  # noqa: E402
+from cresus.model import MODEL_WORKERS, TRAINING_COLUMNS, train_all_accounts  # noqa: E402
+from cresus.transformations import prepare_fact_flux_tresorerie, transform_dimensions  # noqa: E402
+
+BENCH_SCHEMA = "bench_pipeline"
+CREATE_TABLES_SQL = ROOT_DIR / "database" / "create_tables.sql"
+GENERATE_DATA = ROOT_DIR / "etl" / "generate_data.py"
+
+# Jeux de données générés (un répertoire par échelle et par format)
+DATASETS_DIR = ROOT_DIR / "data" / "benchmarks"
+BENCH_SEED = 42
+
+# Ralentissement relatif toléré par rapport à la référence, et écart absolu (s) en dessous duquel
+# la différence est attribuée au bruit de mesure
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_MIN_SECONDS = 0.5
+
+STAGE_FIELDS = ["duree_s", "lignes_entree", "lignes_sortie", "lignes_par_s", "rss_max_mo"]
+
+
+def generate_dataset(num_transactions, datasets_dir=DATASETS_DIR, output_format="csv"):
+    """
+    Sources de `num_transactions` faits générées par etl/generate_data.py (graine BENCH_SEED)
+    Le jeu est réutilisé s'il a déjà été généré avec les mêmes paramètres (fichier .parametres)
+    Retourne le répertoire des sources
+    """
+    data_dir = Path(datasets_dir) / f"{num_transactions}_{output_format}"
+    command = [sys.executable, str(GENERATE_DATA), "--transactions", str(num_transactions),
+               "--format", output_format, "--seed", str(BENCH_SEED), "--output-dir", str(data_dir)]
+    parametres = data_dir / ".parametres"
+    signature = " ".join(command[2:])
+    if parametres.exists() and parametres.read_text(encoding="utf-8") == signature:
+        return data_dir
+
+    print(f"Génération du jeu de {num_transactions:,} faits dans {data_dir}...")
+    parametres.unlink(missing_ok=True)
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    # Écrit en dernier : une génération interrompue sera recommencée
+    parametres.write_text(signature, encoding="utf-8")
+    return data_dir
+
+
+def transform(dataframes):
+    """Étape Transform du DAG : dimensions puis faits (table de taux construite une fois)"""
+    dataframes = transform_dimensions(dataframes)
+    fx_table = FxRateTable.from_dataframe(dataframes["taux_de_change"])
+    dataframes["fact_flux_tresorerie"] = prepare_fact_flux_tresorerie(
+        dataframes["fact_flux_tresorerie"], dataframes["dim_compte"], dataframes["dim_devise"], fx_table
+    )
+    return dataframes
+
+
+def load(dataframes):
+    """
+    Étape Load de scripts/load_data.py (COPY, tables vides) puis agrégats, dans le schéma BENCH_SCHEMA
+    La création du schéma n'est pas mesurée
+    """
+    conn = get_connection()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    # Schéma dédié seul dans le search_path : les DROP TABLE de create_tables.sql ne touchent pas public
+    cursor.execute(f"SET search_path TO {BENCH_SCHEMA}")
+    cursor.execute(CREATE_TABLES_SQL.read_text(encoding="utf-8"))
+    conn.autocommit = False
+    try:
+        df_fact = dataframes["fact_flux_tresorerie"]
+        with measure("load", lignes_entree=len(df_fact)) as mesure:
+            load_dimensions(cursor, dataframes, upsert=False)
+            mesure["lignes_sortie"] = load_fact_frame(cursor, df_fact, upsert=False)
+            conn.commit()
+        with measure("aggregates") as mesure:
+            nb_jours, nb_mois = refresh_aggregates(cursor, full=True)
+            conn.commit()
+            mesure["lignes_sortie"] = nb_jours + nb_mois
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        cursor.execute(f"DROP SCHEMA {BENCH_SCHEMA} CASCADE")
+        # search_path modifié : la connexion est fermée plutôt que rendue au pool
+        release_connection(conn, close=True)
+
+
+def run_pipeline(data_dir, run_id, with_db=True, workers=MODEL_WORKERS):
+    """Exécute toutes les étapes sur `data_dir` ; retourne (nombre de faits, mesures de l'exécution)"""
+    recorder = start_run(run_id)
+    with measure("extract") as mesure:
+        dataframes, _ = extract_sources(data_dir)
+        mesure["lignes_sortie"] = sum(len(df) for df in dataframes.values())
+
+    nb_faits = len(dataframes["fact_flux_tresorerie"])
+    with measure("transform", lignes_entree=nb_faits) as mesure:
+        dataframes = transform(dataframes)
+        mesure["lignes_sortie"] = len(dataframes["fact_flux_tresorerie"])
+
+    if with_db:
+        load(dataframes)
+
+    df_fact = dataframes["fact_flux_tresorerie"]
+    historique = df_fact.loc[df_fact["statut"] == "Réalisé", TRAINING_COLUMNS].dropna()
+    del dataframes, df_fact
+    with measure("model", lignes_entree=len(historique)) as mesure:
+        forecasts, _, _ = train_all_accounts(historique, workers=workers)
+        mesure["lignes_sortie"] = len(forecasts)
+    return nb_faits, recorder.to_dataframe()
+
+
+def _json_value(value):
+    """Valeur sérialisable en JSON (NaN et NA → null, types NumPy → types Python)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def summarize(runs):
+    """
+    Résultat d'une échelle à partir des mesures de ses répétitions :
+    meilleure durée de chaque étape (objet "total") et détail par table / lot de la dernière répétition
+    """
+    mesures = pd.concat(runs, ignore_index=True)
+    etapes = mesures[mesures["objet"] == "total"]
+    meilleures = etapes.loc[etapes.groupby("etape", sort=False)["duree_s"].idxmin()]
+    detail = runs[-1][runs[-1]["objet"] != "total"]
+    return {
+        "etapes": {
+            row["etape"]: {field: _json_value(row[field]) for field in STAGE_FIELDS}
+            for row in meilleures.to_dict("records")
+        },
+        "detail": [
+            {field: _json_value(row[field]) for field in ["etape", "objet"] + STAGE_FIELDS}
+            for row in detail.to_dict("records")
+        ],
+    }
+
+
+def environment():
+    """Contexte de la mesure (à vérifier avant de comparer deux rapports)"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plateforme": platform.platform(),
+        "cpu": os.cpu_count(),
+    }
+
+
+def print_results(label, resultat):
+    print(f"\n{label}")
+    print(f"{'étape':<10} | {'lignes':>12} | {'durée (s)':>10} | {'lignes/s':>14} | {'RSS max (Mo)':>12}")
+    for etape, m in resultat["etapes"].items():
+        lignes = m["lignes_sortie"] if m["lignes_sortie"] is not None else m["lignes_entree"]
+        print(f"{etape:<10} | {lignes or 0:>12,} | {m['duree_s']:>10.2f} | {m['lignes_par_s'] or 0:>14,.0f} | "
+              f"{m['rss_max_mo'] or 0:>12,.1f}")
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD, min_seconds=DEFAULT_MIN_SECONDS):
+    """
+    Compare les durées de `report` à celles de `baseline` (échelles et étapes présentes dans les deux)
+    Retourne la liste des régressions [(échelle, étape, durée de référence, durée mesurée)]
+    """
+    regressions = []
+    print(f"\nComparaison à la référence (seuil +{threshold:.0%}, écart minimal {min_seconds} s)")
+    if baseline.get("environnement", {}).get("cpu") != report["environnement"]["cpu"]:
+        print("  ⚠ nombre de CPU différent de celui de la référence : comparaison indicative")
+    print(f"{'faits':>12} | {'étape':<10} | {'référence (s)':>13} | {'mesure (s)':>10} | {'écart':>8} |")
+    for echelle, resultat in report["echelles"].items():
+        reference = baseline.get("echelles", {}).get(echelle)
+        if reference is None:
+            print(f"{int(echelle):>12,} | absente de la référence")
+            continue
+        for etape, mesure in resultat["etapes"].items():
+            if etape not in reference["etapes"]:
+                continue
+            avant, apres = reference["etapes"][etape]["duree_s"], mesure["duree_s"]
+            ecart = apres / avant - 1 if avant > 0 else 0.0
+            regression = ecart > threshold and apres - avant >= min_seconds
+            if regression:
+                regressions.append((echelle, etape, avant, apres))
+            print(f"{int(echelle):>12,} | {etape:<10} | {avant:>13.2f} | {apres:>10.2f} | {ecart:>+8.1%} |"
+                  f"{' ✗ régression' if regression else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline complet (moteur cresus)")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="Répertoire des fichiers sources")
+    parser.add_argument("--scales", type=int, nargs="+", default=None,
+                        help="Nombres de faits des jeux générés (remplace --data-dir), ex. 10000 1000000 10000000")
+    parser.add_argument("--datasets-dir", type=Path, default=DATASETS_DIR, help="Répertoire des jeux générés")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Format des faits générés")
+    parser.add_argument("--no-db", action="store_true", help="Ne pas mesurer le chargement (PostgreSQL absent)")
+    parser.add_argument("--workers", type=int, default=MODEL_WORKERS, help="Processus d'entraînement")
+    parser.add_argument("--repeat", type=int, default=1, help="Répétitions par échelle (meilleure durée retenue)")
+    parser.add_argument("--report", type=Path, default=None, help="Rapport JSON à écrire")
+    parser.add_argument("--baseline", type=Path, default=None, help="Rapport de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Ralentissement relatif toléré par étape (0.2 = 20 %%)")
+    parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS,
+                        help="Écart absolu minimal (s) pour signaler une régression")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"Benchmark pipeline ({'échelles ' + str(args.scales) if args.scales else args.data_dir})")
+    print("=" * 60)
+
+    if args.scales:
+        data_dirs = [generate_dataset(n, args.datasets_dir, args.format) for n in args.scales]
+    else:
+        data_dirs = [args.data_dir]
+
+    horodatage = datetime.now()
+    report = {
+        "date": horodatage.isoformat(timespec="seconds"),
+        "environnement": environment(),
+        "parametres": {"workers": args.workers, "repeat": args.repeat, "format": args.format,
+                       "seed": BENCH_SEED, "load": not args.no_db},
+        "echelles": {},
+    }
+    for data_dir in data_dirs:
+        runs = []
+        for repetition in range(1, args.repeat + 1):
+            run_id = f"bench_{horodatage:%Y%m%dT%H%M%S}_{data_dir.name}_{repetition}"
+            nb_faits, mesures = run_pipeline(data_dir, run_id, with_db=not args.no_db, workers=args.workers)
+            runs.append(mesures)
+        resultat = summarize(runs)
+        report["echelles"][str(nb_faits)] = resultat
+        print_results(f"{nb_faits:,} faits ({data_dir})", resultat)
+
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n✓ Rapport écrit : {args.report}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\n✗ {len(regressions)} étape(s) en régression par rapport à {args.baseline}")
+            sys.exit(1)
+        print("\n✓ Aucune régression par rapport à la référence")
+
+
+if __name__ == "__main__":
+    main()
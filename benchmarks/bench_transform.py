@@ -0,0 +1,98 @@
+"""
+Benchmark des transformations de FACT_FLUX_TRESORERIE
+Compare l'implémentation historique (apply ligne à ligne) au moteur vectorisé de cresus/transformations.py
+Usage : python benchmarks/bench_transform.py [--sizes 1000000 10000000] [--legacy-max-rows 1000000]
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cresus.transformations import transform_fact_flux_tresorerie  # noqa: E402
+
+TYPES_OPERATION = [
+    "Virement émis", "Virement reçu", "Dépôt", "Retrait", "Prêt",
+    "Remboursement prêt", "Frais bancaires", "Intérêts créditeurs", "Intérêts débiteurs",
+]
+
+
+def build_raw_facts(num_rows, seed=42):
+    """Construit un DataFrame brut (tel que lu depuis le CSV) avec des montants à nettoyer"""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 1096, num_rows), unit="D")
+    montants = np.round(rng.uniform(-150000, 200000, num_rows), 2).astype(str)
+    # 10 % des montants contiennent des caractères parasites (devise, espaces)
+    dirty = rng.random(num_rows) < 0.10
+    montants = np.where(dirty, np.char.add(montants, " €"), montants)
+    types = np.array(TYPES_OPERATION + [t.upper() + " " for t in TYPES_OPERATION], dtype=object)
+
+    return pd.DataFrame({
+        "date_operation": dates.strftime("%Y-%m-%d"),
+        "montant_transaction": montants,
+        "montant_consolide_eur": np.nan,
+        "type_operation": types[rng.integers(0, len(types), num_rows)],
+    })
+
+
+def legacy_transform(df):
+    """Implémentation historique du DAG (apply + re.sub par ligne), conservée comme référence"""
+    def clean_amount(amount):
+        if pd.isna(amount):
+            return None
+        cleaned = re.sub(r'[^\d\.\-]', '', str(amount))
+        try:
+            return float(cleaned) if cleaned else None
+        except ValueError:
+            return None
+
+    df_fact = df.copy()
+    df_fact['date_operation'] = pd.to_datetime(df_fact['date_operation'], errors='coerce').dt.date
+    df_fact['montant_transaction'] = df_fact['montant_transaction'].apply(clean_amount)
+    df_fact['type_operation'] = df_fact['type_operation'].str.lower().str.strip()
+    df_fact['montant_consolide_eur'] = df_fact.apply(
+        lambda row: row['montant_consolide_eur'] if pd.notna(row['montant_consolide_eur'])
+        else row['montant_transaction'],
+        axis=1
+    )
+    return df_fact
+
+
+def time_transform(func, df):
+    """Retourne la durée (s) d'une transformation"""
+    start = time.perf_counter()
+    func(df)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des transformations FACT_FLUX_TRESORERIE")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000],
+                        help="Nombres de lignes à tester")
+    parser.add_argument("--legacy-max-rows", type=int, default=1_000_000,
+                        help="Taille maximale pour laquelle l'implémentation historique est mesurée")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Benchmark transformations FACT_FLUX_TRESORERIE")
+    print("=" * 60)
+    print(f"{'lignes':>12} | {'moteur':<10} | {'durée (s)':>10} | {'lignes/s':>14}")
+
+    for num_rows in args.sizes:
+        df = build_raw_facts(num_rows)
+        engines = [("vectorisé", transform_fact_flux_tresorerie)]
+        if num_rows <= args.legacy_max_rows:
+            engines.append(("historique", legacy_transform))
+
+        for label, func in engines:
+            duration = time_transform(func, df)
+            print(f"{num_rows:>12,} | {label:<10} | {duration:>10.2f} | {num_rows / duration:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
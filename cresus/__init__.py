@@ -0,0 +1,15 @@
+"""
+Moteur du pipeline Crésus : une seule implémentation d'Extract → Transform → Load → Model,
+utilisée par le DAG Airflow (dags/cresus_pipeline_dag.py), les scripts CLI (scripts/) et les benchmarks
+
+- config / db : paramètres et pool de connexions PostgreSQL, répertoire des sources
+- extract / streaming : lecture des sources (en une fois ou par blocs)
+- extract_cache : sources inchangées ni relues, ni transformées, ni rechargées par le DAG
+- transformations / consolidation / fx_rates : transformations vectorisées et conversion en EUR
+- load / bulk_load / incremental / partitions : chargement COPY, upsert idempotent, point de reprise
+- checkpoints : chargement par lots validés séparément, reprise après échec
+- aggregates : agrégats des tableaux de bord
+- model / forecast_runs : modèle prédictif et générations de prévisions
+- artifact_store : artefacts intermédiaires échangés entre les tâches du DAG
+- metrics : durée, lignes, débit et pic de mémoire de chaque étape (PIPELINE_METRICS, JSON, Prometheus)
+"""
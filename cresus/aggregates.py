@@ -0,0 +1,135 @@
+"""
+Tables d'agrégats de FACT_FLUX_TRESORERIE pour les tableaux de bord
+- AGG_FLUX_JOURNALIER : flux net quotidien par compte et statut
+- AGG_FLUX_MENSUEL : totaux mensuels par filiale / devise / scénario / type d'opération / statut
+Rafraîchissement incrémental : chaque chargement inscrit les dates touchées dans ETL_AGREGATS_A_RAFRAICHIR,
+seuls ces jours (et leurs mois) sont recalculés ; un compte rattaché à une autre filiale inscrit les jours
+de tous ses flux
+"""
+
+import pandas as pd
+
+from .db import execute_prepared
+
+# Flux net quotidien : alimenté pour une liste de dates (%s = tableau de dates) ou pour tout l'historique
+_INSERT_JOURNALIER = """
+    INSERT INTO AGG_FLUX_JOURNALIER
+        (date_operation, id_compte, statut, encaissements_eur, decaissements_eur, flux_net_eur, nb_operations)
+    SELECT
+        f.date_operation,
+        f.id_compte,
+        f.statut,
+        COALESCE(SUM(f.montant_consolide_eur) FILTER (WHERE f.montant_consolide_eur > 0), 0),
+        COALESCE(SUM(f.montant_consolide_eur) FILTER (WHERE f.montant_consolide_eur < 0), 0),
+        COALESCE(SUM(f.montant_consolide_eur), 0),
+        COUNT(*)
+    FROM FACT_FLUX_TRESORERIE f
+    {where}
+    GROUP BY f.date_operation, f.id_compte, f.statut
+"""
+
+# Totaux mensuels : alimentés pour un intervalle [début, fin) de dates ou pour tout l'historique
+_INSERT_MENSUEL = """
+    INSERT INTO AGG_FLUX_MENSUEL
+        (annee, mois, id_filiale, id_devise, id_scenario, type_operation, statut,
+         montant_transaction, montant_consolide_eur, nb_operations)
+    SELECT
+        EXTRACT(YEAR FROM f.date_operation)::int,
+        EXTRACT(MONTH FROM f.date_operation)::int,
+        c.id_filiale,
+        f.id_devise,
+        f.id_scenario,
+        f.type_operation,
+        f.statut,
+        SUM(f.montant_transaction),
+        COALESCE(SUM(f.montant_consolide_eur), 0),
+        COUNT(*)
+    FROM FACT_FLUX_TRESORERIE f
+    JOIN DIM_COMPTE c ON c.id_compte = f.id_compte
+    {where}
+    GROUP BY 1, 2, c.id_filiale, f.id_devise, f.id_scenario, f.type_operation, f.statut
+"""
+
+
+def mark_dates_for_refresh(cursor, dates):
+    """Inscrit des dates d'opération dans la file des agrégats à recalculer"""
+    days = pd.to_datetime(pd.Series(dates)).dropna().dt.normalize().unique()
+    if len(days) == 0:
+        return 0
+    # Instruction répétée à chaque bloc d'un chargement en flux : préparée une fois par connexion
+    execute_prepared(cursor, "cresus_agregats_a_rafraichir", """
+        INSERT INTO ETL_AGREGATS_A_RAFRAICHIR (date_operation)
+        SELECT unnest($1::date[])
+        ON CONFLICT (date_operation) DO NOTHING
+    """, ([day.date() for day in pd.DatetimeIndex(days)],))
+    return len(days)
+
+
+def mark_months_for_refresh(cursor, months):
+    """Inscrit tous les jours des mois donnés (partitions purgées par exemple)"""
+    days = [pd.date_range(month, pd.Timestamp(month) + pd.offsets.MonthEnd(0), freq="D") for month in months]
+    if not days:
+        return 0
+    return mark_dates_for_refresh(cursor, days[0].append(days[1:]))
+
+
+def mark_reassigned_accounts(cursor, df_compte):
+    """
+    Comptes de `df_compte` rattachés à une autre filiale qu'en base : AGG_FLUX_MENSUEL regroupe par
+    filiale, les jours de leurs flux sont donc inscrits dans la file (hash_contenu des faits inchangé)
+    À appeler avant l'upsert de DIM_COMPTE ; retourne la liste des comptes réaffectés
+    """
+    ids = pd.to_numeric(df_compte["id_compte"], errors="coerce")
+    filiales = pd.to_numeric(df_compte["id_filiale"], errors="coerce")
+    cursor.execute("""
+        SELECT c.id_compte
+        FROM DIM_COMPTE c
+        JOIN unnest(%s::int[], %s::int[]) AS n(id_compte, id_filiale) ON n.id_compte = c.id_compte
+        WHERE c.id_filiale IS DISTINCT FROM n.id_filiale
+    """, ([None if pd.isna(v) else int(v) for v in ids], [None if pd.isna(v) else int(v) for v in filiales]))
+    comptes = [row[0] for row in cursor.fetchall()]
+    if comptes:
+        cursor.execute("""
+            INSERT INTO ETL_AGREGATS_A_RAFRAICHIR (date_operation)
+            SELECT DISTINCT date_operation FROM FACT_FLUX_TRESORERIE WHERE id_compte = ANY(%s)
+            ON CONFLICT (date_operation) DO NOTHING
+        """, (comptes,))
+    return comptes
+
+
+def refresh_aggregates(cursor, full=False):
+    """
+    Recalcule les agrégats
+    full=False : seulement les jours en file d'attente et les mois qui les contiennent (la file est vidée
+    dans la même transaction : en cas d'échec, elle est conservée pour la prochaine exécution)
+    full=True : reconstruction complète
+    Retourne (jours recalculés, mois recalculés)
+    """
+    if full:
+        cursor.execute("TRUNCATE AGG_FLUX_JOURNALIER, AGG_FLUX_MENSUEL, ETL_AGREGATS_A_RAFRAICHIR")
+        cursor.execute(_INSERT_JOURNALIER.format(where=""))
+        cursor.execute(_INSERT_MENSUEL.format(where=""))
+        cursor.execute("SELECT COUNT(DISTINCT date_operation), COUNT(DISTINCT date_trunc('month', date_operation)) "
+                       "FROM FACT_FLUX_TRESORERIE")
+        return cursor.fetchone()
+
+    cursor.execute("DELETE FROM ETL_AGREGATS_A_RAFRAICHIR RETURNING date_operation")
+    days = sorted(row[0] for row in cursor.fetchall())
+    if not days:
+        return 0, 0
+
+    # Jours : suppression puis recalcul des seules dates touchées
+    cursor.execute("DELETE FROM AGG_FLUX_JOURNALIER WHERE date_operation = ANY(%s::date[])", (days,))
+    cursor.execute(_INSERT_JOURNALIER.format(where="WHERE f.date_operation = ANY(%s::date[])"), (days,))
+
+    # Mois : recalcul complet de chaque mois touché, par deux requêtes préparées (planifiées une fois) ;
+    # les bornes sont des paramètres : l'élagage des partitions se fait à l'exécution, une seule lue par mois
+    months = sorted({pd.Timestamp(day).to_period("M") for day in days})
+    for month in months:
+        debut, fin = month.start_time.date(), (month + 1).start_time.date()
+        execute_prepared(cursor, "cresus_agg_mensuel_purge",
+                         "DELETE FROM AGG_FLUX_MENSUEL WHERE annee = $1 AND mois = $2", (month.year, month.month))
+        execute_prepared(cursor, "cresus_agg_mensuel_calcul",
+                         _INSERT_MENSUEL.format(where="WHERE f.date_operation >= $1 AND f.date_operation < $2"),
+                         (debut, fin))
+    return len(days), len(months)
@@ -0,0 +1,129 @@
+"""
+Stockage des artefacts intermédiaires du pipeline Crésus
+Les DataFrames échangés entre Extract, Transform et Load sont écrits sur disque
+au format colonnaire (Parquet ou Arrow IPC) ; seul le chemin transite par XCom
+"""
+
+import os
+import re
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+# Répertoire racine des artefacts (partagé entre les workers via le volume ./data)
+ARTIFACTS_DIR = Path(os.getenv("CRESUS_ARTIFACTS_DIR", "/opt/airflow/data/artifacts"))
+
+# Format de stockage par défaut : "parquet" ou "arrow"
+DEFAULT_BACKEND = os.getenv("CRESUS_ARTIFACTS_BACKEND", "parquet")
+
+# Politique de rétention des exécutions précédentes
+DEFAULT_KEEP_RUNS = int(os.getenv("CRESUS_ARTIFACTS_KEEP_RUNS", "3"))
+
+
+def sanitize_run_id(run_id):
+    """Transforme un run_id Airflow (ex: manual__2024-01-01T00:00:00+00:00) en nom de dossier"""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(run_id))
+
+
+class ArtifactStore:
+    """
+    Stockage local des DataFrames, organisé par exécution puis par étape :
+    <base_dir>/<run_id>/<stage>/<table>.<extension>
+    """
+
+    extension = None
+
+    def __init__(self, base_dir=ARTIFACTS_DIR):
+        self.base_dir = Path(base_dir)
+
+    def run_dir(self, run_id):
+        """Répertoire des artefacts d'une exécution"""
+        return self.base_dir / sanitize_run_id(run_id)
+
+    def path_for(self, run_id, stage, name):
+        """Chemin de l'artefact d'une table pour une étape donnée"""
+        return self.run_dir(run_id) / stage / f"{name}.{self.extension}"
+
+    def write(self, run_id, stage, name, df):
+        """Écrit un DataFrame et retourne son chemin (valeur à pousser dans XCom)"""
+        path = self.path_for(run_id, stage, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Écriture dans un fichier temporaire puis renommage : un retry ne lit jamais un fichier partiel
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        self._write(df.reset_index(drop=True), tmp_path)
+        os.replace(tmp_path, path)
+        return str(path)
+
+    def read(self, path):
+        """Relit un artefact à partir du chemin récupéré dans XCom"""
+        return self._read(Path(path))
+
+    def cleanup(self, keep_runs=DEFAULT_KEEP_RUNS, exclude=None):
+        """
+        Supprime les artefacts des anciennes exécutions
+        Conserve les `keep_runs` plus récentes (par date de modification) et celle indiquée par `exclude`
+        """
+        if not self.base_dir.exists():
+            return []
+
+        excluded = sanitize_run_id(exclude) if exclude is not None else None
+        run_dirs = sorted(
+            (d for d in self.base_dir.iterdir() if d.is_dir() and d.name != excluded),
+            key=lambda d: d.stat().st_mtime,
+            reverse=True,
+        )
+        if excluded is not None:
+            keep_runs = max(keep_runs - 1, 0)
+
+        removed = []
+        for run_dir in run_dirs[keep_runs:]:
+            shutil.rmtree(run_dir, ignore_errors=True)
+            removed.append(run_dir.name)
+        return removed
+
+    def _write(self, df, path):
+        raise NotImplementedError
+
+    def _read(self, path):
+        raise NotImplementedError
+
+
+class ParquetArtifactStore(ArtifactStore):
+    """Artefacts au format Parquet (compressés, adaptés aux gros volumes)"""
+
+    extension = "parquet"
+
+    def _write(self, df, path):
+        df.to_parquet(path, engine="pyarrow", index=False)
+
+    def _read(self, path):
+        return pd.read_parquet(path, engine="pyarrow")
+
+
+class ArrowIpcArtifactStore(ArtifactStore):
+    """Artefacts au format Arrow IPC / Feather (lecture quasi sans copie, non compressés)"""
+
+    extension = "arrow"
+
+    def _write(self, df, path):
+        df.to_feather(path, compression="uncompressed")
+
+    def _read(self, path):
+        return pd.read_feather(path)
+
+
+# Registre des formats disponibles
+ARTIFACT_STORES = {
+    "parquet": ParquetArtifactStore,
+    "arrow": ArrowIpcArtifactStore,
+}
+
+
+def get_artifact_store(backend=DEFAULT_BACKEND, base_dir=ARTIFACTS_DIR):
+    """Instancie le stockage d'artefacts correspondant au format demandé"""
+    if backend not in ARTIFACT_STORES:
+        raise ValueError(
+            f"Format d'artefact inconnu : {backend} (disponibles : {', '.join(ARTIFACT_STORES)})"
+        )
+    return ARTIFACT_STORES[backend](base_dir)
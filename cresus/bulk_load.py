@@ -0,0 +1,93 @@
+"""
+Chargement en masse des DataFrames dans PostgreSQL via COPY
+Chaque DataFrame est converti en table Arrow, sérialisé en CSV (C++) dans un tampon mémoire puis envoyé
+avec COPY ... FROM STDIN, par blocs de lignes : aucune conversion Python valeur par valeur
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+# Nombre de lignes sérialisées par COPY (borne la taille du tampon mémoire)
+COPY_CHUNK_ROWS = 200_000
+
+
+def _prepare_for_copy(df, columns):
+    """
+    Sélectionne les colonnes et rend les entiers stockés en flottants (à cause des NaN) à nouveau entiers,
+    pour que COPY n'échoue pas sur "3.0" dans une colonne INTEGER
+    """
+    df = df[columns].copy()
+    for column in columns:
+        values = df[column]
+        if pd.api.types.is_float_dtype(values):
+            finite = values.dropna().to_numpy()
+            if len(finite) and np.array_equal(finite, np.round(finite)) and np.abs(finite).max() < 2**53:
+                df[column] = values.astype("Int64")
+    return df
+
+
+def _to_arrow(df):
+    """Table Arrow prête pour COPY : les horodatages sont ramenés à des dates (colonnes SQL DATE)"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for index, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(index, field.name, pc.cast(table.column(index), pa.date32(), safe=False))
+    return table
+
+
+def copy_dataframe(cursor, df, table, columns, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Envoie df[columns] dans `table` avec COPY FROM STDIN (format CSV, NULL = champ vide non quoté)
+    Retourne le nombre de lignes chargées
+    """
+    if df.empty:
+        return 0
+
+    arrow_table = _to_arrow(_prepare_for_copy(df, columns))
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')"
+    options = pacsv.WriteOptions(include_header=False)
+
+    for start in range(0, arrow_table.num_rows, chunk_rows):
+        sink = pa.BufferOutputStream()
+        pacsv.write_csv(arrow_table.slice(start, chunk_rows), sink, options)
+        cursor.copy_expert(sql, io.BytesIO(sink.getvalue().to_pybytes()))
+    return arrow_table.num_rows
+
+
+def upsert_dataframe(cursor, df, table, columns, key, change_column=None):
+    """
+    Charge df dans `table` via une table temporaire alimentée par COPY,
+    puis INSERT ... ON CONFLICT (key) DO UPDATE côté serveur
+    `key` : colonne ou liste de colonnes de la contrainte d'unicité
+    Si `change_column` est fourni, seules les lignes dont cette colonne diffère sont réécrites
+    Retourne le nombre de lignes insérées ou mises à jour
+    """
+    if df.empty:
+        return 0
+
+    keys = [key] if isinstance(key, str) else list(key)
+    column_list = ", ".join(columns)
+    staging = f"tmp_{table.lower()}"
+    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    # Table temporaire limitée aux colonnes chargées (pas de valeurs par défaut ni de séquence consommée)
+    cursor.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA")
+    copy_dataframe(cursor, df, staging, columns)
+
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column not in keys)
+    condition = ""
+    if change_column is not None:
+        condition = f"WHERE {table}.{change_column} IS DISTINCT FROM EXCLUDED.{change_column}"
+    cursor.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {staging}
+        ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}
+        {condition}
+    """)
+    touched = cursor.rowcount
+    cursor.execute(f"DROP TABLE {staging}")
+    return touched
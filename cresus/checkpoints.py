@@ -0,0 +1,115 @@
+"""
+Chargement par lots validés séparément, avec points de reprise
+- chaque lot (au moins `batch_size` lignes de la source) est validé par son propre COMMIT : une erreur
+  n'annule que le lot en cours
+- après chaque lot, la position atteinte dans la source est inscrite dans ETL_CHECKPOINT_CHARGEMENT
+  (dans la même transaction que les données du lot)
+- une relance du même chargement (même run_id Airflow, ou --resume du script CLI) saute les tables
+  terminées et reprend les faits après le dernier lot validé
+- une signature de la source (taille et date de modification des fichiers, ou contenu du DataFrame)
+  évite de reprendre à une position qui ne correspond plus aux données
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from .db import execute_prepared
+
+# Lignes par lot validé (0 = une seule transaction pour tout le chargement)
+DEFAULT_BATCH_SIZE = int(os.getenv("CRESUS_LOAD_BATCH_SIZE", "0"))
+
+# Jours de conservation des points de reprise d'un chargement jamais terminé
+CHECKPOINT_RETENTION_DAYS = int(os.getenv("CRESUS_CHECKPOINT_RETENTION_DAYS", "7"))
+
+
+def source_signature(files):
+    """Signature de fichiers sources : nom, taille et date de modification de chacun"""
+    parts = []
+    for file in files:
+        stat = Path(file).stat()
+        parts.append(f"{Path(file).name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.md5(";".join(parts).encode("utf-8")).hexdigest()
+
+
+def frame_signature(df, columns=None):
+    """Signature du contenu d'un DataFrame (nombre de lignes et empreinte des colonnes `columns`)"""
+    frame = df if columns is None else df[columns]
+    empreinte = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return hashlib.md5(f"{len(df)}".encode("utf-8") + empreinte.tobytes()).hexdigest()
+
+
+def get_checkpoint(cursor, id_chargement, table, signature, strict=False):
+    """
+    Point de reprise d'une table pour le chargement `id_chargement` :
+    dict (position, nb_chargees, derniere_date, termine) ou None s'il n'existe pas
+    Si la source a changé depuis (signature différente) : None (reprise depuis le début, sans risque
+    avec un upsert) ; strict=True lève ValueError (COPY : les lots validés seraient chargés deux fois)
+    """
+    execute_prepared(cursor, "cresus_checkpoint_lecture", """
+        SELECT signature_source, position_source, nb_lignes_chargees, derniere_date, termine
+        FROM ETL_CHECKPOINT_CHARGEMENT
+        WHERE id_chargement = $1 AND nom_table = $2
+    """, (id_chargement, table))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if row[0] != signature:
+        if strict:
+            raise ValueError(
+                f"{table} : la source a changé depuis le chargement interrompu {id_chargement}, "
+                "reprise impossible (relancer un chargement complet)"
+            )
+        print(f"  ⚠ {table} : source modifiée depuis le chargement interrompu, reprise depuis le début")
+        return None
+    return {"position": row[1], "nb_chargees": row[2], "derniere_date": row[3], "termine": row[4]}
+
+
+def save_checkpoint(cursor, id_chargement, table, signature, position, nb_chargees,
+                    derniere_date=None, termine=False):
+    """Inscrit la position atteinte dans la source (à valider avec les données du lot)"""
+    if derniere_date is not None and not pd.isna(derniere_date):
+        derniere_date = pd.Timestamp(derniere_date).date()
+    else:
+        derniere_date = None
+    execute_prepared(cursor, "cresus_checkpoint_ecriture", """
+        INSERT INTO ETL_CHECKPOINT_CHARGEMENT
+            (id_chargement, nom_table, signature_source, position_source, nb_lignes_chargees,
+             derniere_date, termine, maj_le)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
+        ON CONFLICT (id_chargement, nom_table) DO UPDATE SET
+            signature_source = EXCLUDED.signature_source,
+            position_source = EXCLUDED.position_source,
+            nb_lignes_chargees = EXCLUDED.nb_lignes_chargees,
+            derniere_date = EXCLUDED.derniere_date,
+            termine = EXCLUDED.termine,
+            maj_le = EXCLUDED.maj_le
+    """, (id_chargement, table, signature, int(position), int(nb_chargees), derniere_date, termine))
+
+
+def commit_batch(cursor, id_chargement, table, signature, position, nb_chargees,
+                 derniere_date=None, termine=False):
+    """Enregistre le point de reprise puis valide le lot (données et point de reprise ensemble)"""
+    save_checkpoint(cursor, id_chargement, table, signature, position, nb_chargees, derniere_date, termine)
+    cursor.connection.commit()
+
+
+def has_checkpoints(cursor, id_chargement):
+    """Le chargement `id_chargement` a-t-il déjà validé au moins un lot ?"""
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM ETL_CHECKPOINT_CHARGEMENT WHERE id_chargement = %s)",
+                   (id_chargement,))
+    return cursor.fetchone()[0]
+
+
+def clear_checkpoints(cursor, id_chargement, retention_days=CHECKPOINT_RETENTION_DAYS):
+    """
+    Supprime les points de reprise d'un chargement (terminé, ou à recommencer depuis le début)
+    ainsi que ceux des chargements abandonnés depuis plus de `retention_days` jours
+    """
+    cursor.execute("""
+        DELETE FROM ETL_CHECKPOINT_CHARGEMENT
+        WHERE id_chargement = %s OR maj_le < NOW() - make_interval(days => %s)
+    """, (id_chargement, retention_days))
+    return cursor.rowcount
@@ -0,0 +1,20 @@
+"""
+Configuration commune du pipeline (variables d'environnement)
+Lue par le DAG Airflow, les scripts CLI et les benchmarks : une seule définition des paramètres de connexion
+et de l'emplacement des fichiers sources
+"""
+
+import os
+from pathlib import Path
+
+# Configuration PostgreSQL (peut être surchargée par variables d'environnement)
+DB_CONFIG = {
+    "host": os.getenv("POSTGRES_HOST", "localhost"),
+    "port": os.getenv("POSTGRES_PORT", "5432"),
+    "database": os.getenv("POSTGRES_DB", "cresus_db"),
+    "user": os.getenv("POSTGRES_USER", "postgres"),
+    "password": os.getenv("POSTGRES_PASSWORD", "postgres")
+}
+
+# Répertoire des fichiers sources générés par etl/generate_data.py
+DATA_DIR = Path(os.getenv("CRESUS_DATA_DIR", "data/sources"))
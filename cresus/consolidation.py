@@ -0,0 +1,56 @@
+"""
+Consolidation en EUR des flux de trésorerie
+Détermine la devise source de chaque flux (DIM_COMPTE / DIM_DEVISE) puis applique, sur les colonnes
+entières, le dernier taux connu à la date d'opération via la table de taux indexée (fx_rates.py)
+"""
+
+import numpy as np
+import pandas as pd
+
+from .fx_rates import DEVISE_CONSOLIDATION, FxRateTable
+
+
+def source_currencies(df_fact, df_compte, df_devise):
+    """
+    Code ISO de la devise de chaque flux, sous forme de Categorical
+    id_devise du flux, à défaut celui du compte (DIM_COMPTE), traduit via DIM_DEVISE
+    Les jointures sont des recherches d'index entières : aucune chaîne n'est manipulée par ligne
+    """
+    position_compte = pd.Index(df_compte["id_compte"]).get_indexer(df_fact["id_compte"])
+    devise_compte = np.where(
+        position_compte >= 0,
+        df_compte["id_devise"].to_numpy(dtype="float64")[position_compte],
+        np.nan,
+    )
+    if "id_devise" in df_fact:
+        id_devise = df_fact["id_devise"].to_numpy(dtype="float64")
+        id_devise = np.where(np.isnan(id_devise), devise_compte, id_devise)
+    else:
+        id_devise = devise_compte
+
+    position_devise = pd.Index(df_devise["id_devise"].astype("float64")).get_indexer(id_devise)
+    return pd.Categorical.from_codes(position_devise, categories=df_devise["code_iso"])
+
+
+def consolidate_eur(df_fact, df_compte, df_devise, fx_rates, cible=DEVISE_CONSOLIDATION):
+    """
+    Calcule montant_consolide_eur pour tous les flux en une seule recherche vectorisée
+    `fx_rates` est une FxRateTable (ou le DataFrame taux_de_change, indexé à la volée)
+    Les valeurs déjà renseignées sont conservées ; retourne une Series alignée sur df_fact
+    """
+    if not isinstance(fx_rates, FxRateTable):
+        fx_rates = FxRateTable.from_dataframe(fx_rates)
+
+    codes = source_currencies(df_fact, df_compte, df_devise)
+    montants = df_fact["montant_transaction"].to_numpy(dtype="float64")
+
+    consolide = fx_rates.convert(montants, df_fact["date_operation"], codes, cible)
+    if "montant_consolide_eur" in df_fact:
+        existing = pd.to_numeric(df_fact["montant_consolide_eur"], errors="coerce").to_numpy(dtype="float64")
+        consolide = np.where(np.isnan(existing), consolide, existing)
+
+    missing = int((np.isnan(consolide) & ~np.isnan(montants)).sum())
+    if missing > 0:
+        print(f"  ⚠ {missing} flux sans taux de change applicable (montant_consolide_eur non renseigné)")
+
+    return pd.Series(np.round(consolide, 2), index=df_fact.index, name="montant_consolide_eur")
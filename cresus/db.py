@@ -0,0 +1,153 @@
+"""
+Connexions PostgreSQL du pipeline : toutes les étapes passent par ce module
+- pool psycopg2 (ThreadedConnectionPool) créé à la première demande, un par processus : les étapes
+  successives d'un même processus (script CLI, tâche Airflow, benchmark) réutilisent la connexion ouverte
+- contrôle de santé à la sortie du pool (SELECT 1 après une inactivité prolongée) : une connexion
+  rompue (redémarrage du serveur, coupure réseau) est remplacée au lieu de faire échouer l'étape
+- statement_timeout et application_name fixés à l'ouverture de la connexion (options libpq)
+- requêtes préparées côté serveur (PREPARE une fois par connexion, puis EXECUTE) pour les instructions
+  répétées à chaque bloc ou à chaque mois
+"""
+
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from .config import DB_CONFIG
+
+POOL_MIN_CONNECTIONS = int(os.getenv("CRESUS_DB_POOL_MIN", "1"))
+POOL_MAX_CONNECTIONS = int(os.getenv("CRESUS_DB_POOL_MAX", "4"))
+
+# Durée maximale d'une instruction (ms, 0 = illimitée) : large, un COPY de plusieurs millions de lignes
+# doit passer, une requête bloquée sur un verrou ne doit pas immobiliser un worker indéfiniment
+STATEMENT_TIMEOUT_MS = int(os.getenv("CRESUS_DB_STATEMENT_TIMEOUT_MS", str(60 * 60 * 1000)))
+CONNECT_TIMEOUT_SECONDS = int(os.getenv("CRESUS_DB_CONNECT_TIMEOUT", "10"))
+
+# Inactivité (s) au-delà de laquelle une connexion est vérifiée avant d'être rendue à l'appelant
+HEALTHCHECK_IDLE_SECONDS = float(os.getenv("CRESUS_DB_HEALTHCHECK_SECONDS", "30"))
+
+APPLICATION_NAME = os.getenv("CRESUS_DB_APPLICATION_NAME", "cresus")
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+# Dernière restitution au pool de chaque connexion (id → time.monotonic())
+_last_used = {}
+
+# Requêtes préparées de chaque connexion (pool ou non) : oubliées avec la connexion
+_prepared = weakref.WeakKeyDictionary()
+
+
+def connection_parameters(statement_timeout_ms=STATEMENT_TIMEOUT_MS):
+    """Paramètres psycopg2.connect communs : DB_CONFIG, délai de connexion, statement_timeout"""
+    return dict(
+        DB_CONFIG,
+        connect_timeout=CONNECT_TIMEOUT_SECONDS,
+        application_name=APPLICATION_NAME,
+        options=f"-c statement_timeout={int(statement_timeout_ms)}",
+    )
+
+
+def get_pool():
+    """
+    Pool du processus courant, créé à la première demande
+    Après un fork (worker Airflow, ProcessPoolExecutor), l'enfant ouvre son propre pool : les sockets du
+    parent ne sont ni réutilisées ni fermées (leur fermeture couperait aussi les connexions du parent)
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _last_used.clear()
+            _pool = ThreadedConnectionPool(POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS, **connection_parameters())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _is_healthy(conn):
+    """Connexion utilisable : ouverte, et répondant à SELECT 1 si elle est restée longtemps inactive"""
+    if conn.closed:
+        return False
+    last_used = _last_used.get(id(conn))
+    if last_used is not None and time.monotonic() - last_used < HEALTHCHECK_IDLE_SECONDS:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def get_connection():
+    """
+    Connexion saine du pool (à rendre avec release_connection)
+    Les connexions rompues sont fermées et remplacées ; OperationalError si aucune ne répond
+    """
+    pool = get_pool()
+    for _ in range(POOL_MAX_CONNECTIONS + 1):
+        conn = pool.getconn()
+        if _is_healthy(conn):
+            return conn
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("Aucune connexion PostgreSQL saine disponible dans le pool")
+
+
+def release_connection(conn, close=False):
+    """Rend une connexion au pool (transaction en cours annulée, mode autocommit désactivé)"""
+    pool = get_pool()
+    if conn.closed or close:
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+        return
+    conn.rollback()
+    conn.autocommit = False
+    _last_used[id(conn)] = time.monotonic()
+    pool.putconn(conn)
+
+
+@contextmanager
+def connection():
+    """
+    Connexion du pool le temps d'un bloc `with` ; ce qui n'a pas été validé par conn.commit()
+    est annulé à la sortie (exception comprise)
+    """
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        release_connection(conn)
+
+
+def close_pool():
+    """Ferme toutes les connexions du pool du processus courant"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _last_used.clear()
+
+
+def execute_prepared(cursor, name, sql, params=()):
+    """
+    Exécute `sql` (paramètres positionnels $1, $2...) comme requête préparée `name` de la connexion :
+    PREPARE au premier appel, puis EXECUTE sans nouvelle analyse ni planification
+    Une requête préparée survit aux ROLLBACK ; elle disparaît avec la connexion
+    """
+    conn = cursor.connection
+    prepared = _prepared.setdefault(conn, set())
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        prepared.add(name)
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", tuple(params))
+    else:
+        cursor.execute(f"EXECUTE {name}")
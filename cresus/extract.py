@@ -0,0 +1,57 @@
+"""
+Lecture des fichiers sources générés par etl/generate_data.py
+Dimensions et taux de change : un CSV par table ; faits : fichier CSV / Parquet unique ou répertoire de parts
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+from .metrics import measure
+from .streaming import read_fact_source, resolve_fact_source
+
+# Fichiers CSV des dimensions et des taux de change (nom de l'artefact → fichier)
+SOURCE_FILES = {
+    "dim_filiale": "dim_filiale.csv",
+    "dim_devise": "dim_devise.csv",
+    "dim_scenario": "dim_scenario.csv",
+    "dim_contrepartie": "dim_contrepartie.csv",
+    "dim_compte": "dim_compte.csv",
+    "dim_temps": "dim_temps.csv",
+    "taux_de_change": "taux_de_change.csv",
+}
+
+FACT_TABLE = "fact_flux_tresorerie"
+
+
+def read_sources(data_dir, names=None):
+    """
+    Lit les CSV de dimensions et de taux de change de `data_dir` (tous, ou seulement `names`)
+    Retourne {nom: DataFrame} ; FileNotFoundError si un fichier manque
+    """
+    data_dir = Path(data_dir)
+    dataframes = {}
+    for name in SOURCE_FILES if names is None else names:
+        file_path = data_dir / SOURCE_FILES[name]
+        if not file_path.exists():
+            raise FileNotFoundError(f"Fichier manquant : {file_path}")
+        with measure("extract", name) as mesure:
+            dataframes[name] = pd.read_csv(file_path, encoding="utf-8")
+            mesure["lignes_sortie"] = len(dataframes[name])
+    return dataframes
+
+
+def extract_sources(data_dir, read_facts=True, names=None):
+    """
+    Extraction complète : dimensions, taux de change (tous, ou seulement `names`) et, si `read_facts`,
+    la table de faits entière (sinon elle sera lue par blocs au chargement, voir streaming.stream_fact_file)
+    Retourne ({nom: DataFrame}, chemin de la source de faits)
+    """
+    fact_path = resolve_fact_source(data_dir)
+    dataframes = {}
+    if read_facts:
+        with measure("extract", FACT_TABLE) as mesure:
+            dataframes[FACT_TABLE] = read_fact_source(fact_path)
+            mesure["lignes_sortie"] = len(dataframes[FACT_TABLE])
+    dataframes.update(read_sources(data_dir, names))
+    return dataframes, fact_path
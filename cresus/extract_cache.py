@@ -0,0 +1,174 @@
+"""
+Cache de l'extraction du DAG : une source inchangée depuis son dernier chargement n'est ni relue,
+ni transformée, ni rechargée
+- signature d'une source (fichier, ou répertoire de parts) : taille, date de modification et empreinte
+  SHA-256 du contenu ; l'empreinte n'est recalculée que si la taille ou la date a changé (un fichier
+  réécrit à l'identique reste en cache)
+- état dans ETL_CACHE_SOURCE, écrit dans la transaction qui valide le chargement : une source n'est
+  réputée à jour qu'une fois chargée ; load.reset_tables vide aussi cet état
+- dimensions et taux de change : l'artefact transformé est conservé dans CACHE_DIR (hors rétention des
+  artefacts d'exécution) et relu par les tâches suivantes à la place de la source
+- faits : sautés seulement si DIM_COMPTE, DIM_DEVISE et les taux de change, utilisés pour la conversion
+  en EUR, sont eux aussi inchangés
+- rapport de chaque exécution dans ETL_CACHE_RAPPORT : source réutilisée ou retraitée, et pourquoi
+"""
+
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+import psycopg2
+
+from .artifact_store import get_artifact_store
+from .extract import FACT_TABLE
+from .streaming import fact_source_files
+
+# Cache actif par défaut (CRESUS_EXTRACT_CACHE=0 pour tout relire à chaque exécution)
+EXTRACT_CACHE_ENABLED = os.getenv("CRESUS_EXTRACT_CACHE", "1") != "0"
+
+# Artefacts transformés des sources en cache (partagé entre les workers via le volume ./data)
+CACHE_DIR = Path(os.getenv("CRESUS_CACHE_DIR", "/opt/airflow/data/cache"))
+
+# Jours de conservation du rapport des exécutions
+CACHE_REPORT_RETENTION_DAYS = int(os.getenv("CRESUS_CACHE_REPORT_RETENTION_DAYS", "30"))
+
+# Sources utilisées par la transformation des faits (conversion en EUR)
+FACT_DEPENDENCIES = ["dim_compte", "dim_devise", "taux_de_change"]
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def source_state(path):
+    """Taille totale (octets) et date de modification la plus récente (ns) d'une source"""
+    stats = [file.stat() for file in fact_source_files(path)]
+    return sum(stat.st_size for stat in stats), max(stat.st_mtime_ns for stat in stats)
+
+
+def content_hash(path):
+    """Empreinte SHA-256 d'une source : nom et contenu de chaque part, dans l'ordre"""
+    digest = hashlib.sha256()
+    for file in fact_source_files(path):
+        digest.update(file.name.encode("utf-8"))
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _artifact_available(path):
+    """Artefact en cache présent et lisible par le stockage configuré (même format)"""
+    return bool(path) and Path(path).exists() and Path(path).suffix == f".{get_artifact_store().extension}"
+
+
+def plan_extraction(cursor, sources, full_reload=False):
+    """
+    Décide pour chaque source {nom: chemin} si elle est réutilisée ou retraitée
+    Retourne {nom: {reutilisee, motif, taille_octets, mtime_ns, hash_contenu, artefact}}, sérialisable
+    (transmis par XCom aux tâches suivantes) ; {} si ETL_CACHE_SOURCE n'existe pas
+    """
+    try:
+        cursor.execute("SELECT nom_table, taille_octets, mtime_ns, hash_contenu, artefact FROM ETL_CACHE_SOURCE")
+    except psycopg2.errors.UndefinedTable:
+        cursor.connection.rollback()
+        print("  ⚠ ETL_CACHE_SOURCE absente (migration 008 non appliquée) : cache de l'extraction désactivé")
+        return {}
+    etat = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    plan = {}
+    for name, path in sources.items():
+        taille, mtime_ns = source_state(path)
+        precedent = etat.get(name)
+        decision = {"reutilisee": False, "taille_octets": taille, "mtime_ns": mtime_ns,
+                    "hash_contenu": None, "artefact": None}
+        if not full_reload and precedent is not None and precedent[:2] == (taille, mtime_ns):
+            decision.update(reutilisee=True, motif="inchangée", hash_contenu=precedent[2])
+        else:
+            decision["hash_contenu"] = content_hash(path)
+            if full_reload:
+                decision["motif"] = "rechargement complet"
+            elif precedent is None:
+                decision["motif"] = "nouvelle source"
+            elif decision["hash_contenu"] == precedent[2]:
+                decision.update(reutilisee=True, motif="contenu identique, date de modification changée")
+            else:
+                decision["motif"] = "contenu modifié"
+        if decision["reutilisee"] and name != FACT_TABLE:
+            if _artifact_available(precedent[3]):
+                decision["artefact"] = precedent[3]
+            else:
+                decision.update(reutilisee=False, motif="artefact en cache absent")
+        plan[name] = decision
+
+    # Faits : une dimension ou des taux retraités changent la conversion en EUR
+    if plan.get(FACT_TABLE, {}).get("reutilisee"):
+        retraitees = [name for name in FACT_DEPENDENCIES if name in plan and not plan[name]["reutilisee"]]
+        if retraitees:
+            plan[FACT_TABLE].update(reutilisee=False, motif=f"dépendance retraitée : {', '.join(retraitees)}")
+    return plan
+
+
+def reused_tables(plan):
+    """Noms des sources réutilisées par le plan"""
+    return {name for name, decision in plan.items() if decision["reutilisee"]}
+
+
+def cache_artifact(name, df, decision, base_dir=CACHE_DIR):
+    """
+    Conserve l'artefact transformé d'une source retraitée : <base_dir>/<nom>/<empreinte>/<nom>.<format>
+    Le chemin est renseigné dans la décision (enregistré avec l'état de la source au chargement)
+    """
+    store = get_artifact_store(base_dir=base_dir)
+    decision["artefact"] = store.write(name, decision["hash_contenu"][:16], name, df)
+    return decision["artefact"]
+
+
+def record_load(cursor, run_id, plan, retention_days=CACHE_REPORT_RETENTION_DAYS):
+    """
+    Enregistre l'état des sources (ETL_CACHE_SOURCE) et le rapport de l'exécution (ETL_CACHE_RAPPORT),
+    à valider avec le chargement ; purge les rapports de plus de `retention_days` jours
+    """
+    for name, decision in plan.items():
+        cursor.execute("""
+            INSERT INTO ETL_CACHE_SOURCE (nom_table, taille_octets, mtime_ns, hash_contenu, artefact, run_id, maj_le)
+            VALUES (%s, %s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (nom_table) DO UPDATE SET
+                taille_octets = EXCLUDED.taille_octets,
+                mtime_ns = EXCLUDED.mtime_ns,
+                hash_contenu = EXCLUDED.hash_contenu,
+                artefact = EXCLUDED.artefact,
+                run_id = EXCLUDED.run_id,
+                maj_le = EXCLUDED.maj_le
+        """, (name, decision["taille_octets"], decision["mtime_ns"], decision["hash_contenu"],
+              decision["artefact"], run_id))
+        cursor.execute("""
+            INSERT INTO ETL_CACHE_RAPPORT (run_id, nom_table, reutilisee, motif)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (run_id, nom_table) DO UPDATE SET
+                reutilisee = EXCLUDED.reutilisee, motif = EXCLUDED.motif, cree_le = NOW()
+        """, (run_id, name, decision["reutilisee"], decision["motif"]))
+    cursor.execute("DELETE FROM ETL_CACHE_RAPPORT WHERE cree_le < NOW() - make_interval(days => %s)",
+                   (retention_days,))
+
+
+def purge_artifacts(plan):
+    """Supprime les artefacts en cache remplacés par ceux du plan ; retourne le nombre supprimé"""
+    removed = 0
+    for decision in plan.values():
+        if not decision["artefact"]:
+            continue
+        courant = Path(decision["artefact"]).parent
+        for entry in courant.parent.iterdir():
+            if entry.is_dir() and entry != courant:
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+    return removed
+
+
+def report_lines(plan):
+    """Rapport lisible du plan : une ligne par source"""
+    return [
+        f"  {'↷' if d['reutilisee'] else '✓'} {name} : {'réutilisée' if d['reutilisee'] else 'retraitée'} "
+        f"({d['motif']})"
+        for name, d in plan.items()
+    ]
@@ -0,0 +1,83 @@
+"""
+Versionnement des prévisions du modèle prédictif
+- chaque exécution est enregistrée dans FORECAST_RUN et écrit dans sa propre partition de FACT_PREVISION
+- la génération courante bascule en une seule instruction, après chargement complet
+- les anciennes générations publiées sont purgées (DROP de leur partition) au-delà de la politique de
+  rétention ; une exécution en cours (non publiée) n'est jamais purgée, sauf abandonnée depuis plus de
+  STALE_RUN_HOURS heures
+"""
+
+import os
+
+# Nombre de générations conservées, génération courante comprise
+DEFAULT_KEEP_RUNS = int(os.getenv("CRESUS_FORECAST_KEEP_RUNS", "3"))
+
+# Délai après lequel une exécution jamais publiée est considérée comme abandonnée (échec du modèle)
+STALE_RUN_HOURS = int(os.getenv("CRESUS_FORECAST_STALE_RUN_HOURS", "24"))
+
+
+def partition_name(id_run):
+    """Nom de la partition de FACT_PREVISION d'une exécution"""
+    return f"fact_prevision_run_{int(id_run)}"
+
+
+def start_forecast_run(conn):
+    """
+    Enregistre une nouvelle exécution (non courante) et crée sa partition
+    Validé immédiatement : le chargement des prévisions ne bloque pas les lectures de la génération courante
+    Retourne id_run
+    """
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO FORECAST_RUN (genere_le) VALUES (NOW()) RETURNING id_run")
+    id_run = cursor.fetchone()[0]
+    cursor.execute(
+        f"CREATE TABLE {partition_name(id_run)} PARTITION OF FACT_PREVISION FOR VALUES IN ({int(id_run)})"
+    )
+    conn.commit()
+    cursor.close()
+    return id_run
+
+
+def publish_forecast_run(conn, id_run, nb_previsions):
+    """
+    Rend la génération `id_run` courante (publiee_le renseigné) : une seule instruction UPDATE, validée
+    atomiquement ; l'ancienne génération courante devient une génération remplacée
+    Les lectures (V_PREVISION_COURANTE) voient l'ancienne ou la nouvelle génération, jamais un mélange
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE FORECAST_RUN
+        SET est_courante = (id_run = %s),
+            nb_previsions = CASE WHEN id_run = %s THEN %s ELSE nb_previsions END,
+            publiee_le = CASE WHEN id_run = %s THEN NOW() ELSE publiee_le END
+        WHERE est_courante OR id_run = %s
+    """, (id_run, id_run, nb_previsions, id_run, id_run))
+    conn.commit()
+    cursor.close()
+
+
+def purge_forecast_runs(conn, keep_runs=DEFAULT_KEEP_RUNS, stale_hours=STALE_RUN_HOURS):
+    """
+    Supprime les générations remplacées au-delà des `keep_runs` plus récentes (génération courante
+    comprise, toujours conservée) et les exécutions jamais publiées depuis plus de `stale_hours` heures
+    Une exécution en cours d'une autre instance du modèle (non publiée, récente) n'est pas touchée
+    Retourne la liste des id_run supprimés
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        (SELECT id_run FROM FORECAST_RUN
+         WHERE publiee_le IS NOT NULL AND NOT est_courante
+         ORDER BY publiee_le DESC, id_run DESC
+         OFFSET GREATEST(%s - 1, 0))
+        UNION ALL
+        SELECT id_run FROM FORECAST_RUN
+        WHERE publiee_le IS NULL AND genere_le < NOW() - make_interval(hours => %s)
+        ORDER BY id_run
+    """, (keep_runs, stale_hours))
+    obsoletes = [row[0] for row in cursor.fetchall()]
+    for id_run in obsoletes:
+        cursor.execute(f"DROP TABLE IF EXISTS {partition_name(id_run)}")
+        cursor.execute("DELETE FROM FORECAST_RUN WHERE id_run = %s", (id_run,))
+    conn.commit()
+    cursor.close()
+    return obsoletes
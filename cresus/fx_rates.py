@@ -0,0 +1,119 @@
+"""
+Table des taux de change indexée en mémoire
+Les taux sont rangés dans un tableau NumPy dense [jour, paire de devises] construit une fois par exécution :
+une recherche (date, source, cible) est un simple accès indexé, et les conversions se font sur des tableaux entiers
+"""
+
+import numpy as np
+import pandas as pd
+
+# Devise de consolidation du groupe
+DEVISE_CONSOLIDATION = "EUR"
+
+
+def _forward_fill(values):
+    """Propage le dernier taux connu sur les jours manquants (axe 0)"""
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = np.take_along_axis(values, index, axis=0)
+    # Avant la première cotation d'une paire : aucun taux
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
+
+
+class FxRateTable:
+    """
+    Taux de change journaliers de toutes les paires de devises
+    rates[d, s * n + c] = taux pour convertir 1 unité de la devise s en devise c au jour start_date + d
+    """
+
+    def __init__(self, start_date, currencies, rates):
+        self.start_date = np.datetime64(pd.Timestamp(start_date).normalize(), "D")
+        self.currencies = list(currencies)
+        self.currency_index = pd.Index(self.currencies)
+        self.rates = rates
+        self.num_days = rates.shape[0]
+
+    @classmethod
+    def from_dataframe(cls, taux_df, currencies=None):
+        """
+        Construit la table depuis taux_de_change.csv (colonnes date, code_iso_source, code_iso_cible, taux)
+        Complète les paires manquantes par taux inverse puis par taux croisé via une devise pivot,
+        et propage le dernier taux connu sur les jours sans cotation
+        """
+        dates = pd.to_datetime(taux_df["date"]).to_numpy().astype("datetime64[D]")
+        if currencies is None:
+            currencies = sorted(set(taux_df["code_iso_source"]) | set(taux_df["code_iso_cible"]))
+        currency_index = pd.Index(currencies)
+        n = len(currencies)
+
+        start_date = dates.min()
+        num_days = int((dates.max() - start_date).astype(int)) + 1
+        cube = np.full((num_days, n, n), np.nan)
+
+        source = currency_index.get_indexer(taux_df["code_iso_source"])
+        cible = currency_index.get_indexer(taux_df["code_iso_cible"])
+        known = (source >= 0) & (cible >= 0)
+        days = (dates - start_date).astype(int)
+        cube[days[known], source[known], cible[known]] = taux_df["taux"].to_numpy(dtype="float64")[known]
+
+        # Paires manquantes un jour donné : inverse de la paire opposée du même jour
+        inverse = 1.0 / np.swapaxes(cube, 1, 2)
+        cube = np.where(np.isnan(cube), inverse, cube)
+        cube[:, np.arange(n), np.arange(n)] = 1.0
+
+        cube = _forward_fill(cube.reshape(num_days, n * n)).reshape(num_days, n, n)
+
+        # Paires toujours absentes : taux croisé source → pivot → cible
+        for pivot in range(n):
+            cross = cube[:, :, pivot, None] * cube[:, None, pivot, :]
+            cube = np.where(np.isnan(cube), cross, cube)
+
+        return cls(pd.Timestamp(start_date), currencies, cube.reshape(num_days, n * n))
+
+    def _day_offsets(self, dates):
+        """Décalage en jours depuis start_date ; au-delà de la dernière date, le dernier taux connu s'applique"""
+        dates = np.asarray(dates)
+        if not np.issubdtype(dates.dtype, np.datetime64):
+            dates = pd.to_datetime(dates).to_numpy()
+        days = dates.astype("datetime64[D]")
+        offsets = (days - self.start_date).astype("int64")
+        valid = (offsets >= 0) & ~np.isnat(days)
+        return np.clip(offsets, 0, self.num_days - 1), valid
+
+    def _currency_codes(self, codes, size):
+        """Indices des devises (tableau, Categorical ou scalaire diffusé), -1 si devise inconnue"""
+        if isinstance(codes, pd.Categorical):
+            # Seules les catégories sont recherchées : coût indépendant du nombre de lignes
+            lookup = np.append(self.currency_index.get_indexer(codes.categories), -1)
+            return lookup[codes.codes]
+        if np.ndim(codes) == 0:
+            return np.full(size, self.currency_index.get_indexer([codes])[0])
+        return self.currency_index.get_indexer(pd.Index(codes, dtype=object))
+
+    def rates_for(self, dates, src, tgt):
+        """
+        Taux applicables pour des tableaux de dates, devises source et cible (scalaires acceptés)
+        Retourne un tableau float64 (NaN si devise inconnue ou date antérieure à la première cotation) ;
+        source et cible identiques : 1.0 quelle que soit la date
+        """
+        offsets, valid = self._day_offsets(dates)
+        source = self._currency_codes(src, len(offsets))
+        cible = self._currency_codes(tgt, len(offsets))
+        known = (source >= 0) & (cible >= 0)
+        valid &= known
+
+        pairs = np.where(valid, source * len(self.currencies) + cible, 0)
+        result = self.rates[offsets, pairs]
+        result[~valid] = np.nan
+        result[known & (source == cible)] = 1.0
+        return result
+
+    def rate(self, date, src, tgt):
+        """Taux unique pour une date et une paire de devises"""
+        return float(self.rates_for([date], src, tgt)[0])
+
+    def convert(self, amounts, dates, src, tgt=DEVISE_CONSOLIDATION):
+        """Convertit des montants de src vers tgt au taux applicable à chaque date"""
+        return np.asarray(amounts, dtype="float64") * self.rates_for(dates, src, tgt)
@@ -0,0 +1,162 @@
+"""
+Chargement incrémental et idempotent de FACT_FLUX_TRESORERIE
+- clé métier (cle_metier) et empreinte du contenu (hash_contenu) calculées de façon vectorisée
+- point de reprise (high-water mark) par fichier source dans ETL_HIGH_WATER_MARK
+- upsert via table temporaire + INSERT ... ON CONFLICT (cle_metier, date_operation), limité aux lignes modifiées
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import mark_dates_for_refresh
+from .bulk_load import upsert_dataframe
+from .db import execute_prepared
+from .partitions import ensure_monthly_partitions
+
+# Colonnes identifiant un flux : deux lignes identiques sur ces colonnes sont départagées par leur rang
+# Montant et type d'opération n'en font pas partie : une correction à la source garde la même clé et
+# est détectée par hash_contenu (mise à jour de la ligne, pas de second flux)
+FACT_KEY_COLUMNS = ["date_operation", "id_compte", "id_contrepartie"]
+
+# Colonnes chargées dans FACT_FLUX_TRESORERIE (hors clés techniques)
+FACT_COLUMNS = [
+    "date_operation", "montant_transaction", "montant_consolide_eur",
+    "type_operation", "statut", "id_compte", "id_devise",
+    "id_scenario", "id_temps", "id_contrepartie",
+]
+
+# Nombre de jours relus avant le point de reprise (flux tardifs ou corrigés)
+LOOKBACK_DAYS = int(os.getenv("CRESUS_INCREMENTAL_LOOKBACK_DAYS", "7"))
+
+MONTANT_COLUMNS = {"montant_transaction", "montant_consolide_eur"}
+
+
+def _canonical_columns(df, columns):
+    """
+    Représentation stable des colonnes avant hachage : le résultat ne dépend pas du dtype lu
+    (entier ou flottant, date Python ou datetime64, montant 12.5 ou 12.50)
+    """
+    canonical = {}
+    for column in columns:
+        values = df[column]
+        if column == "date_operation":
+            days = pd.to_datetime(values).to_numpy().astype("datetime64[D]")
+            canonical[column] = np.where(np.isnat(days), -1, days.astype("int64"))
+        elif column in MONTANT_COLUMNS:
+            cents = np.round(pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64") * 100)
+            canonical[column] = np.where(np.isnan(cents), np.iinfo(np.int64).min, cents).astype("int64")
+        elif column.startswith("id_"):
+            ids = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64")
+            canonical[column] = np.where(np.isnan(ids), -1, ids).astype("int64")
+        else:
+            canonical[column] = values.astype("string").fillna("").to_numpy(dtype=object)
+    return pd.DataFrame(canonical)
+
+
+def _hash_rows(frame):
+    """Empreinte 64 bits par ligne, convertie en entier signé (colonne BIGINT)"""
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view("int64")
+
+
+class OccurrenceCounter:
+    """
+    Compteur d'occurrences des clés métier, partagé entre les blocs d'un chargement en flux :
+    deux transactions identiques lues dans deux blocs différents reçoivent des rangs distincts
+    État compact : tableaux NumPy triés (16 octets par clé distincte)
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype="int64")
+        self.counts = np.empty(0, dtype="int64")
+
+    def ranks(self, base_keys):
+        """Rang d'occurrence de chaque clé, en tenant compte des blocs déjà vus"""
+        within_chunk = pd.Series(base_keys).groupby(base_keys, sort=False).cumcount().to_numpy()
+        uniques, inverse, chunk_counts = np.unique(base_keys, return_inverse=True, return_counts=True)
+
+        positions = np.searchsorted(self.keys, uniques)
+        found = np.zeros(len(uniques), dtype=bool)
+        if len(self.keys):
+            found = self.keys[np.minimum(positions, len(self.keys) - 1)] == uniques
+        offsets = np.zeros(len(uniques), dtype="int64")
+        offsets[found] = self.counts[positions[found]]
+
+        self.counts[positions[found]] += chunk_counts[found]
+        self.keys = np.insert(self.keys, positions[~found], uniques[~found])
+        self.counts = np.insert(self.counts, positions[~found], chunk_counts[~found])
+        return within_chunk + offsets[inverse]
+
+
+def add_fact_keys(df, counter=None):
+    """
+    Ajoute cle_metier (clé métier + rang d'occurrence) et hash_contenu (toutes les colonnes chargées)
+    `counter` (OccurrenceCounter) est à fournir lorsque le fichier est traité en plusieurs blocs
+    Retourne un nouveau DataFrame
+    """
+    df = df.copy()
+    key_frame = _canonical_columns(df, FACT_KEY_COLUMNS)
+    # Transactions strictement identiques le même jour : le rang d'apparition les distingue
+    counter = counter if counter is not None else OccurrenceCounter()
+    key_frame["occurrence"] = counter.ranks(_hash_rows(key_frame))
+    df["cle_metier"] = _hash_rows(key_frame)
+    df["hash_contenu"] = _hash_rows(_canonical_columns(df, FACT_COLUMNS))
+    return df
+
+
+def get_high_water_mark(cursor, source):
+    """Dernière date d'opération chargée pour un fichier source (None si jamais chargé)"""
+    execute_prepared(cursor, "cresus_hwm_lecture",
+                     "SELECT derniere_date FROM ETL_HIGH_WATER_MARK WHERE source = $1", (source,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def filter_since_high_water_mark(df, high_water_mark, lookback_days=LOOKBACK_DAYS):
+    """Ne garde que les flux postérieurs au point de reprise moins la fenêtre de relecture"""
+    if high_water_mark is None:
+        return df
+    since = pd.Timestamp(high_water_mark) - pd.Timedelta(days=lookback_days)
+    return df[pd.to_datetime(df["date_operation"]) >= since]
+
+
+def set_high_water_mark(cursor, source, derniere_date, nb_lignes):
+    """Avance le point de reprise du fichier source (jamais de recul)"""
+    if derniere_date is None or pd.isna(derniere_date):
+        return
+    execute_prepared(cursor, "cresus_hwm_ecriture", """
+        INSERT INTO ETL_HIGH_WATER_MARK (source, derniere_date, nb_lignes, maj_le)
+        VALUES ($1, $2, $3, NOW())
+        ON CONFLICT (source) DO UPDATE SET
+            derniere_date = GREATEST(ETL_HIGH_WATER_MARK.derniere_date, EXCLUDED.derniere_date),
+            nb_lignes = EXCLUDED.nb_lignes,
+            maj_le = EXCLUDED.maj_le
+    """, (source, pd.Timestamp(derniere_date).date(), nb_lignes))
+
+
+def update_high_water_mark(cursor, source, df):
+    """Avance le point de reprise du fichier source à la plus grande date chargée"""
+    if df.empty:
+        return
+    set_high_water_mark(cursor, source, pd.to_datetime(df["date_operation"]).max(), len(df))
+
+
+def upsert_facts(cursor, df):
+    """
+    Insère les nouveaux flux et met à jour ceux dont le contenu a changé
+    Les partitions mensuelles manquantes sont créées au préalable ; la contrainte d'unicité d'une table
+    partitionnée inclut la clé de partition (cle_metier intègre déjà date_operation)
+    Les dates chargées sont inscrites pour le rafraîchissement incrémental des agrégats
+    Retourne le nombre de lignes effectivement insérées ou modifiées
+    """
+    if df.empty:
+        return 0
+    ensure_monthly_partitions(cursor, "FACT_FLUX_TRESORERIE", df["date_operation"])
+    mark_dates_for_refresh(cursor, df["date_operation"])
+    return upsert_dataframe(
+        cursor, df, "FACT_FLUX_TRESORERIE",
+        FACT_COLUMNS + ["cle_metier", "hash_contenu"],
+        key=["cle_metier", "date_operation"],
+        change_column="hash_contenu",
+    )
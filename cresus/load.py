@@ -0,0 +1,127 @@
+"""
+Chargement des tables transformées dans PostgreSQL
+Dimensions : COPY direct (tables vidées au préalable) ou COPY dans une table temporaire puis
+INSERT ... ON CONFLICT ; faits : upsert sur la clé métier ou COPY par partition mensuelle
+Avec un identifiant de chargement, chaque table (et chaque lot de faits) est validée séparément et
+une relance reprend après le dernier lot validé (cresus/checkpoints.py)
+"""
+
+from .aggregates import mark_reassigned_accounts
+from .bulk_load import copy_dataframe, upsert_dataframe
+from .checkpoints import commit_batch, frame_signature, get_checkpoint
+from .incremental import FACT_COLUMNS, update_high_water_mark, upsert_facts
+from .metrics import measure
+from .partitions import copy_by_partition
+
+# Tables de dimensions dans l'ordre de chargement (DIM_COMPTE dépend de DIM_DEVISE et DIM_FILIALE)
+# (nom de l'artefact, table, colonnes, clé primaire)
+DIMENSION_TABLES = [
+    ("dim_devise", "DIM_DEVISE", ["id_devise", "code_iso", "libelle_devise"], "id_devise"),
+    ("dim_filiale", "DIM_FILIALE", ["id_filiale", "nom_filiale", "pays", "region"], "id_filiale"),
+    ("dim_scenario", "DIM_SCENARIO", ["id_scenario", "nom_scenario", "description"], "id_scenario"),
+    ("dim_contrepartie", "DIM_CONTREPARTIE",
+     ["id_contrepartie", "nom_contrepartie", "type_contrepartie"], "id_contrepartie"),
+    ("dim_temps", "DIM_TEMPS", ["id_temps", "jour", "mois", "annee"], "id_temps"),
+    ("dim_compte", "DIM_COMPTE",
+     ["id_compte", "numero_compte", "type_compte", "id_devise", "id_filiale"], "id_compte"),
+]
+
+# Clé du point de reprise incrémental de FACT_FLUX_TRESORERIE (fichier unique ou répertoire de parts)
+FACT_SOURCE = "fact_flux_tresorerie.csv"
+
+# Tables vidées avant un rechargement complet (scripts/load_data.py) ; ETL_CACHE_SOURCE : les sources
+# en cache du DAG ne sont plus réputées chargées
+RESET_TABLES = [
+    "FACT_FLUX_TRESORERIE", "ETL_HIGH_WATER_MARK", "ETL_CACHE_SOURCE", "DIM_COMPTE", "DIM_TEMPS",
+    "DIM_SCENARIO", "DIM_DEVISE", "DIM_FILIALE", "DIM_CONTREPARTIE",
+]
+
+# Colonnes de FACT_FLUX_TRESORERIE écrites au chargement
+FACT_LOAD_COLUMNS = FACT_COLUMNS + ["cle_metier", "hash_contenu"]
+
+
+def reset_tables(cursor):
+    """Vide les tables de faits et de dimensions (rechargement propre)"""
+    for table in RESET_TABLES:
+        cursor.execute(f"TRUNCATE TABLE {table} CASCADE;")
+
+
+def load_dimensions(cursor, dataframes, upsert=True, id_chargement=None):
+    """
+    Charge les dimensions présentes dans `dataframes`, dans l'ordre des dépendances
+    upsert=True : INSERT ... ON CONFLICT DO UPDATE (DAG) ; False : COPY direct (tables vidées au préalable)
+    id_chargement : chaque table est validée dès qu'elle est chargée ; celles déjà terminées par une
+    exécution interrompue du même chargement sont sautées
+    Retourne [(table, nombre de lignes)] des tables chargées, dans l'ordre de chargement
+    """
+    loaded = []
+    for name, table, columns, key in DIMENSION_TABLES:
+        if name not in dataframes:
+            continue
+        df = dataframes[name]
+        if id_chargement is not None:
+            signature = frame_signature(df, columns)
+            checkpoint = get_checkpoint(cursor, id_chargement, table, signature, strict=not upsert)
+            if checkpoint and checkpoint["termine"]:
+                print(f"  ↷ {table} déjà chargée (reprise du chargement {id_chargement})")
+                continue
+        with measure("load", name, len(df)) as mesure:
+            if upsert:
+                if table == "DIM_COMPTE":
+                    # Changement de filiale : agrégats mensuels des flux du compte à recalculer
+                    reaffectes = mark_reassigned_accounts(cursor, df)
+                    if reaffectes:
+                        print(f"  ↻ {len(reaffectes)} compte(s) rattaché(s) à une autre filiale : "
+                              f"agrégats de leurs flux à recalculer")
+                mesure["lignes_sortie"] = upsert_dataframe(cursor, df, table, columns, key)
+            else:
+                mesure["lignes_sortie"] = copy_dataframe(cursor, df, table, columns)
+        if id_chargement is not None:
+            commit_batch(cursor, id_chargement, table, signature, len(df), len(df), termine=True)
+        loaded.append((table, len(df)))
+    return loaded
+
+
+def load_facts(cursor, df, upsert=True):
+    """
+    Charge des flux préparés (prepare_fact_flux_tresorerie) dans FACT_FLUX_TRESORERIE
+    upsert=True : seules les lignes nouvelles ou modifiées sont écrites, relancer ne duplique aucun flux ;
+    False : COPY direct dans chaque partition mensuelle (créée si besoin), agrégats à reconstruire ensuite
+    Retourne le nombre de lignes écrites
+    """
+    if df.empty:
+        return 0
+    with measure("load", "fact_flux_tresorerie", len(df)) as mesure:
+        if upsert:
+            mesure["lignes_sortie"] = upsert_facts(cursor, df)
+        else:
+            mesure["lignes_sortie"] = copy_by_partition(cursor, df, "FACT_FLUX_TRESORERIE", FACT_LOAD_COLUMNS)
+    return mesure["lignes_sortie"]
+
+
+def load_fact_frame(cursor, df, upsert=True, source=FACT_SOURCE, id_chargement=None, batch_size=0):
+    """
+    Charge des flux préparés puis avance le point de reprise de la source ; retourne le nombre de lignes écrites
+    id_chargement et batch_size : flux chargés par lots de `batch_size` lignes, chaque lot validé avec sa
+    position ; une relance du même chargement reprend après le dernier lot validé. Le dernier lot et le
+    point de reprise incrémental restent à valider par l'appelant
+    """
+    if id_chargement is None or not batch_size:
+        nb_ecrites = load_facts(cursor, df, upsert)
+        update_high_water_mark(cursor, source, df)
+        return nb_ecrites
+
+    signature = frame_signature(df, ["cle_metier", "hash_contenu"])
+    checkpoint = get_checkpoint(cursor, id_chargement, "FACT_FLUX_TRESORERIE", signature, strict=not upsert)
+    position, nb_ecrites = (checkpoint["position"], checkpoint["nb_chargees"]) if checkpoint else (0, 0)
+    if position:
+        print(f"  ↷ reprise après {position} lignes déjà validées (chargement {id_chargement})")
+
+    while position + batch_size < len(df):
+        fin = position + batch_size
+        nb_ecrites += load_facts(cursor, df.iloc[position:fin], upsert)
+        commit_batch(cursor, id_chargement, "FACT_FLUX_TRESORERIE", signature, fin, nb_ecrites)
+        position = fin
+    nb_ecrites += load_facts(cursor, df.iloc[position:], upsert)
+    update_high_water_mark(cursor, source, df)
+    return nb_ecrites
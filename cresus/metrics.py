@@ -0,0 +1,261 @@
+"""
+Instrumentation du pipeline : durée, lignes en entrée / sortie, débit et pic de mémoire (RSS) de chaque étape,
+par table (extract / transform / load) et par lot de comptes (model)
+- un enregistreur par exécution (start_run), actif pour tout le processus : le moteur mesure ses blocs avec
+  measure(), sans effet lorsqu'aucun enregistreur n'est actif
+- pic de RSS propre à chaque mesure sous Linux (compteur VmHWM remis à zéro au début de la mesure),
+  sinon pic du processus depuis son démarrage (resource), absent sous Windows
+- publication : table PIPELINE_METRICS (tendance entre exécutions), pipeline_metrics.jsonl (une mesure par
+  ligne, ajoutée à chaque exécution) et pipeline_<étape>.prom (format texte Prometheus, dernière exécution,
+  pour le textfile collector de node_exporter)
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import psycopg2
+
+from .bulk_load import copy_dataframe
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Répertoire des fichiers de métriques (JSON Lines et Prometheus)
+METRICS_DIR = Path(os.getenv("CRESUS_METRICS_DIR", "data/metrics"))
+
+METRIC_COLUMNS = [
+    "run_id", "etape", "objet", "debut", "duree_s",
+    "lignes_entree", "lignes_sortie", "lignes_par_s", "rss_max_mo",
+]
+
+# Métriques Prometheus : (nom, colonne agrégée, aide)
+PROMETHEUS_METRICS = [
+    ("cresus_pipeline_duree_secondes", "duree_s", "Durée cumulée de l'étape pour l'objet (secondes)"),
+    ("cresus_pipeline_lignes_entree", "lignes_entree", "Lignes reçues par l'étape"),
+    ("cresus_pipeline_lignes_sortie", "lignes_sortie", "Lignes produites ou écrites par l'étape"),
+    ("cresus_pipeline_lignes_par_seconde", "lignes_par_s", "Débit de l'étape (lignes par seconde)"),
+    ("cresus_pipeline_rss_max_octets", "rss_max_octets", "Pic de mémoire résidente pendant l'étape (octets)"),
+]
+
+_PROC_STATUS = Path("/proc/self/status")
+_PROC_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+_recorder = None
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente (Mo) depuis la dernière remise à zéro, None si indisponible"""
+    try:
+        for line in _PROC_STATUS.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def reset_peak_rss():
+    """
+    Remet le pic de RSS du processus à la mémoire actuelle (Linux) ; le pic atteint jusque-là est d'abord
+    reporté sur les mesures en cours de l'enregistreur actif
+    """
+    if _recorder is not None:
+        _recorder.propagate_peak(peak_rss_mb())
+    try:
+        _PROC_CLEAR_REFS.write_text("5")
+    except OSError:
+        pass
+
+
+class PipelineMetrics:
+    """Mesures d'une exécution du pipeline (`run_id`), dans l'ordre où elles se terminent"""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.records = []
+        self._open = []
+
+    def propagate_peak(self, rss_mb):
+        """Reporte un pic de RSS sur toutes les mesures en cours (les mesures imbriquées remettent le pic à zéro)"""
+        if rss_mb is None:
+            return
+        for mesure in self._open:
+            mesure["_pic"] = max(mesure["_pic"] or 0, rss_mb)
+
+    @contextmanager
+    def measure(self, etape, objet="total", lignes_entree=None):
+        """
+        Mesure un bloc : le dictionnaire renvoyé accepte lignes_entree / lignes_sortie, renseignées dans le bloc
+        La mesure n'est enregistrée que si le bloc se termine sans erreur
+        """
+        reset_peak_rss()
+        mesure = {"lignes_entree": lignes_entree, "lignes_sortie": None, "_pic": None}
+        self._open.append(mesure)
+        debut, start = datetime.now(), time.perf_counter()
+        try:
+            yield mesure
+        finally:
+            self._open.remove(mesure)
+        pic = peak_rss_mb()
+        if mesure["_pic"] is not None:
+            pic = max(pic or 0, mesure["_pic"])
+        self.add(etape, objet, time.perf_counter() - start, mesure["lignes_entree"], mesure["lignes_sortie"],
+                 pic, debut)
+
+    def add(self, etape, objet, duree_s, lignes_entree=None, lignes_sortie=None, rss_max_mo=None, debut=None):
+        """Ajoute une mesure prise ailleurs (processus d'entraînement par exemple)"""
+        lignes = lignes_sortie if lignes_sortie is not None else lignes_entree
+        self.propagate_peak(rss_max_mo)
+        self.records.append({
+            "run_id": self.run_id,
+            "etape": etape,
+            "objet": str(objet),
+            "debut": debut or datetime.now(),
+            "duree_s": duree_s,
+            "lignes_entree": None if lignes_entree is None else int(lignes_entree),
+            "lignes_sortie": None if lignes_sortie is None else int(lignes_sortie),
+            "lignes_par_s": lignes / duree_s if lignes is not None and duree_s > 0 else None,
+            "rss_max_mo": None if rss_max_mo is None else round(rss_max_mo, 1),
+        })
+
+    def to_dataframe(self):
+        """Mesures sous forme de DataFrame (colonnes METRIC_COLUMNS)"""
+        return pd.DataFrame(self.records, columns=METRIC_COLUMNS)
+
+    def summary(self):
+        """Tableau des mesures pour les journaux des tâches"""
+        lines = [f"{'étape':<10} | {'objet':<28} | {'durée (s)':>9} | {'entrée':>10} | {'sortie':>10} | "
+                 f"{'lignes/s':>11} | {'RSS max (Mo)':>12}"]
+        for r in self.records:
+            lines.append(
+                f"{r['etape']:<10} | {r['objet'][:28]:<28} | {r['duree_s']:>9.2f} | "
+                f"{_fmt(r['lignes_entree']):>10} | {_fmt(r['lignes_sortie']):>10} | "
+                f"{_fmt(r['lignes_par_s']):>11} | {_fmt(r['rss_max_mo'], '.1f'):>12}"
+            )
+        return "\n".join(lines)
+
+    def save(self, cursor):
+        """Ajoute les mesures à PIPELINE_METRICS (COPY) ; retourne le nombre de lignes écrites"""
+        df = self.to_dataframe()
+        # Horodatage complet (COPY ramène les colonnes datetime à des dates)
+        df["debut"] = df["debut"].map(datetime.isoformat)
+        return copy_dataframe(cursor, df, "PIPELINE_METRICS", METRIC_COLUMNS)
+
+    def export(self, directory=METRICS_DIR):
+        """
+        Écrit pipeline_metrics.jsonl (ajout) et un fichier pipeline_<étape>.prom par étape mesurée
+        (remplacé atomiquement : le collecteur ne lit jamais un fichier partiel)
+        Retourne la liste des fichiers écrits
+        """
+        if not self.records:
+            return []
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        jsonl = directory / "pipeline_metrics.jsonl"
+        with open(jsonl, "a", encoding="utf-8") as f:
+            for r in self.records:
+                f.write(json.dumps(dict(r, debut=r["debut"].isoformat()), ensure_ascii=False) + "\n")
+
+        written = [jsonl]
+        df = self.to_dataframe()
+        for etape, df_etape in df.groupby("etape", sort=False):
+            path = directory / f"pipeline_{etape}.prom"
+            tmp = path.with_suffix(".prom.tmp")
+            tmp.write_text(_prometheus_text(etape, df_etape), encoding="utf-8")
+            os.replace(tmp, path)
+            written.append(path)
+        return written
+
+
+def _fmt(value, spec=",.0f"):
+    return "" if value is None or pd.isna(value) else format(value, spec)
+
+
+def _prometheus_text(etape, df):
+    """
+    Format texte Prometheus : une série par (étape, objet) ; les mesures répétées d'un même objet
+    (blocs d'un chargement en flux) sont cumulées, le pic de RSS est le maximum
+    """
+    grouped = df.groupby("objet", sort=False).agg(
+        duree_s=("duree_s", "sum"), lignes_entree=("lignes_entree", "sum"),
+        lignes_sortie=("lignes_sortie", "sum"), rss_max_mo=("rss_max_mo", "max"),
+        n_entree=("lignes_entree", "count"), n_sortie=("lignes_sortie", "count"),
+    )
+    grouped.loc[grouped["n_entree"] == 0, "lignes_entree"] = None
+    grouped.loc[grouped["n_sortie"] == 0, "lignes_sortie"] = None
+    lignes = grouped["lignes_sortie"].fillna(grouped["lignes_entree"])
+    grouped["lignes_par_s"] = (lignes / grouped["duree_s"]).where(grouped["duree_s"] > 0)
+    grouped["rss_max_octets"] = grouped["rss_max_mo"] * 1024 * 1024
+
+    lines = []
+    for name, column, help_text in PROMETHEUS_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for objet, value in grouped[column].items():
+            if pd.notna(value):
+                labels = f'etape="{_escape(etape)}",objet="{_escape(objet)}"'
+                lines.append(f"{name}{{{labels}}} {float(value):.6g}")
+    name = "cresus_pipeline_derniere_execution_timestamp_secondes"
+    lines += [f"# HELP {name} Fin de la dernière exécution mesurée de l'étape (epoch)",
+              f"# TYPE {name} gauge", f'{name}{{etape="{_escape(etape)}"}} {time.time():.0f}']
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def start_run(run_id):
+    """Active un nouvel enregistreur pour le processus courant ; retourne l'enregistreur"""
+    global _recorder
+    _recorder = PipelineMetrics(run_id)
+    return _recorder
+
+
+def current_run():
+    """Enregistreur actif (None si aucun)"""
+    return _recorder
+
+
+@contextmanager
+def measure(etape, objet="total", lignes_entree=None):
+    """Mesure un bloc avec l'enregistreur actif ; sans enregistreur, le bloc s'exécute sans mesure"""
+    if _recorder is None:
+        yield {"lignes_entree": lignes_entree, "lignes_sortie": None}
+        return
+    with _recorder.measure(etape, objet, lignes_entree) as mesure:
+        yield mesure
+
+
+def publish_run(conn=None, directory=METRICS_DIR):
+    """
+    Publie les mesures de l'enregistreur actif : journal, fichiers de `directory` et, si `conn` est fourni,
+    PIPELINE_METRICS (validé aussitôt). Une base sans PIPELINE_METRICS (migration 007 non appliquée)
+    n'interrompt pas le pipeline : les mesures restent dans les fichiers
+    """
+    if _recorder is None or not _recorder.records:
+        return
+    print(_recorder.summary())
+    for path in _recorder.export(directory):
+        print(f"  ✓ métriques écrites : {path}")
+    if conn is None:
+        return
+    try:
+        with conn.cursor() as cursor:
+            nb = _recorder.save(cursor)
+        conn.commit()
+        print(f"  ✓ {nb} mesure(s) enregistrée(s) dans PIPELINE_METRICS")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"  ⚠ métriques non enregistrées dans PIPELINE_METRICS : {e}")
@@ -0,0 +1,391 @@
+"""
+Modèle prédictif de régression linéaire pour les prévisions de trésorerie
+Génère des prévisions à 30 jours pour chaque filiale/compte
+"""
+
+import pandas as pd
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+from pathlib import Path
+
+from .bulk_load import copy_dataframe
+from .config import DATA_DIR
+from .forecast_runs import publish_forecast_run, purge_forecast_runs, start_forecast_run
+from .fx_rates import DEVISE_CONSOLIDATION, FxRateTable
+from .metrics import current_run, measure, peak_rss_mb, reset_peak_rss
+
+# Historique des taux de change (pour exprimer les prévisions dans la devise du compte)
+FX_RATES_FILE = Path(os.getenv("CRESUS_FX_RATES_FILE", str(DATA_DIR / "taux_de_change.csv")))
+
+# Nombre de processus d'entraînement (1 = entraînement séquentiel dans le processus courant)
+MODEL_WORKERS = int(os.getenv("CRESUS_MODEL_WORKERS", str(os.cpu_count() or 1)))
+
+# Nombre de comptes envoyés ensemble à un processus (limite les échanges inter-processus)
+MODEL_BATCH_SIZE = int(os.getenv("CRESUS_MODEL_BATCH_SIZE", "16"))
+
+# Colonnes nécessaires à l'entraînement
+TRAINING_COLUMNS = ['date_operation', 'montant_consolide_eur', 'id_compte']
+
+# Features du modèle de régression
+FEATURE_COLUMNS = ['jour_semaine', 'jour_mois', 'mois', 'jours_depuis_debut', 'moyenne_mobile_7j']
+
+
+def get_historical_data(conn):
+    """
+    Récupère les données historiques de trésorerie depuis PostgreSQL
+    """
+    query = """
+    SELECT 
+        f.date_operation,
+        f.montant_consolide_eur,
+        f.id_compte,
+        c.id_filiale,
+        t.annee,
+        t.mois,
+        t.jour
+    FROM FACT_FLUX_TRESORERIE f
+    JOIN DIM_COMPTE c ON f.id_compte = c.id_compte
+    JOIN DIM_TEMPS t ON f.id_temps = t.id_temps
+    WHERE f.statut = 'Réalisé'
+      AND f.montant_consolide_eur IS NOT NULL
+    ORDER BY f.date_operation, f.id_compte
+    """
+    
+    df = pd.read_sql_query(query, conn, parse_dates=['date_operation'])
+    return df
+
+
+def prepare_features(df):
+    """
+    Prépare les features pour le modèle de régression linéaire, pour tous les comptes en une passe
+    Tri unique par (compte, date) puis opérations groupées vectorisées : les lignes de chaque compte
+    sont contiguës (voir account_ranges)
+    """
+    df = df.sort_values(['id_compte', 'date_operation'], kind='stable', ignore_index=True)
+    dates = df['date_operation']
+    
+    # Créer des features temporelles
+    df['jour_semaine'] = dates.dt.dayofweek
+    df['jour_mois'] = dates.dt.day
+    df['mois'] = dates.dt.month
+    df['annee'] = dates.dt.year
+    
+    # Feature de tendance (nombre de jours depuis le début de l'historique du compte)
+    par_compte = df.groupby('id_compte', sort=False)
+    df['jours_depuis_debut'] = (dates - par_compte['date_operation'].transform('min')).dt.days
+    
+    # Moyenne mobile sur 7 jours (pour capturer les tendances), fenêtre remise à zéro à chaque compte
+    df['moyenne_mobile_7j'] = (
+        par_compte['montant_consolide_eur'].rolling(window=7, min_periods=1).mean()
+        .reset_index(level=0, drop=True)
+    )
+    
+    return df
+
+
+def account_ranges(features):
+    """
+    Bornes [début, fin) des lignes de chaque compte dans le DataFrame issu de prepare_features
+    Retourne {id_compte: (début, fin)}
+    """
+    comptes = features['id_compte'].to_numpy()
+    debuts = np.flatnonzero(np.r_[True, comptes[1:] != comptes[:-1]])
+    fins = np.r_[debuts[1:], len(comptes)]
+    return {comptes[debut]: (debut, fin) for debut, fin in zip(debuts, fins)}
+
+
+def fit_account(compte_data):
+    """
+    Entraîne un modèle de régression linéaire sur les lignes d'un compte déjà préparées (prepare_features)
+    Retourne les paramètres utiles à la prévision, None si l'historique est insuffisant
+    """
+    if len(compte_data) < 30:  # Pas assez de données historiques
+        return None
+    
+    # Entraîner le modèle
+    model = LinearRegression()
+    model.fit(compte_data[FEATURE_COLUMNS].values, compte_data['montant_consolide_eur'].values)
+    
+    return {
+        'coef': model.coef_,
+        'intercept': model.intercept_,
+        'premiere_date': compte_data['date_operation'].min(),
+        'derniere_date': compte_data['date_operation'].max(),
+        # Moyenne mobile pour la prévision : dernière valeur connue
+        'moyenne_mobile_7j': compte_data['moyenne_mobile_7j'].iloc[-1],
+    }
+
+
+def predict_forecasts(modeles, forecast_days=30):
+    """
+    Génère les prévisions de tous les comptes sur tout l'horizon en un seul calcul matriciel
+    `modeles` : {id_compte: paramètres issus de fit_account}
+    Chaque prévision est le même produit scalaire que LinearRegression.predict sur une ligne
+    (produit matriciel empilé (n, 1, 5) @ (n, 5, 1)) : résultat identique au bit près
+    """
+    if not modeles:
+        return pd.DataFrame(columns=['date_operation', 'montant_consolide_eur', 'id_compte'])
+    
+    params = list(modeles.values())
+    premieres = np.array([p['premiere_date'] for p in params], dtype='datetime64[ns]')
+    dernieres = np.array([p['derniere_date'] for p in params], dtype='datetime64[ns]')
+    
+    # Dates de prévision : lendemain de la dernière opération de chaque compte, sur forecast_days jours
+    horizon = np.arange(1, forecast_days + 1) * np.timedelta64(1, 'D')
+    dates = pd.DatetimeIndex((dernieres[:, None] + horizon).ravel())
+    jours_depuis_debut = (dates.to_numpy() - np.repeat(premieres, forecast_days)) // np.timedelta64(1, 'D')
+    
+    # Matrice des features de l'horizon (une ligne par compte × jour)
+    X = np.column_stack([
+        dates.dayofweek,     # jour_semaine
+        dates.day,           # jour_mois
+        dates.month,         # mois
+        jours_depuis_debut,  # jours_depuis_debut
+        np.repeat([p['moyenne_mobile_7j'] for p in params], forecast_days),  # moyenne_mobile_7j
+    ]).astype('float64')
+    coefs = np.repeat(np.vstack([p['coef'] for p in params]), forecast_days, axis=0)
+    intercepts = np.repeat([p['intercept'] for p in params], forecast_days)
+    
+    # Prédire
+    predictions = np.matmul(X[:, None, :], coefs[:, :, None])[:, 0, 0] + intercepts
+    
+    return pd.DataFrame({
+        'date_operation': dates,
+        'montant_consolide_eur': predictions,
+        'id_compte': np.repeat(list(modeles), forecast_days),
+    })
+
+
+def train_and_predict(df, id_compte, forecast_days=30):
+    """
+    Entraîne un modèle de régression linéaire pour un compte donné
+    et génère des prévisions (usage ponctuel : train_all_accounts traite tous les comptes ensemble)
+    """
+    modele = fit_account(prepare_features(df[df['id_compte'] == id_compte]))
+    if modele is None:
+        return None
+    return predict_forecasts({id_compte: modele}, forecast_days).to_dict('records')
+
+
+def _train_accounts(batch):
+    """
+    Entraîne les comptes d'un lot [(id_compte, lignes préparées du compte), ...]
+    Une erreur n'interrompt pas le lot : elle est renvoyée pour le compte concerné
+    Retourne (résultats, (durée en s, lignes d'historique, pic de RSS en Mo du processus qui a traité le lot))
+    """
+    reset_peak_rss()
+    start = time.perf_counter()
+    results = []
+    for id_compte, compte_data in batch:
+        try:
+            results.append((id_compte, fit_account(compte_data), None))
+        except Exception as e:
+            results.append((id_compte, None, f"{type(e).__name__}: {e}"))
+    return results, (time.perf_counter() - start, sum(len(data) for _, data in batch), peak_rss_mb())
+
+
+def train_all_accounts(df, forecast_days=30, workers=MODEL_WORKERS, batch_size=MODEL_BATCH_SIZE):
+    """
+    Entraîne un modèle par compte, réparti sur `workers` processus (ProcessPoolExecutor),
+    puis prédit l'horizon de tous les comptes en un seul calcul (predict_forecasts)
+    Les features sont calculées une seule fois pour tous les comptes ; chaque processus ne reçoit
+    que les tranches de lignes de ses comptes, jamais le DataFrame complet
+    Résultats dans l'ordre d'apparition des comptes, quel que soit l'ordre de fin des processus
+    Chaque lot est mesuré dans le processus qui l'entraîne (métriques de l'étape model, une par lot)
+    Retourne (DataFrame des prévisions, nombre de comptes traités, {id_compte: erreur})
+    """
+    features = prepare_features(df[TRAINING_COLUMNS])
+    ranges = account_ranges(features)
+    features = features[['date_operation', 'montant_consolide_eur'] + FEATURE_COLUMNS]
+    comptes = [
+        (id_compte, features.iloc[ranges[id_compte][0]:ranges[id_compte][1]])
+        for id_compte in pd.unique(df['id_compte'])
+    ]
+    batches = [comptes[i:i + batch_size] for i in range(0, len(comptes), batch_size)]
+    
+    if workers <= 1 or len(batches) <= 1:
+        batch_results = [_train_accounts(batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            futures = [executor.submit(_train_accounts, batch) for batch in batches]
+            batch_results = []
+            for future, batch in zip(futures, batches):
+                try:
+                    batch_results.append(future.result())
+                except Exception as e:
+                    # Processus perdu (mémoire, signal...) : tous les comptes du lot sont en échec
+                    batch_results.append(
+                        ([(id_compte, None, f"{type(e).__name__}: {e}") for id_compte, _ in batch], None)
+                    )
+    
+    modeles = {}
+    erreurs = {}
+    recorder = current_run()
+    for numero, (batch, (results, stats)) in enumerate(zip(batches, batch_results), start=1):
+        if recorder is not None and stats is not None:
+            duree, nb_lignes, rss_max = stats
+            objet = f"lot {numero}/{len(batches)} ({len(batch)} comptes)"
+            nb_modeles = sum(modele is not None for _, modele, _ in results)
+            recorder.add("model", objet, duree, lignes_entree=nb_lignes, lignes_sortie=nb_modeles, rss_max_mo=rss_max)
+        for id_compte, modele, erreur in results:
+            if erreur is not None:
+                erreurs[id_compte] = erreur
+            elif modele is not None:
+                modeles[id_compte] = modele
+    return predict_forecasts(modeles, forecast_days), len(modeles), erreurs
+
+
+def convert_forecasts_to_account_currency(conn, forecasts, fx_table):
+    """
+    Calcule montant_transaction (devise du compte) à partir des prévisions en EUR
+    Conversion vectorisée sur l'ensemble des prévisions via la table de taux indexée
+    Retourne un nouveau DataFrame
+    """
+    forecasts_df = pd.DataFrame(forecasts).copy()
+    devises = pd.read_sql_query("""
+        SELECT c.id_compte, d.code_iso
+        FROM DIM_COMPTE c
+        JOIN DIM_DEVISE d ON c.id_devise = d.id_devise
+    """, conn)
+    codes = forecasts_df['id_compte'].map(devises.set_index('id_compte')['code_iso'])
+
+    montants = fx_table.convert(
+        forecasts_df['montant_consolide_eur'].to_numpy(),
+        forecasts_df['date_operation'].to_numpy(dtype='datetime64[ns]'),
+        DEVISE_CONSOLIDATION,
+        codes.to_numpy(dtype=object),
+    )
+    # Devise ou taux inconnu : on conserve le montant en EUR
+    forecasts_df['montant_transaction'] = np.where(
+        np.isnan(montants), forecasts_df['montant_consolide_eur'], np.round(montants, 2)
+    )
+    return forecasts_df
+
+
+def insert_forecasts(conn, forecasts, id_run, id_scenario_previsionnel=2):
+    """
+    Insère les prévisions de l'exécution `id_run` dans FACT_PREVISION (partition de l'exécution)
+    Les prévisions sont envoyées par COPY dans une table temporaire, puis un seul INSERT ... SELECT
+    résout id_temps (DIM_TEMPS) et id_devise (DIM_COMPTE) côté serveur
+    Les prévisions sans date dans DIM_TEMPS ou sans compte connu sont ignorées
+    Retourne le nombre de prévisions insérées
+    """
+    if len(forecasts) == 0:
+        return 0
+    
+    forecasts_df = pd.DataFrame(forecasts)
+    if 'montant_transaction' not in forecasts_df:
+        forecasts_df['montant_transaction'] = forecasts_df['montant_consolide_eur']
+    # Montant dans la devise du compte s'il a été converti, sinon le montant en EUR
+    forecasts_df['montant_transaction'] = forecasts_df['montant_transaction'].fillna(
+        forecasts_df['montant_consolide_eur']
+    )
+    
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TEMP TABLE tmp_previsions (
+            date_operation DATE,
+            montant_transaction NUMERIC(15, 2),
+            montant_consolide_eur NUMERIC(15, 2),
+            id_compte INTEGER
+        ) ON COMMIT DROP
+    """)
+    copy_dataframe(cursor, forecasts_df, "tmp_previsions",
+                   ['date_operation', 'montant_transaction', 'montant_consolide_eur', 'id_compte'])
+    
+    # DIM_TEMPS n'impose pas l'unicité de (annee, mois, jour) : un seul id_temps par date
+    cursor.execute("""
+        INSERT INTO FACT_PREVISION
+        (id_run, date_operation, montant_transaction, montant_consolide_eur,
+         type_operation, statut, id_compte, id_devise, id_scenario, id_temps, id_contrepartie)
+        SELECT
+            %s,
+            p.date_operation,
+            p.montant_transaction,
+            p.montant_consolide_eur,
+            'Prévision modèle',
+            'Prévisionnel',
+            p.id_compte,
+            c.id_devise,
+            %s,
+            t.id_temps,
+            1  -- Contrepartie par défaut
+        FROM tmp_previsions p
+        JOIN (
+            SELECT annee, mois, jour, MIN(id_temps) AS id_temps
+            FROM DIM_TEMPS
+            GROUP BY annee, mois, jour
+        ) t ON t.annee = EXTRACT(YEAR FROM p.date_operation)
+           AND t.mois = EXTRACT(MONTH FROM p.date_operation)
+           AND t.jour = EXTRACT(DAY FROM p.date_operation)
+        JOIN DIM_COMPTE c ON c.id_compte = p.id_compte
+    """, (int(id_run), int(id_scenario_previsionnel)))
+    nb_inserees = cursor.rowcount
+    
+    conn.commit()
+    cursor.close()
+    return nb_inserees
+
+
+def run_forecasts(conn, workers=MODEL_WORKERS, fx_rates_file=FX_RATES_FILE, forecast_days=30):
+    """
+    Génère les prévisions de tous les comptes et les publie comme génération courante
+    Retourne le nombre de prévisions insérées
+    """
+    # Récupérer les données historiques
+    print("Récupération des données historiques...")
+    with measure("model", "historique") as mesure:
+        df = get_historical_data(conn)
+        mesure["lignes_sortie"] = len(df)
+    print(f"✓ {len(df)} enregistrements historiques récupérés")
+    
+    if len(df) == 0:
+        print("✗ Aucune donnée historique trouvée")
+        return 0
+    
+    # Obtenir la liste des comptes uniques
+    comptes_uniques = df['id_compte'].unique()
+    print(f"✓ {len(comptes_uniques)} comptes à traiter")
+    
+    # Générer les prévisions pour chaque compte (en parallèle sur plusieurs processus)
+    print(f"Entraînement des modèles ({workers} processus)...")
+    with measure("model", "entrainement", len(df)) as mesure:
+        forecasts_df, comptes_traites, erreurs = train_all_accounts(df, forecast_days=forecast_days, workers=workers)
+        mesure["lignes_sortie"] = len(forecasts_df)
+    for id_compte, erreur in erreurs.items():
+        print(f"  ✗ Compte {id_compte} : {erreur}")
+    
+    print(f"✓ Prévisions générées pour {comptes_traites} comptes")
+    if erreurs:
+        print(f"⚠ {len(erreurs)} compte(s) en échec")
+    print(f"✓ {len(forecasts_df)} prévisions au total")
+    
+    # Exprimer les prévisions dans la devise de chaque compte
+    fx_rates_file = Path(fx_rates_file)
+    if not forecasts_df.empty and fx_rates_file.exists():
+        fx_table = FxRateTable.from_dataframe(pd.read_csv(fx_rates_file))
+        forecasts_df = convert_forecasts_to_account_currency(conn, forecasts_df, fx_table)
+        print("✓ Prévisions converties dans la devise des comptes")
+    elif not forecasts_df.empty:
+        print(f"⚠ Taux de change introuvables ({fx_rates_file}) : montants conservés en EUR")
+    
+    # Insérer les prévisions dans une nouvelle génération, puis la rendre courante
+    if forecasts_df.empty:
+        return 0
+    id_run = start_forecast_run(conn)
+    print(f"Insertion des prévisions dans la base de données (génération {id_run})...")
+    with measure("model", "fact_prevision", len(forecasts_df)) as mesure:
+        nb_inserees = insert_forecasts(conn, forecasts_df, id_run)
+        mesure["lignes_sortie"] = nb_inserees
+    print(f"✓ {nb_inserees} prévisions insérées avec succès")
+    if nb_inserees < len(forecasts_df):
+        print(f"⚠ {len(forecasts_df) - nb_inserees} prévisions ignorées (date absente de DIM_TEMPS ou compte inconnu)")
+    publish_forecast_run(conn, id_run, nb_inserees)
+    print(f"✓ Génération {id_run} publiée comme prévision courante")
+    purgees = purge_forecast_runs(conn)
+    if purgees:
+        print(f"✓ {len(purgees)} ancienne(s) génération(s) purgée(s)")
+    return nb_inserees
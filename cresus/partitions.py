@@ -0,0 +1,101 @@
+"""
+Partitionnement mensuel de FACT_FLUX_TRESORERIE sur date_operation
+- les partitions manquantes sont créées par l'étape de chargement, d'après les dates des lignes à charger
+- COPY partition par partition (pas de routage ligne à ligne par la table mère)
+- rétention : DETACH puis DROP des mois les plus anciens, sans DELETE massif
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .bulk_load import copy_dataframe
+
+# Nombre de mois conservés dans la table de faits (0 = pas de purge)
+RETENTION_MONTHS = int(os.getenv("CRESUS_FACT_RETENTION_MONTHS", "0"))
+
+
+def partition_name(table, month):
+    """Nom de la partition d'un mois : <table>_AAAA_MM"""
+    return f"{table.lower()}_{pd.Timestamp(month):%Y_%m}"
+
+
+def _months(dates):
+    """Mois (datetime64[M]) de chaque date"""
+    return pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[M]")
+
+
+def ensure_monthly_partitions(cursor, table, dates):
+    """
+    Crée les partitions mensuelles manquantes pour les dates à charger
+    Retourne la liste des partitions concernées
+    """
+    months = np.unique(_months(dates))
+    months = months[~np.isnat(months)]
+    names = []
+    for month in months:
+        name = partition_name(table, month)
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+            (str(month.astype("datetime64[D]")), str((month + 1).astype("datetime64[D]"))),
+        )
+        names.append(name)
+    return names
+
+
+def copy_by_partition(cursor, df, table, columns, date_column="date_operation"):
+    """
+    Charge df dans la table partitionnée : création des partitions manquantes,
+    puis un COPY par partition mensuelle
+    Retourne le nombre de lignes chargées
+    """
+    if df.empty:
+        return 0
+    ensure_monthly_partitions(cursor, table, df[date_column])
+    months = _months(df[date_column])
+    loaded = 0
+    for month, rows in df.groupby(months, sort=True):
+        loaded += copy_dataframe(cursor, rows, partition_name(table, month), columns)
+    return loaded
+
+
+def list_monthly_partitions(cursor, table):
+    """Partitions mensuelles existantes : [(mois, nom)] triées par mois"""
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (table.lower(),))
+    pattern = re.compile(rf"^{re.escape(table.lower())}_(\d{{4}})_(\d{{2}})$")
+    partitions = []
+    for (name,) in cursor.fetchall():
+        match = pattern.match(name)
+        if match:
+            partitions.append((pd.Timestamp(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def drop_partitions_before(cursor, table, before):
+    """
+    Détache puis supprime les partitions des mois entièrement antérieurs à `before`
+    Retourne la liste [(mois, nom)] des partitions supprimées
+    """
+    limit = pd.Timestamp(before).to_period("M").to_timestamp()
+    dropped = []
+    for month, name in list_monthly_partitions(cursor, table):
+        if month < limit:
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+            dropped.append((month, name))
+    return dropped
+
+
+def apply_retention(cursor, table, retention_months=RETENTION_MONTHS, today=None):
+    """Ne conserve que les `retention_months` derniers mois (mois courant compris)"""
+    if retention_months <= 0:
+        return []
+    current = pd.Timestamp(today or pd.Timestamp.today()).to_period("M")
+    return drop_partitions_before(cursor, table, (current - (retention_months - 1)).to_timestamp())
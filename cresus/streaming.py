@@ -0,0 +1,139 @@
+"""
+Traitement en flux du fichier de faits fact_flux_tresorerie.csv
+Le fichier est lu par blocs avec des types explicites ; chaque bloc est transformé puis envoyé dans PostgreSQL
+avant la lecture du suivant : la mémoire consommée dépend de la taille des blocs, pas de l'historique
+La source peut aussi être un répertoire fact_flux_tresorerie/ de parts CSV ou Parquet (génération par parts),
+lues dans l'ordre de leur nom comme une seule table
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .checkpoints import commit_batch, get_checkpoint, source_signature
+from .incremental import OccurrenceCounter
+from .load import load_facts
+from .transformations import prepare_fact_flux_tresorerie
+
+# Nom de la source de faits : fichier fact_flux_tresorerie.csv / .parquet ou répertoire de parts
+FACT_SOURCE_NAME = "fact_flux_tresorerie"
+
+# Taille de bloc par défaut (0 = fichier chargé en une fois)
+DEFAULT_CHUNK_SIZE = int(os.getenv("CRESUS_FACT_CHUNK_SIZE", "0"))
+
+# Types explicites du fichier de faits : pas d'inférence par bloc, pas de type instable d'un bloc à l'autre
+# Les montants restent du texte (nettoyés par la transformation), les identifiants sont des flottants
+# pour tolérer les valeurs manquantes
+FACT_CSV_DTYPES = {
+    "date_operation": "string",
+    "montant_transaction": "string",
+    "montant_consolide_eur": "float64",
+    "type_operation": "string",
+    "statut": "string",
+    "id_compte": "float64",
+    "id_devise": "float64",
+    "id_scenario": "float64",
+    "id_temps": "float64",
+    "id_contrepartie": "float64",
+}
+
+
+def resolve_fact_source(data_dir):
+    """
+    Source de faits de `data_dir` : répertoire de parts fact_flux_tresorerie/ s'il existe,
+    sinon fact_flux_tresorerie.csv, sinon fact_flux_tresorerie.parquet
+    """
+    data_dir = Path(data_dir)
+    candidates = [data_dir / FACT_SOURCE_NAME, data_dir / f"{FACT_SOURCE_NAME}.csv",
+                  data_dir / f"{FACT_SOURCE_NAME}.parquet"]
+    for candidate in candidates:
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError(f"Fichier manquant : {candidates[1]}")
+
+
+def fact_source_files(path):
+    """Fichiers d'une source de faits : les parts d'un répertoire dans l'ordre de leur nom, ou le fichier seul"""
+    path = Path(path)
+    if not path.is_dir():
+        return [path]
+    files = sorted(part for part in path.iterdir() if part.suffix in (".csv", ".parquet"))
+    if not files:
+        raise FileNotFoundError(f"Aucune part CSV ou Parquet dans {path}")
+    return files
+
+
+def read_fact_source(path):
+    """Lit toute la source de faits (parts concaténées dans l'ordre)"""
+    frames = [
+        pq.read_table(file).to_pandas(date_as_object=False) if file.suffix == ".parquet"
+        else pd.read_csv(file, encoding="utf-8")
+        for file in fact_source_files(path)
+    ]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def iter_fact_chunks(path, chunk_size):
+    """Itère sur la source de faits par blocs d'au plus `chunk_size` lignes (un bloc ne chevauche pas deux parts)"""
+    for file in fact_source_files(path):
+        if file.suffix == ".parquet":
+            for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_size):
+                yield batch.to_pandas(date_as_object=False)
+        else:
+            yield from pd.read_csv(file, encoding="utf-8", dtype=FACT_CSV_DTYPES, chunksize=chunk_size)
+
+
+def stream_fact_file(cursor, path, chunk_size, df_compte, df_devise, fx_rates,
+                     high_water_mark=None, upsert=True, id_chargement=None, batch_size=0):
+    """
+    Lit, transforme et charge le fichier de faits bloc par bloc
+    upsert=True : INSERT ... ON CONFLICT sur la clé métier (DAG) ; False : COPY par partition (table vidée au préalable)
+    Les clés sont calculées comme dans le traitement en une fois : un fichier chargé en flux
+    puis rechargé en une fois (ou l'inverse) ne produit aucun doublon
+    id_chargement et batch_size : validation dès que `batch_size` lignes ont été lues depuis la précédente,
+    avec la position atteinte dans la source ; une relance du même chargement relit les blocs déjà validés
+    (transformés pour reconstituer les rangs d'occurrence des clés, sans conversion ni chargement) puis
+    reprend à cette position. Le dernier lot reste à valider par l'appelant
+    Retourne (lignes lues, lignes chargées, dernière date d'opération chargée)
+    """
+    counter = OccurrenceCounter()
+    nb_lues = nb_chargees = position = 0
+    derniere_date = None
+
+    checkpointed = id_chargement is not None and bool(batch_size)
+    if checkpointed:
+        signature = source_signature(fact_source_files(path))
+        checkpoint = get_checkpoint(cursor, id_chargement, "FACT_FLUX_TRESORERIE", signature, strict=not upsert)
+        if checkpoint:
+            position, nb_chargees = checkpoint["position"], checkpoint["nb_chargees"]
+            if checkpoint["derniere_date"] is not None:
+                derniere_date = pd.Timestamp(checkpoint["derniere_date"])
+            print(f"    reprise après {position} lignes déjà validées (chargement {id_chargement})")
+    dernier_commit = position
+
+    for numero, chunk in enumerate(iter_fact_chunks(path, chunk_size), start=1):
+        debut = nb_lues
+        nb_lues += len(chunk)
+        if debut < position:
+            # Lignes déjà validées : seules les occurrences des clés sont comptées
+            prepare_fact_flux_tresorerie(chunk.iloc[:position - debut], high_water_mark=high_water_mark,
+                                         counter=counter)
+            chunk = chunk.iloc[position - debut:]
+            if chunk.empty:
+                continue
+
+        df_fact = prepare_fact_flux_tresorerie(chunk, df_compte, df_devise, fx_rates, high_water_mark, counter)
+        print(f"    bloc {numero} : {len(chunk)} lignes lues, {len(df_fact)} à charger")
+        if not df_fact.empty:
+            nb_chargees += load_facts(cursor, df_fact, upsert)
+            chunk_max = df_fact["date_operation"].max()
+            derniere_date = chunk_max if derniere_date is None else max(derniere_date, chunk_max)
+
+        if checkpointed and nb_lues - dernier_commit >= batch_size:
+            commit_batch(cursor, id_chargement, "FACT_FLUX_TRESORERIE", signature, nb_lues, nb_chargees,
+                         derniere_date)
+            dernier_commit = nb_lues
+
+    return nb_lues, nb_chargees, derniere_date
@@ -0,0 +1,196 @@
+"""
+Transformations vectorisées des dimensions et de la table de faits FACT_FLUX_TRESORERIE (Section 2.7)
+Partagées par le DAG Airflow et par scripts/load_data.py
+Toutes les opérations travaillent sur des colonnes entières (pandas / NumPy), sans boucle Python par ligne
+"""
+
+import numpy as np
+import pandas as pd
+
+from .consolidation import consolidate_eur
+from .incremental import add_fact_keys, filter_since_high_water_mark
+from .metrics import measure
+
+# Caractères supprimés des montants : tout sauf chiffres, point et signe moins
+AMOUNT_INVALID_CHARS = r"[^\d\.\-]"
+
+# Dictionnaire de mapping pays -> région
+PAYS_REGION_MAPPING = {
+    "France": "Europe",
+    "Allemagne": "Europe",
+    "Royaume-Uni": "Europe",
+    "Suisse": "Europe",
+    "Espagne": "Europe",
+    "Italie": "Europe",
+    "Belgique": "Europe",
+    "Pays-Bas": "Europe",
+    "Portugal": "Europe",
+    "Autriche": "Europe",
+}
+
+# Dictionnaire de normalisation type_contrepartie (premier mot-clé contenu dans la valeur)
+TYPE_CONTREPARTIE_MAPPING = {
+    "client": "Client",
+    "fournisseur": "Fournisseur",
+    "banque": "Banque partenaire",
+    "institution": "Institution financière",
+    "partenaire": "Banque partenaire",
+}
+
+# Colonnes obligatoires dans FACT_FLUX_TRESORERIE
+FACT_REQUIRED_COLUMNS = [
+    "date_operation", "montant_transaction", "id_compte", "id_devise",
+    "id_scenario", "id_temps", "id_contrepartie",
+]
+
+
+def _map_unique(series, func):
+    """
+    Applique `func` sur les valeurs distinctes d'une colonne puis redistribue le résultat
+    Les colonnes texte des faits ont une faible cardinalité : on ne traite que quelques valeurs
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    mapped = np.array([func(value) for value in uniques], dtype=object)
+    result = np.empty(len(series), dtype=object)
+    valid = codes >= 0
+    result[valid] = mapped[codes[valid]]
+    result[~valid] = None
+    return pd.Series(result, index=series.index, name=series.name)
+
+
+def clean_amounts(series):
+    """Nettoie les montants en supprimant les caractères non numériques (NaN si invalide)"""
+    if pd.api.types.is_numeric_dtype(series):
+        # Colonne déjà numérique à la lecture du CSV : rien à nettoyer
+        return series.astype("float64")
+
+    # Conversion directe : la grande majorité des montants est déjà propre
+    amounts = pd.to_numeric(series, errors="coerce").astype("float64")
+
+    # Nettoyage par expression régulière uniquement sur les valeurs non converties
+    dirty = amounts.isna() & series.notna()
+    if dirty.any():
+        cleaned = series[dirty].astype("string").str.replace(AMOUNT_INVALID_CHARS, "", regex=True)
+        amounts[dirty] = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+    return amounts
+
+
+def normalize_type_operation(series):
+    """Normalise type_operation en minuscules sans espaces superflus"""
+    return _map_unique(series, lambda value: str(value).lower().strip())
+
+
+def parse_operation_dates(series):
+    """Convertit date_operation en date (datetime64 tronqué au jour, NaT si invalide)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.normalize()
+    # Quelques milliers de dates distinctes pour des millions de lignes : on ne parse que les valeurs uniques
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    parsed = pd.to_datetime(pd.Series(uniques), format="ISO8601", errors="coerce").dt.normalize().to_numpy()
+    result = np.full(len(series), np.datetime64("NaT"), dtype=parsed.dtype)
+    valid = codes >= 0
+    result[valid] = parsed[codes[valid]]
+    return pd.Series(result, index=series.index, name=series.name)
+
+
+def fill_consolidated_eur(montant_consolide_eur, montant_transaction):
+    """Complète montant_consolide_eur manquant avec montant_transaction"""
+    consolide = pd.to_numeric(montant_consolide_eur, errors="coerce").to_numpy(dtype="float64")
+    transaction = montant_transaction.to_numpy(dtype="float64")
+    return pd.Series(
+        np.where(np.isnan(consolide), transaction, consolide),
+        index=montant_transaction.index,
+        name="montant_consolide_eur",
+    )
+
+
+def mask_account_numbers(series):
+    """Masque partiellement les numéros de compte (ex: FR76 **** **** **** 1234), sauf les plus courts"""
+    numeros = series.astype("string").str.strip()
+    masked = numeros.str[:4] + " **** **** **** " + numeros.str[-4:]
+    result = numeros.where(numeros.str.len() <= 8, masked)
+    return result.astype(object).where(series.notna(), series)
+
+
+def _normalize_type_contrepartie(value):
+    """Type de contrepartie normalisé via TYPE_CONTREPARTIE_MAPPING (valeur inchangée si non trouvée)"""
+    type_lower = str(value).lower().strip()
+    for key, normalized in TYPE_CONTREPARTIE_MAPPING.items():
+        if key in type_lower:
+            return normalized
+    return value
+
+
+def normalize_type_contrepartie(series):
+    """Normalise type_contrepartie via dictionnaire"""
+    return _map_unique(series, _normalize_type_contrepartie)
+
+
+def transform_dimensions(dataframes):
+    """
+    Transformations des dimensions : région déduite du pays (DIM_FILIALE), masquage des numéros de compte
+    (DIM_COMPTE), normalisation du type de contrepartie (DIM_CONTREPARTIE)
+    Retourne un nouveau dictionnaire {nom: DataFrame} ; les dimensions absentes sont ignorées
+    """
+    dataframes = dict(dataframes)
+    if "dim_filiale" in dataframes:
+        with measure("transform", "dim_filiale", len(dataframes["dim_filiale"])) as mesure:
+            df_filiale = dataframes["dim_filiale"].copy()
+            df_filiale["region"] = df_filiale["pays"].map(PAYS_REGION_MAPPING).fillna(df_filiale["region"])
+            dataframes["dim_filiale"] = df_filiale
+            mesure["lignes_sortie"] = len(df_filiale)
+    if "dim_compte" in dataframes:
+        with measure("transform", "dim_compte", len(dataframes["dim_compte"])) as mesure:
+            df_compte = dataframes["dim_compte"].copy()
+            df_compte["numero_compte"] = mask_account_numbers(df_compte["numero_compte"])
+            dataframes["dim_compte"] = df_compte
+            mesure["lignes_sortie"] = len(df_compte)
+    if "dim_contrepartie" in dataframes:
+        with measure("transform", "dim_contrepartie", len(dataframes["dim_contrepartie"])) as mesure:
+            df_contrepartie = dataframes["dim_contrepartie"].copy()
+            df_contrepartie["type_contrepartie"] = normalize_type_contrepartie(df_contrepartie["type_contrepartie"])
+            dataframes["dim_contrepartie"] = df_contrepartie
+            mesure["lignes_sortie"] = len(df_contrepartie)
+    return dataframes
+
+
+def transform_fact_flux_tresorerie(df, df_compte=None, df_devise=None, fx_rates=None):
+    """
+    Applique l'ensemble des transformations de FACT_FLUX_TRESORERIE (Section 2.7)
+    Si DIM_COMPTE, DIM_DEVISE et les taux de change (FxRateTable ou DataFrame taux_de_change) sont
+    fournis, montant_consolide_eur est converti en EUR ; sinon il est complété avec montant_transaction
+    Retourne un nouveau DataFrame
+    """
+    df_fact = df.copy()
+    df_fact["date_operation"] = parse_operation_dates(df_fact["date_operation"])
+    df_fact["montant_transaction"] = clean_amounts(df_fact["montant_transaction"])
+    df_fact["type_operation"] = normalize_type_operation(df_fact["type_operation"])
+    if df_compte is not None and df_devise is not None and fx_rates is not None:
+        df_fact["montant_consolide_eur"] = consolidate_eur(df_fact, df_compte, df_devise, fx_rates)
+    else:
+        df_fact["montant_consolide_eur"] = fill_consolidated_eur(
+            df_fact["montant_consolide_eur"], df_fact["montant_transaction"]
+        )
+    return df_fact
+
+
+def prepare_fact_flux_tresorerie(df, df_compte=None, df_devise=None, fx_rates=None, high_water_mark=None,
+                                 counter=None):
+    """
+    Prépare des flux pour le chargement : seuls les flux depuis le point de reprise (moins la fenêtre de
+    relecture) sont transformés, les lignes sans colonne obligatoire sont écartées, puis cle_metier et
+    hash_contenu sont calculés (`counter` : OccurrenceCounter partagé entre les blocs d'un traitement en flux)
+    montant_consolide_eur reste vide (NULL en base) pour un flux sans taux de change applicable, quel que
+    soit le mode de chargement : les agrégats l'ignorent et le modèle de prévision l'écarte
+    Même traitement pour le DAG et scripts/load_data.py, en une fois ou bloc par bloc
+    Retourne un nouveau DataFrame
+    """
+    with measure("transform", "fact_flux_tresorerie", len(df)) as mesure:
+        df = df.copy()
+        df["date_operation"] = parse_operation_dates(df["date_operation"])
+        df = filter_since_high_water_mark(df, high_water_mark)
+        df_fact = transform_fact_flux_tresorerie(df, df_compte, df_devise, fx_rates)
+        df_fact = df_fact.dropna(subset=FACT_REQUIRED_COLUMNS)
+        df_fact = add_fact_keys(df_fact, counter)
+        mesure["lignes_sortie"] = len(df_fact)
+    return df_fact
@@ -1,56 +1,110 @@
 """
 DAG Apache Airflow pour le pipeline ETL du POC Crésus
-Orchestre : Extract → Transform → Load → Model
+Orchestre : Extract → Transform → Load → Aggregates → Model
 """
 
 from datetime import datetime, timedelta
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from airflow.operators.bash import BashOperator
-import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_values
+import functools
 import os
+import subprocess
+import sys
 from pathlib import Path
-import re
-
-# Configuration
-DATA_SOURCES_DIR = Path("/opt/airflow/data/sources")  # Chemin dans le conteneur Airflow
-LOCAL_DATA_DIR = Path("/opt/airflow/data/sources")  # Même chemin dans Docker
-
-# Configuration PostgreSQL (peut être surchargée par variables d'environnement)
-DB_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "postgres"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-    "database": os.getenv("POSTGRES_DB", "cresus_db"),
-    "user": os.getenv("POSTGRES_USER", "postgres"),
-    "password": os.getenv("POSTGRES_PASSWORD", "postgres")
-}
 
-# Dictionnaire de mapping pays -> région
-PAYS_REGION_MAPPING = {
-    "France": "Europe",
-    "Allemagne": "Europe",
-    "Royaume-Uni": "Europe",
-    "Suisse": "Europe",
-    "Espagne": "Europe",
-    "Italie": "Europe",
-    "Belgique": "Europe",
-    "Pays-Bas": "Europe",
-    "Portugal": "Europe",
-    "Autriche": "Europe",
-}
+# Racine du projet : /opt/airflow dans le conteneur (volumes ./dags, ./cresus, ./scripts), sinon le dépôt
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DATA_SOURCES_DIR = Path(os.getenv("CRESUS_DATA_DIR", "/opt/airflow/data/sources"))  # Chemin dans le conteneur
 
-# Dictionnaire de normalisation type_contrepartie
-TYPE_CONTREPARTIE_MAPPING = {
-    "client": "Client",
-    "fournisseur": "Fournisseur",
-    "banque": "Banque partenaire",
-    "institution": "Institution financière",
-    "partenaire": "Banque partenaire",
-}
+sys.path.insert(0, str(ROOT_DIR))
+from cresus.aggregates import mark_months_for_refresh, refresh_aggregates  # noqa: E402
+from cresus.artifact_store import get_artifact_store  # noqa: E402
+from cresus.checkpoints import DEFAULT_BATCH_SIZE, clear_checkpoints  # noqa: E402
+from cresus.db import connection, get_connection, release_connection  # noqa: E402
+from cresus.extract import FACT_TABLE, SOURCE_FILES, extract_sources  # noqa: E402
+from cresus.extract_cache import (  # noqa: E402
+    EXTRACT_CACHE_ENABLED, cache_artifact, plan_extraction, purge_artifacts, record_load, report_lines,
+    reused_tables,
+)
+from cresus.fx_rates import FxRateTable  # noqa: E402
+from cresus.incremental import get_high_water_mark, set_high_water_mark  # noqa: E402
+from cresus.load import FACT_SOURCE, load_dimensions, load_fact_frame  # noqa: E402
+from cresus.metrics import measure, publish_run, start_run  # noqa: E402
+from cresus.partitions import apply_retention  # noqa: E402
+from cresus.streaming import DEFAULT_CHUNK_SIZE, resolve_fact_source, stream_fact_file  # noqa: E402
+from cresus.transformations import prepare_fact_flux_tresorerie, transform_dimensions  # noqa: E402
+
+# Métriques des tâches (PIPELINE_METRICS et fichiers JSON Lines / Prometheus)
+METRICS_DIR = Path(os.getenv("CRESUS_METRICS_DIR", "/opt/airflow/data/metrics"))
+
+# Artefacts échangés entre les tâches
+TABLES = list(SOURCE_FILES) + ["fact_flux_tresorerie"]
+
+
+def _instrumented(etape):
+    """
+    Mesure la tâche entière (durée, pic de RSS) et les tables qu'elle traite, puis publie les métriques
+    dans PIPELINE_METRICS et dans METRICS_DIR
+    """
+    def decorator(task):
+        @functools.wraps(task)
+        def wrapper(**context):
+            start_run(context['run_id'])
+            with measure(etape):
+                result = task(**context)
+            with connection() as conn:
+                publish_run(conn, METRICS_DIR)
+            return result
+        return wrapper
+    return decorator
+
+
+def _dag_conf(context):
+    """Configuration passée au déclenchement du DAG (dag_run.conf)"""
+    dag_run = context.get('dag_run')
+    return (dag_run.conf if dag_run else None) or {}
 
 
+def _full_reload(context):
+    """Rechargement complet : déclencher le DAG avec la configuration {"full_reload": true}"""
+    return bool(_dag_conf(context).get('full_reload', False))
+
+
+def _fact_chunk_size(context):
+    """
+    Taille des blocs de lecture du fichier de faits (0 = lecture en une fois)
+    Variable CRESUS_FACT_CHUNK_SIZE, surchargeable par la configuration {"chunk_size": N}
+    """
+    return int(_dag_conf(context).get('chunk_size', DEFAULT_CHUNK_SIZE) or 0)
+
+
+def _load_batch_size(context):
+    """
+    Lignes de faits par lot validé au chargement (0 = une seule transaction)
+    Variable CRESUS_LOAD_BATCH_SIZE, surchargeable par la configuration {"batch_size": N}
+    """
+    return int(_dag_conf(context).get('batch_size', DEFAULT_BATCH_SIZE) or 0)
+
+
+def _extract_cache_plan(context):
+    """
+    Sources réutilisées ou retraitées par cette exécution (cresus/extract_cache.py) ; {} si le cache
+    est désactivé (CRESUS_EXTRACT_CACHE=0). Un rechargement complet retraite toutes les sources
+    """
+    if not EXTRACT_CACHE_ENABLED:
+        return {}
+    sources = {name: DATA_SOURCES_DIR / file_name for name, file_name in SOURCE_FILES.items()}
+    sources[FACT_TABLE] = resolve_fact_source(DATA_SOURCES_DIR)
+    with connection() as conn, conn.cursor() as cursor:
+        plan = plan_extraction(cursor, sources, full_reload=_full_reload(context))
+    if plan:
+        print("Cache de l'extraction :")
+        print("\n".join(report_lines(plan)))
+    return plan
+
+
+@_instrumented("extract")
 def extract_data(**context):
     """
     Tâche 1 : Extract - Lire les fichiers CSV sources
@@ -59,47 +113,60 @@ def extract_data(**context):
     print("TÂCHE 1 : EXTRACT")
     print("=" * 60)
     
-    # Déterminer le répertoire de données (essayer d'abord le chemin Airflow, puis local)
-    if DATA_SOURCES_DIR.exists():
-        data_dir = DATA_SOURCES_DIR
-    elif LOCAL_DATA_DIR.exists():
-        data_dir = LOCAL_DATA_DIR
-    else:
-        raise FileNotFoundError(f"Aucun répertoire de données trouvé. Cherché : {DATA_SOURCES_DIR} et {LOCAL_DATA_DIR}")
-    
-    print(f"Lecture des fichiers CSV depuis : {data_dir}")
-    
-    csv_files = {
-        "dim_filiale": data_dir / "dim_filiale.csv",
-        "dim_devise": data_dir / "dim_devise.csv",
-        "dim_scenario": data_dir / "dim_scenario.csv",
-        "dim_contrepartie": data_dir / "dim_contrepartie.csv",
-        "dim_compte": data_dir / "dim_compte.csv",
-        "dim_temps": data_dir / "dim_temps.csv",
-        "fact_flux_tresorerie": data_dir / "fact_flux_tresorerie.csv",
-        "taux_de_change": data_dir / "taux_de_change.csv",
-    }
-    
-    dataframes = {}
-    
-    for name, file_path in csv_files.items():
-        if file_path.exists():
-            print(f"  ✓ Lecture de {file_path.name}...")
-            df = pd.read_csv(file_path, encoding="utf-8")
-            dataframes[name] = df
-            print(f"    → {len(df)} lignes chargées")
-        else:
-            print(f"  ✗ Fichier non trouvé : {file_path}")
-            raise FileNotFoundError(f"Fichier manquant : {file_path}")
+    if not DATA_SOURCES_DIR.exists():
+        raise FileNotFoundError(f"Aucun répertoire de données trouvé. Cherché : {DATA_SOURCES_DIR}")
+    print(f"Lecture des fichiers CSV depuis : {DATA_SOURCES_DIR}")
+    
+    # Purger les artefacts des anciennes exécutions avant d'écrire ceux de ce run
+    store = get_artifact_store()
+    run_id = context['run_id']
+    removed = store.cleanup(exclude=run_id)
+    if removed:
+        print(f"  ✓ {len(removed)} exécution(s) précédente(s) purgée(s) du stockage d'artefacts")
+    
+    # Sources inchangées depuis leur dernier chargement : ni relues, ni transformées, ni rechargées
+    plan = _extract_cache_plan(context)
+    reutilisees = reused_tables(plan)
+    
+    # Faits : fichier CSV / Parquet unique ou répertoire de parts (etl/generate_data.py --shards)
+    # Mode flux : le fichier de faits n'est pas lu ici, Load le traitera bloc par bloc
+    chunk_size = _fact_chunk_size(context)
+    dataframes, fact_path = extract_sources(
+        DATA_SOURCES_DIR, read_facts=not chunk_size and FACT_TABLE not in reutilisees,
+        names=[name for name in SOURCE_FILES if name not in reutilisees],
+    )
+    if chunk_size and FACT_TABLE not in reutilisees:
+        context['ti'].xcom_push(key="fact_flux_tresorerie_source", value=str(fact_path))
+        print(f"  ✓ {fact_path.name} sera lu par blocs de {chunk_size} lignes au chargement")
+    for name, df in dataframes.items():
+        print(f"  ✓ {name} : {len(df)} lignes chargées")
     
-    # Stocker les dataframes dans XCom pour les tâches suivantes
+    # Écrire les dataframes dans le stockage d'artefacts ; seul le chemin passe par XCom
     for name, df in dataframes.items():
-        context['ti'].xcom_push(key=name, value=df.to_dict('records'))
+        path = store.write(run_id, "extract", name, df)
+        context['ti'].xcom_push(key=name, value=path)
+    # Dimensions et taux inchangés : l'artefact transformé en cache remplace la source
+    for name in SOURCE_FILES:
+        if name in reutilisees:
+            context['ti'].xcom_push(key=name, value=plan[name]["artefact"])
+    context['ti'].xcom_push(key="cache_plan", value=plan)
     
     print("✓ Extract terminé avec succès")
     return len(dataframes)
 
 
+def _read_artifacts(context, task_id, names):
+    """Relit les artefacts dont les chemins ont été publiés dans XCom par `task_id`"""
+    store = get_artifact_store()
+    dataframes = {}
+    for name in names:
+        path = context['ti'].xcom_pull(key=name, task_ids=task_id)
+        if path:
+            dataframes[name] = store.read(path)
+    return dataframes
+
+
+@_instrumented("transform")
 def transform_data(**context):
     """
     Tâche 2 : Transform - Appliquer les transformations de mapping (Section 2.7)
@@ -108,359 +175,183 @@ def transform_data(**context):
     print("TÂCHE 2 : TRANSFORM")
     print("=" * 60)
     
-    # Récupérer les données depuis XCom
-    dataframes = {}
-    for name in ["dim_filiale", "dim_devise", "dim_scenario", "dim_contrepartie", 
-                 "dim_compte", "dim_temps", "fact_flux_tresorerie", "taux_de_change"]:
-        records = context['ti'].xcom_pull(key=name, task_ids='extract')
-        if records:
-            dataframes[name] = pd.DataFrame(records)
-    
-    # Récupérer les taux de change pour le calcul de montant_consolide_eur
-    taux_df = dataframes.get("taux_de_change", pd.DataFrame())
-    
-    # TRANSFORMATION 1 : DIM_FILIALE - Ajouter région automatiquement
-    if "dim_filiale" in dataframes:
-        df_filiale = dataframes["dim_filiale"].copy()
-        df_filiale['region'] = df_filiale['pays'].map(PAYS_REGION_MAPPING).fillna(df_filiale['region'])
-        dataframes["dim_filiale"] = df_filiale
-        print("✓ Transformation DIM_FILIALE : région ajoutée automatiquement")
-    
-    # TRANSFORMATION 2 : DIM_COMPTE - Masquage partiel du numéro de compte
-    if "dim_compte" in dataframes:
-        df_compte = dataframes["dim_compte"].copy()
-        
-        def mask_account_number(numero):
-            """Masque partiellement un numéro de compte (ex: FR76 **** **** **** 1234)"""
-            if pd.isna(numero):
-                return numero
-            numero_str = str(numero).strip()
-            # Garder les 4 premiers caractères et les 4 derniers, masquer le reste
-            if len(numero_str) > 8:
-                masked = numero_str[:4] + " **** **** **** " + numero_str[-4:]
-            else:
-                masked = numero_str
-            return masked
-        
-        df_compte['numero_compte'] = df_compte['numero_compte'].apply(mask_account_number)
-        dataframes["dim_compte"] = df_compte
-        print("✓ Transformation DIM_COMPTE : masquage partiel des numéros de compte")
-    
-    # TRANSFORMATION 3 : DIM_CONTREPARTIE - Normalisation type_contrepartie
-    if "dim_contrepartie" in dataframes:
-        df_contrepartie = dataframes["dim_contrepartie"].copy()
-        
-        def normalize_type_contrepartie(type_str):
-            """Normalise le type de contrepartie via dictionnaire"""
-            if pd.isna(type_str):
-                return type_str
-            type_lower = str(type_str).lower().strip()
-            for key, value in TYPE_CONTREPARTIE_MAPPING.items():
-                if key in type_lower:
-                    return value
-            return type_str  # Retourner tel quel si non trouvé
-        
-        df_contrepartie['type_contrepartie'] = df_contrepartie['type_contrepartie'].apply(
-            normalize_type_contrepartie
-        )
-        dataframes["dim_contrepartie"] = df_contrepartie
-        print("✓ Transformation DIM_CONTREPARTIE : normalisation type_contrepartie")
+    # Dimensions : région déduite du pays, masquage des numéros de compte, normalisation des contreparties
+    # (sources réutilisées : artefacts du cache, déjà transformés)
+    plan = context['ti'].xcom_pull(key="cache_plan", task_ids='extract') or {}
+    dataframes = _read_artifacts(context, 'extract', TABLES)
+    en_cache = {name: dataframes.pop(name) for name in reused_tables(plan) if name in dataframes}
+    dataframes = dict(transform_dimensions(dataframes), **en_cache)
+    print("✓ Transformations DIM_FILIALE, DIM_COMPTE, DIM_CONTREPARTIE effectuées")
     
-    # TRANSFORMATION 4 : FACT_FLUX_TRESORERIE - Transformations multiples
+    # Faits : dates, montants, type d'opération, conversion en EUR, clé métier et empreinte
     if "fact_flux_tresorerie" in dataframes:
-        df_fact = dataframes["fact_flux_tresorerie"].copy()
+        # Chargement incrémental : seuls les flux depuis le point de reprise sont traités
+        high_water_mark = None
+        if not _full_reload(context):
+            with connection() as conn, conn.cursor() as cursor:
+                high_water_mark = get_high_water_mark(cursor, FACT_SOURCE)
         
-        # 4.1 : date_operation → format SQL DATE
-        df_fact['date_operation'] = pd.to_datetime(df_fact['date_operation'], errors='coerce').dt.date
-        print("✓ Transformation date_operation : conversion au format SQL DATE")
-        
-        # 4.2 : montant_transaction → nettoyage (suppression caractères non numériques)
-        def clean_amount(amount):
-            """Nettoie le montant en supprimant les caractères non numériques"""
-            if pd.isna(amount):
-                return None
-            amount_str = str(amount)
-            # Garder seulement les chiffres, le point et le signe moins
-            cleaned = re.sub(r'[^\d\.\-]', '', amount_str)
-            try:
-                return float(cleaned) if cleaned else None
-            except:
-                return None
-        
-        df_fact['montant_transaction'] = df_fact['montant_transaction'].apply(clean_amount)
-        print("✓ Transformation montant_transaction : nettoyage effectué")
-        
-        # 4.3 : type_operation → normalisation minuscules
-        df_fact['type_operation'] = df_fact['type_operation'].str.lower().str.strip()
-        print("✓ Transformation type_operation : normalisation en minuscules")
-        
-        # 4.4 : montant_consolide_eur → calcul via taux_de_change.csv
-        def calculate_eur_amount(row, taux_df):
-            """Calcule le montant consolidé en EUR"""
-            if pd.isna(row['montant_transaction']) or row['montant_transaction'] == 0:
-                return None
-            
-            # Si la devise est déjà EUR, retourner le montant tel quel
-            # Note: On devrait avoir id_devise, mais pour simplifier, on utilise une logique basée sur le compte
-            # Dans un vrai scénario, on joindrait avec DIM_COMPTE et DIM_DEVISE
-            
-            # Pour le POC, on suppose que si montant_consolide_eur est None, on doit le calculer
-            # On récupère le taux de change pour la date et la devise
-            if not taux_df.empty and 'date_operation' in row:
-                date_str = str(row['date_operation'])
-                # Chercher un taux EUR dans taux_df (simplification)
-                # En réalité, il faudrait connaître la devise source depuis DIM_COMPTE
-                # Pour le POC, on utilise un taux moyen EUR/USD si disponible
-                eur_rates = taux_df[
-                    (taux_df['code_iso_source'] == 'EUR') & 
-                    (taux_df['code_iso_cible'] == 'USD') &
-                    (taux_df['date'] == date_str)
-                ]
-                if not eur_rates.empty:
-                    # Si devise source != EUR, convertir
-                    # Pour simplifier le POC, on retourne le montant tel quel si déjà en EUR
-                    return row['montant_transaction']
-            
-            return row['montant_transaction']  # Par défaut, retourner tel quel
-        
-        # Note: Le calcul réel nécessiterait une jointure avec DIM_COMPTE et DIM_DEVISE
-        # Pour le POC, on simplifie en utilisant directement montant_transaction si montant_consolide_eur est None
-        df_fact['montant_consolide_eur'] = df_fact.apply(
-            lambda row: row['montant_consolide_eur'] if pd.notna(row['montant_consolide_eur']) 
-            else row['montant_transaction'], 
-            axis=1
+        # Table de taux indexée (jour × paire de devises), construite une seule fois par exécution
+        taux_df = dataframes.get("taux_de_change")
+        fx_table = FxRateTable.from_dataframe(taux_df) if taux_df is not None and not taux_df.empty else None
+        nb_total = len(dataframes["fact_flux_tresorerie"])
+        dataframes["fact_flux_tresorerie"] = prepare_fact_flux_tresorerie(
+            dataframes["fact_flux_tresorerie"], dataframes.get("dim_compte"), dataframes.get("dim_devise"),
+            fx_table, high_water_mark,
         )
-        print("✓ Transformation montant_consolide_eur : calcul effectué")
-        
-        dataframes["fact_flux_tresorerie"] = df_fact
+        print(f"✓ Point de reprise {high_water_mark} : {len(dataframes['fact_flux_tresorerie'])}/{nb_total} flux à traiter")
         print("✓ Transformations FACT_FLUX_TRESORERIE terminées")
     
-    # Stocker les dataframes transformés dans XCom
+    # Écrire les dataframes transformés dans le stockage d'artefacts ; dimensions et taux retraités :
+    # dans le cache, pour être réutilisés tant que leur source ne change pas
+    store = get_artifact_store()
     for name, df in dataframes.items():
-        context['ti'].xcom_push(key=name, value=df.to_dict('records'))
+        if name in en_cache:
+            path = plan[name]["artefact"]
+        elif name in plan and name != FACT_TABLE:
+            path = cache_artifact(name, df, plan[name])
+        else:
+            path = store.write(context['run_id'], "transform", name, df)
+        context['ti'].xcom_push(key=name, value=path)
+    context['ti'].xcom_push(key="cache_plan", value=plan)
     
     print("✓ Transform terminé avec succès")
     return len(dataframes)
 
 
+@_instrumented("load")
 def load_data(**context):
     """
     Tâche 3 : Load - Insérer les données dans PostgreSQL
+    Chaque table est envoyée par COPY depuis un tampon mémoire (cresus/bulk_load.py)
     """
     print("=" * 60)
     print("TÂCHE 3 : LOAD")
     print("=" * 60)
     
-    # Fonction helper pour convertir les valeurs numpy en types Python natifs
-    def convert_value(val):
-        """Convertit une valeur numpy en type Python natif"""
-        import numpy as np
-        if pd.isna(val):
-            return None
-        elif isinstance(val, (np.integer, np.int64, np.int32)):
-            return int(val)
-        elif isinstance(val, (np.floating, np.float64, np.float32)):
-            return float(val)
-        elif isinstance(val, (int, float)) and not isinstance(val, bool):
-            return val
-        else:
-            return val
-    
-    def convert_row(row):
-        """Convertit une ligne (tuple/list) en types Python natifs"""
-        return tuple(convert_value(val) for val in row)
-    
-    # Connexion à PostgreSQL
+    # Connexion du pool (cresus/db.py) : contrôlée avant usage, statement_timeout appliqué
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_connection()
         cursor = conn.cursor()
         print("✓ Connexion à PostgreSQL établie")
     except Exception as e:
         print(f"✗ Erreur de connexion à PostgreSQL : {e}")
         raise
     
-    # Récupérer les données transformées depuis XCom
-    dataframes = {}
-    for name in ["dim_filiale", "dim_devise", "dim_scenario", "dim_contrepartie", 
-                 "dim_compte", "dim_temps", "fact_flux_tresorerie"]:
-        records = context['ti'].xcom_pull(key=name, task_ids='transform')
-        if records:
-            dataframes[name] = pd.DataFrame(records)
-    
-    # Ordre d'insertion : Dimensions d'abord (selon dépendances), puis faits
-    
-    # 1. DIM_DEVISE (pas de dépendances)
-    if "dim_devise" in dataframes:
-        df = dataframes["dim_devise"]
-        print(f"Insertion DIM_DEVISE ({len(df)} lignes)...")
-        rows = [convert_row(row) for row in df[['id_devise', 'code_iso', 'libelle_devise']].values]
-        execute_values(
-            cursor,
-            """
-            INSERT INTO DIM_DEVISE (id_devise, code_iso, libelle_devise)
-            VALUES %s
-            ON CONFLICT (id_devise) DO UPDATE SET
-                code_iso = EXCLUDED.code_iso,
-                libelle_devise = EXCLUDED.libelle_devise
-            """,
-            rows
-        )
-        print("  ✓ DIM_DEVISE insérée")
-    
-    # 2. DIM_FILIALE (pas de dépendances)
-    if "dim_filiale" in dataframes:
-        df = dataframes["dim_filiale"]
-        print(f"Insertion DIM_FILIALE ({len(df)} lignes)...")
-        rows = [convert_row(row) for row in df[['id_filiale', 'nom_filiale', 'pays', 'region']].values]
-        execute_values(
-            cursor,
-            """
-            INSERT INTO DIM_FILIALE (id_filiale, nom_filiale, pays, region)
-            VALUES %s
-            ON CONFLICT (id_filiale) DO UPDATE SET
-                nom_filiale = EXCLUDED.nom_filiale,
-                pays = EXCLUDED.pays,
-                region = EXCLUDED.region
-            """,
-            rows
-        )
-        print("  ✓ DIM_FILIALE insérée")
-    
-    # 3. DIM_SCENARIO (pas de dépendances)
-    if "dim_scenario" in dataframes:
-        df = dataframes["dim_scenario"]
-        print(f"Insertion DIM_SCENARIO ({len(df)} lignes)...")
-        rows = [convert_row(row) for row in df[['id_scenario', 'nom_scenario', 'description']].values]
-        execute_values(
-            cursor,
-            """
-            INSERT INTO DIM_SCENARIO (id_scenario, nom_scenario, description)
-            VALUES %s
-            ON CONFLICT (id_scenario) DO UPDATE SET
-                nom_scenario = EXCLUDED.nom_scenario,
-                description = EXCLUDED.description
-            """,
-            rows
-        )
-        print("  ✓ DIM_SCENARIO insérée")
-    
-    # 4. DIM_CONTREPARTIE (pas de dépendances)
-    if "dim_contrepartie" in dataframes:
-        df = dataframes["dim_contrepartie"]
-        print(f"Insertion DIM_CONTREPARTIE ({len(df)} lignes)...")
-        rows = [convert_row(row) for row in df[['id_contrepartie', 'nom_contrepartie', 'type_contrepartie']].values]
-        execute_values(
-            cursor,
-            """
-            INSERT INTO DIM_CONTREPARTIE (id_contrepartie, nom_contrepartie, type_contrepartie)
-            VALUES %s
-            ON CONFLICT (id_contrepartie) DO UPDATE SET
-                nom_contrepartie = EXCLUDED.nom_contrepartie,
-                type_contrepartie = EXCLUDED.type_contrepartie
-            """,
-            rows
-        )
-        print("  ✓ DIM_CONTREPARTIE insérée")
-    
-    # 5. DIM_TEMPS (pas de dépendances)
-    if "dim_temps" in dataframes:
-        df = dataframes["dim_temps"]
-        print(f"Insertion DIM_TEMPS ({len(df)} lignes)...")
-        rows = [convert_row(row) for row in df[['id_temps', 'jour', 'mois', 'annee']].values]
-        execute_values(
-            cursor,
-            """
-            INSERT INTO DIM_TEMPS (id_temps, jour, mois, annee)
-            VALUES %s
-            ON CONFLICT (id_temps) DO UPDATE SET
-                jour = EXCLUDED.jour,
-                mois = EXCLUDED.mois,
-                annee = EXCLUDED.annee
-            """,
-            rows
-        )
-        print("  ✓ DIM_TEMPS insérée")
-    
-    # 6. DIM_COMPTE (dépend de DIM_DEVISE et DIM_FILIALE)
-    if "dim_compte" in dataframes:
-        df = dataframes["dim_compte"]
-        print(f"Insertion DIM_COMPTE ({len(df)} lignes)...")
-        rows = [convert_row(row) for row in df[['id_compte', 'numero_compte', 'type_compte', 'id_devise', 'id_filiale']].values]
-        execute_values(
-            cursor,
-            """
-            INSERT INTO DIM_COMPTE (id_compte, numero_compte, type_compte, id_devise, id_filiale)
-            VALUES %s
-            ON CONFLICT (id_compte) DO UPDATE SET
-                numero_compte = EXCLUDED.numero_compte,
-                type_compte = EXCLUDED.type_compte,
-                id_devise = EXCLUDED.id_devise,
-                id_filiale = EXCLUDED.id_filiale
-            """,
-            rows
-        )
-        print("  ✓ DIM_COMPTE insérée")
-    
-    # 7. FACT_FLUX_TRESORERIE (dépend de toutes les dimensions)
-    if "fact_flux_tresorerie" in dataframes:
-        df = dataframes["fact_flux_tresorerie"]
-        print(f"Insertion FACT_FLUX_TRESORERIE ({len(df)} lignes)...")
+    # Connexion rendue au pool même en cas d'échec (transaction non validée annulée)
+    try:
+        # Relire les artefacts transformés (taux de change : conversion bloc par bloc, en mode flux seulement)
+        fact_source = context['ti'].xcom_pull(key="fact_flux_tresorerie_source", task_ids='extract')
+        names = TABLES if fact_source else [name for name in TABLES if name != "taux_de_change"]
+        dataframes = _read_artifacts(context, 'transform', names)
         
-        # Nettoyer les valeurs NaN pour PostgreSQL
-        df_clean = df.copy()
-        df_clean['montant_consolide_eur'] = df_clean['montant_consolide_eur'].fillna(0)
+        # Chargement par lots : chaque table et chaque lot de faits sont validés séparément ; une relance
+        # de la tâche (même run_id) reprend après le dernier lot validé (ETL_CHECKPOINT_CHARGEMENT)
+        batch_size = _load_batch_size(context)
+        id_chargement = context['run_id'] if batch_size else None
+        if batch_size:
+            print(f"Chargement par lots de {batch_size} lignes (points de reprise : {id_chargement})")
         
-        rows = [convert_row(row) for row in df_clean[[
-            'date_operation', 'montant_transaction', 'montant_consolide_eur', 
-            'type_operation', 'statut', 'id_compte', 'id_devise', 
-            'id_scenario', 'id_temps', 'id_contrepartie'
-        ]].values]
+        # Ordre d'insertion : Dimensions d'abord (selon dépendances), puis faits
+        # Dimensions : COPY dans une table temporaire puis INSERT ... ON CONFLICT DO UPDATE
+        # Dimensions réutilisées par le cache : déjà en base (relues seulement pour la conversion en mode flux)
+        plan = context['ti'].xcom_pull(key="cache_plan", task_ids='transform') or {}
+        reutilisees = reused_tables(plan)
+        dimensions = {name: df for name, df in dataframes.items() if name not in reutilisees}
+        for table, nb_lignes in load_dimensions(cursor, dimensions, upsert=True, id_chargement=id_chargement):
+            print(f"  ✓ {table} insérée ({nb_lignes} lignes)")
         
-        execute_values(
-            cursor,
-            """
-            INSERT INTO FACT_FLUX_TRESORERIE 
-            (date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
-             id_compte, id_devise, id_scenario, id_temps, id_contrepartie)
-            VALUES %s
-            """,
-            rows
-        )
-        print("  ✓ FACT_FLUX_TRESORERIE insérée")
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+        # FACT_FLUX_TRESORERIE (dépend de toutes les dimensions) : upsert sur la clé métier
+        # Relancer le DAG ne duplique aucun flux : seules les lignes nouvelles ou modifiées sont écrites
+        if "fact_flux_tresorerie" in dataframes:
+            df = dataframes["fact_flux_tresorerie"]
+            print(f"Insertion FACT_FLUX_TRESORERIE ({len(df)} lignes)...")
+            nb_ecrites = load_fact_frame(cursor, df, upsert=True, id_chargement=id_chargement, batch_size=batch_size)
+            print(f"  ✓ FACT_FLUX_TRESORERIE : {nb_ecrites} lignes insérées ou mises à jour")
+        elif fact_source:
+            # Mode flux : lecture, transformation et upsert bloc par bloc (mémoire bornée par la taille des blocs)
+            chunk_size = _fact_chunk_size(context)
+            high_water_mark = None if _full_reload(context) else get_high_water_mark(cursor, FACT_SOURCE)
+            taux_df = dataframes.get("taux_de_change")
+            fx_table = FxRateTable.from_dataframe(taux_df) if taux_df is not None and not taux_df.empty else None
+            print(f"Insertion FACT_FLUX_TRESORERIE par blocs de {chunk_size} lignes "
+                  f"(point de reprise {high_water_mark})...")
+            nb_lues, nb_ecrites, derniere_date = stream_fact_file(
+                cursor, fact_source, chunk_size,
+                dataframes.get("dim_compte"), dataframes.get("dim_devise"), fx_table,
+                high_water_mark=high_water_mark, id_chargement=id_chargement, batch_size=batch_size,
+            )
+            set_high_water_mark(cursor, FACT_SOURCE, derniere_date, nb_lues)
+            print(f"  ✓ FACT_FLUX_TRESORERIE : {nb_lues} lignes lues, {nb_ecrites} insérées ou mises à jour")
+        
+        # Rétention : les mois les plus anciens sont détachés puis supprimés (CRESUS_FACT_RETENTION_MONTHS)
+        purgees = apply_retention(cursor, "FACT_FLUX_TRESORERIE")
+        if purgees:
+            mark_months_for_refresh(cursor, [mois for mois, _ in purgees])
+            print(f"  ✓ {len(purgees)} partition(s) mensuelle(s) purgée(s) : {', '.join(nom for _, nom in purgees)}")
+        
+        # Chargement terminé : ses points de reprise sont supprimés avec la validation du dernier lot
+        if id_chargement:
+            clear_checkpoints(cursor, id_chargement)
+        # Cache de l'extraction : état des sources chargées et rapport de l'exécution, validés avec le chargement
+        if plan:
+            record_load(cursor, context['run_id'], plan)
+        conn.commit()
+    finally:
+        cursor.close()
+        release_connection(conn)
+    
+    if plan:
+        purge_artifacts(plan)
+        print(f"Cache de l'extraction : {len(reutilisees)}/{len(plan)} source(s) réutilisée(s)")
+        print("\n".join(report_lines(plan)))
     
     print("✓ Load terminé avec succès")
 
 
-def run_predictive_model(**context):
+@_instrumented("aggregates")
+def refresh_aggregates_task(**context):
     """
-    Tâche 4 : Model - Exécuter le modèle prédictif et insérer les prévisions
+    Tâche 4 : Aggregates - Rafraîchir les agrégats des tableaux de bord
+    Seuls les jours touchés par le chargement (et leurs mois) sont recalculés ;
+    reconstruction complète avec la configuration {"full_reload": true}
     """
     print("=" * 60)
-    print("TÂCHE 4 : MODEL")
+    print("TÂCHE 4 : AGGREGATES")
     print("=" * 60)
     
-    # Exécuter le script de modélisation prédictive
-    import sys
-    script_path = Path("/opt/airflow/scripts/predictive_model.py")
+    full = _full_reload(context)
+    with connection() as conn, conn.cursor() as cursor:
+        nb_jours, nb_mois = refresh_aggregates(cursor, full=full)
+        conn.commit()
     
+    mode = "reconstruction complète" if full else "incrémental"
+    print(f"✓ Agrégats rafraîchis ({mode}) : {nb_jours} jour(s), {nb_mois} mois")
+
+
+def run_predictive_model(**context):
+    """
+    Tâche 5 : Model - Exécuter le modèle prédictif et insérer les prévisions
+    Le script CLI (cresus.model) tourne dans un processus enfant : le pool d'entraînement ne peut pas être
+    créé depuis un processus worker démonisé
+    """
+    print("=" * 60)
+    print("TÂCHE 5 : MODEL")
+    print("=" * 60)
+    
+    script_path = ROOT_DIR / "scripts" / "predictive_model.py"
     if not script_path.exists():
         raise FileNotFoundError(f"Script predictive_model.py non trouvé à {script_path}")
-    
-    script_to_run = str(script_path)
-    
-    print(f"Exécution du modèle prédictif : {script_to_run}")
-    
-    # Exécuter le script
-    import subprocess
-    result = subprocess.run(
-        [sys.executable, script_to_run],
-        capture_output=True,
-        text=True
+    print(f"Exécution du modèle prédictif : {script_path}")
+    
+    # Taux de change du même répertoire de sources que l'extraction ; métriques rattachées au run du DAG
+    env = dict(
+        os.environ,
+        CRESUS_FX_RATES_FILE=str(DATA_SOURCES_DIR / "taux_de_change.csv"),
+        CRESUS_RUN_ID=context['run_id'],
+        CRESUS_METRICS_DIR=str(METRICS_DIR),
     )
+    result = subprocess.run([sys.executable, str(script_path)], capture_output=True, text=True, env=env)
     
     if result.returncode != 0:
         print(f"✗ Erreur lors de l'exécution du modèle : {result.stderr}")
@@ -509,6 +400,12 @@ task_load = PythonOperator(
     dag=dag,
 )
 
+task_aggregates = PythonOperator(
+    task_id='aggregates',
+    python_callable=refresh_aggregates_task,
+    dag=dag,
+)
+
 task_model = PythonOperator(
     task_id='model',
     python_callable=run_predictive_model,
@@ -516,5 +413,5 @@ task_model = PythonOperator(
 )
 
 # Définition des dépendances (chaîne séquentielle)
-task_extract >> task_transform >> task_load >> task_model
+task_extract >> task_transform >> task_load >> task_aggregates >> task_model
 
@@ -5,6 +5,16 @@
 -- =====================================================
 
 -- Suppression des tables si elles existent (dans l'ordre inverse des dépendances)
+DROP TABLE IF EXISTS AGG_FLUX_JOURNALIER CASCADE;
+DROP TABLE IF EXISTS AGG_FLUX_MENSUEL CASCADE;
+DROP TABLE IF EXISTS ETL_AGREGATS_A_RAFRAICHIR CASCADE;
+DROP TABLE IF EXISTS FACT_PREVISION CASCADE;
+DROP TABLE IF EXISTS FORECAST_RUN CASCADE;
+DROP TABLE IF EXISTS PIPELINE_METRICS CASCADE;
+DROP TABLE IF EXISTS ETL_CACHE_RAPPORT CASCADE;
+DROP TABLE IF EXISTS ETL_CACHE_SOURCE CASCADE;
+DROP TABLE IF EXISTS ETL_CHECKPOINT_CHARGEMENT CASCADE;
+DROP TABLE IF EXISTS ETL_HIGH_WATER_MARK CASCADE;
 DROP TABLE IF EXISTS FACT_FLUX_TRESORERIE CASCADE;
 DROP TABLE IF EXISTS DIM_COMPTE CASCADE;
 DROP TABLE IF EXISTS DIM_TEMPS CASCADE;
@@ -25,7 +35,7 @@ CREATE TABLE DIM_TEMPS (
     annee INTEGER NOT NULL,
     CONSTRAINT chk_jour CHECK (jour >= 1 AND jour <= 31),
     CONSTRAINT chk_mois CHECK (mois >= 1 AND mois <= 12),
-    CONSTRAINT chk_annee CHECK (annee >= 2020 AND annee <= 2030)
+    CONSTRAINT chk_annee CHECK (annee >= 1900 AND annee <= 2100)
 );
 
 -- Dimension Scénario
@@ -72,8 +82,10 @@ CREATE TABLE DIM_COMPTE (
 -- TABLE DE FAITS
 -- =====================================================
 
+-- Partitionnée par mois sur date_operation : les partitions (fact_flux_tresorerie_AAAA_MM) sont créées
+-- par l'étape de chargement (cresus/partitions.py) ; clé primaire et unicité incluent la clé de partition
 CREATE TABLE FACT_FLUX_TRESORERIE (
-    id_flux SERIAL PRIMARY KEY,
+    id_flux SERIAL,
     date_operation DATE NOT NULL,
     montant_transaction NUMERIC(15, 2) NOT NULL,
     montant_consolide_eur NUMERIC(15, 2),
@@ -84,33 +96,212 @@ CREATE TABLE FACT_FLUX_TRESORERIE (
     id_scenario INTEGER NOT NULL,
     id_temps INTEGER NOT NULL,
     id_contrepartie INTEGER NOT NULL,
+    -- Clé métier et empreinte du contenu (chargement incrémental, NULL pour les prévisions du modèle)
+    cle_metier BIGINT,
+    hash_contenu BIGINT,
+    CONSTRAINT pk_fact_flux_tresorerie PRIMARY KEY (id_flux, date_operation),
+    CONSTRAINT uq_fact_cle_metier UNIQUE (cle_metier, date_operation),
     FOREIGN KEY (id_compte) REFERENCES DIM_COMPTE(id_compte),
     FOREIGN KEY (id_devise) REFERENCES DIM_DEVISE(id_devise),
     FOREIGN KEY (id_scenario) REFERENCES DIM_SCENARIO(id_scenario),
     FOREIGN KEY (id_temps) REFERENCES DIM_TEMPS(id_temps),
     FOREIGN KEY (id_contrepartie) REFERENCES DIM_CONTREPARTIE(id_contrepartie)
+) PARTITION BY RANGE (date_operation);
+
+-- =====================================================
+-- PRÉVISIONS DU MODÈLE (VERSIONNÉES)
+-- =====================================================
+
+-- Registre des exécutions du modèle prédictif : une seule génération est courante
+CREATE TABLE FORECAST_RUN (
+    id_run SERIAL PRIMARY KEY,
+    genere_le TIMESTAMP NOT NULL DEFAULT NOW(),
+    nb_previsions INTEGER,
+    est_courante BOOLEAN NOT NULL DEFAULT FALSE,
+    publiee_le TIMESTAMP
+);
+
+CREATE UNIQUE INDEX uq_forecast_run_courante ON FORECAST_RUN (est_courante) WHERE est_courante;
+
+-- Prévisions, une partition par exécution (créée par cresus/forecast_runs.py, supprimée à la purge)
+CREATE TABLE FACT_PREVISION (
+    id_run INTEGER NOT NULL,
+    date_operation DATE NOT NULL,
+    montant_transaction NUMERIC(15, 2) NOT NULL,
+    montant_consolide_eur NUMERIC(15, 2),
+    type_operation VARCHAR(100),
+    statut VARCHAR(50),
+    id_compte INTEGER NOT NULL,
+    id_devise INTEGER NOT NULL,
+    id_scenario INTEGER NOT NULL,
+    id_temps INTEGER NOT NULL,
+    id_contrepartie INTEGER NOT NULL,
+    FOREIGN KEY (id_run) REFERENCES FORECAST_RUN(id_run),
+    FOREIGN KEY (id_compte) REFERENCES DIM_COMPTE(id_compte),
+    FOREIGN KEY (id_devise) REFERENCES DIM_DEVISE(id_devise),
+    FOREIGN KEY (id_scenario) REFERENCES DIM_SCENARIO(id_scenario),
+    FOREIGN KEY (id_temps) REFERENCES DIM_TEMPS(id_temps),
+    FOREIGN KEY (id_contrepartie) REFERENCES DIM_CONTREPARTIE(id_contrepartie)
+) PARTITION BY LIST (id_run);
+
+-- =====================================================
+-- AGRÉGATS POUR LES TABLEAUX DE BORD
+-- =====================================================
+
+-- Flux net quotidien par compte (alimenté par cresus/aggregates.py)
+CREATE TABLE AGG_FLUX_JOURNALIER (
+    date_operation DATE NOT NULL,
+    id_compte INTEGER NOT NULL,
+    statut VARCHAR(50),
+    encaissements_eur NUMERIC(18, 2) NOT NULL,
+    decaissements_eur NUMERIC(18, 2) NOT NULL,
+    flux_net_eur NUMERIC(18, 2) NOT NULL,
+    nb_operations INTEGER NOT NULL
+);
+
+-- Totaux mensuels par filiale / devise / scénario / type d'opération
+CREATE TABLE AGG_FLUX_MENSUEL (
+    annee INTEGER NOT NULL,
+    mois INTEGER NOT NULL,
+    id_filiale INTEGER NOT NULL,
+    id_devise INTEGER NOT NULL,
+    id_scenario INTEGER NOT NULL,
+    type_operation VARCHAR(100),
+    statut VARCHAR(50),
+    montant_transaction NUMERIC(18, 2) NOT NULL,
+    montant_consolide_eur NUMERIC(18, 2) NOT NULL,
+    nb_operations INTEGER NOT NULL
+);
+
+-- =====================================================
+-- TABLES DE CONTRÔLE DU PIPELINE
+-- =====================================================
+
+-- Point de reprise du chargement incrémental par fichier source
+CREATE TABLE ETL_HIGH_WATER_MARK (
+    source VARCHAR(255) PRIMARY KEY,
+    derniere_date DATE NOT NULL,
+    nb_lignes BIGINT,
+    maj_le TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Dates d'opération dont les agrégats sont à recalculer (file alimentée au chargement)
+CREATE TABLE ETL_AGREGATS_A_RAFRAICHIR (
+    date_operation DATE PRIMARY KEY
+);
+
+-- Chargement par lots : position du dernier lot validé par chargement (run_id) et par table
+CREATE TABLE ETL_CHECKPOINT_CHARGEMENT (
+    id_chargement VARCHAR(255) NOT NULL,
+    nom_table VARCHAR(100) NOT NULL,
+    signature_source VARCHAR(64) NOT NULL,
+    position_source BIGINT NOT NULL DEFAULT 0,
+    nb_lignes_chargees BIGINT NOT NULL DEFAULT 0,
+    derniere_date DATE,
+    termine BOOLEAN NOT NULL DEFAULT FALSE,
+    maj_le TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id_chargement, nom_table)
+);
+
+-- Métriques d'exécution (cresus/metrics.py) : durée, lignes, débit et pic de RSS par étape et par table
+CREATE TABLE PIPELINE_METRICS (
+    id_mesure BIGSERIAL PRIMARY KEY,
+    run_id VARCHAR(255) NOT NULL,
+    etape VARCHAR(50) NOT NULL,
+    objet VARCHAR(255) NOT NULL,
+    debut TIMESTAMP NOT NULL,
+    duree_s DOUBLE PRECISION NOT NULL,
+    lignes_entree BIGINT,
+    lignes_sortie BIGINT,
+    lignes_par_s DOUBLE PRECISION,
+    rss_max_mo NUMERIC(12, 1)
+);
+
+-- Cache de l'extraction du DAG (cresus/extract_cache.py) : signature de chaque source à son dernier chargement
+CREATE TABLE ETL_CACHE_SOURCE (
+    nom_table VARCHAR(100) PRIMARY KEY,
+    taille_octets BIGINT NOT NULL,
+    mtime_ns BIGINT NOT NULL,
+    hash_contenu VARCHAR(64),
+    artefact TEXT,
+    run_id VARCHAR(255) NOT NULL,
+    maj_le TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Rapport du cache par exécution : source réutilisée ou retraitée, et pourquoi
+CREATE TABLE ETL_CACHE_RAPPORT (
+    run_id VARCHAR(255) NOT NULL,
+    nom_table VARCHAR(100) NOT NULL,
+    reutilisee BOOLEAN NOT NULL,
+    motif VARCHAR(255) NOT NULL,
+    cree_le TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (run_id, nom_table)
 );
 
 -- =====================================================
 -- INDEX POUR OPTIMISATION DES REQUÊTES
 -- =====================================================
 
-CREATE INDEX idx_fact_date_operation ON FACT_FLUX_TRESORERIE(date_operation);
-CREATE INDEX idx_fact_statut ON FACT_FLUX_TRESORERIE(statut);
+-- Extraction du modèle prédictif (flux réalisés triés par date / compte) : index partiel couvrant
+CREATE INDEX idx_fact_realise_date_compte ON FACT_FLUX_TRESORERIE(date_operation, id_compte)
+    INCLUDE (montant_consolide_eur, id_temps)
+    WHERE statut = 'Réalisé' AND montant_consolide_eur IS NOT NULL;
+-- Jointures en étoile (Power BI) : clés étrangères, détail d'un compte sur une période
+CREATE INDEX idx_fact_compte_date ON FACT_FLUX_TRESORERIE(id_compte, date_operation)
+    INCLUDE (montant_consolide_eur, statut);
+CREATE INDEX idx_fact_id_temps ON FACT_FLUX_TRESORERIE(id_temps);
+CREATE INDEX idx_fact_id_contrepartie ON FACT_FLUX_TRESORERIE(id_contrepartie);
 CREATE INDEX idx_fact_type_operation ON FACT_FLUX_TRESORERIE(type_operation);
-CREATE INDEX idx_fact_id_scenario ON FACT_FLUX_TRESORERIE(id_scenario);
+-- Filtres de période : BRIN (lignes chargées par ordre de date)
+CREATE INDEX idx_fact_date_operation_brin ON FACT_FLUX_TRESORERIE USING brin (date_operation);
 CREATE INDEX idx_dim_temps_date ON DIM_TEMPS(annee, mois, jour);
+CREATE INDEX idx_agg_jour_date_compte ON AGG_FLUX_JOURNALIER(date_operation, id_compte);
+CREATE INDEX idx_agg_mois_periode ON AGG_FLUX_MENSUEL(annee, mois);
 CREATE INDEX idx_dim_compte_numero ON DIM_COMPTE(numero_compte);
+CREATE INDEX idx_pipeline_metrics_etape ON PIPELINE_METRICS(etape, objet, debut);
+
+-- =====================================================
+-- VUES
+-- =====================================================
+
+-- Génération de prévisions courante (seule sa partition est lue)
+CREATE VIEW V_PREVISION_COURANTE AS
+SELECT p.*
+FROM FACT_PREVISION p
+WHERE p.id_run = (SELECT id_run FROM FORECAST_RUN WHERE est_courante);
+
+-- Flux de trésorerie et prévisions courantes (source des tableaux de bord)
+CREATE VIEW V_FLUX_TRESORERIE AS
+SELECT date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+       id_compte, id_devise, id_scenario, id_temps, id_contrepartie
+FROM FACT_FLUX_TRESORERIE
+UNION ALL
+SELECT date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+       id_compte, id_devise, id_scenario, id_temps, id_contrepartie
+FROM V_PREVISION_COURANTE;
 
 -- =====================================================
 -- COMMENTAIRES SUR LES TABLES
 -- =====================================================
 
 COMMENT ON TABLE FACT_FLUX_TRESORERIE IS 'Table de faits contenant les flux de trésorerie';
+COMMENT ON COLUMN FACT_FLUX_TRESORERIE.cle_metier IS 'Clé métier : date, compte, contrepartie et rang d''occurrence';
 COMMENT ON TABLE DIM_TEMPS IS 'Dimension temporelle pour l''analyse des flux';
 COMMENT ON TABLE DIM_SCENARIO IS 'Dimension des scénarios (Réalisé, Prévisionnel, Simulations)';
 COMMENT ON TABLE DIM_DEVISE IS 'Dimension des devises';
 COMMENT ON TABLE DIM_FILIALE IS 'Dimension des filiales du groupe ZF Banque';
 COMMENT ON TABLE DIM_COMPTE IS 'Dimension des comptes bancaires';
 COMMENT ON TABLE DIM_CONTREPARTIE IS 'Dimension des contreparties (clients, fournisseurs, etc.)';
+COMMENT ON TABLE FORECAST_RUN IS 'Registre des exécutions du modèle prédictif (génération courante et historique conservé)';
+COMMENT ON COLUMN FORECAST_RUN.publiee_le IS 'Date de publication ; NULL tant que l''exécution est en cours';
+COMMENT ON TABLE FACT_PREVISION IS 'Prévisions du modèle, partitionnées par exécution';
+COMMENT ON VIEW V_FLUX_TRESORERIE IS 'Flux de trésorerie et génération de prévisions courante';
+COMMENT ON TABLE AGG_FLUX_JOURNALIER IS 'Flux net quotidien par compte et statut (agrégat de FACT_FLUX_TRESORERIE)';
+COMMENT ON TABLE AGG_FLUX_MENSUEL IS 'Totaux mensuels par filiale, devise, scénario, type d''opération et statut';
+COMMENT ON TABLE ETL_AGREGATS_A_RAFRAICHIR IS 'File des dates d''opération dont les agrégats sont à recalculer';
+COMMENT ON TABLE ETL_HIGH_WATER_MARK IS 'Point de reprise du chargement incrémental par fichier source';
+COMMENT ON TABLE ETL_CHECKPOINT_CHARGEMENT IS 'Position du dernier lot validé par chargement et par table (reprise après échec)';
+COMMENT ON TABLE PIPELINE_METRICS IS 'Métriques d''exécution du pipeline par étape et par table ou lot de comptes';
+COMMENT ON TABLE ETL_CACHE_SOURCE IS 'Taille, date de modification et empreinte de chaque source au dernier chargement du DAG';
+COMMENT ON TABLE ETL_CACHE_RAPPORT IS 'Sources réutilisées ou retraitées par exécution du DAG (cache de l''extraction)';
 
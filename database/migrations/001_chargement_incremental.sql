@@ -0,0 +1,39 @@
+-- =====================================================
+-- Migration 001 : chargement incrémental de FACT_FLUX_TRESORERIE
+-- À appliquer sur une base créée avant l'ajout de cle_metier / hash_contenu
+-- (create_tables.sql contient déjà ces évolutions)
+-- cle_metier et hash_contenu sont calculés en Python (cresus/incremental.py) : les flux déjà chargés
+-- ne peuvent pas recevoir leur clé ici. Ils sont supprimés et le point de reprise est remis à zéro ;
+-- RELANCER ENSUITE UN CHARGEMENT COMPLET (DAG avec {"full_reload": true} ou scripts/load_data.py).
+-- Sans cela, les anciennes lignes sans clé ne seraient jamais en conflit et le premier chargement
+-- incrémental ajouterait tout l'historique à côté d'elles
+-- =====================================================
+
+ALTER TABLE FACT_FLUX_TRESORERIE ADD COLUMN IF NOT EXISTS cle_metier BIGINT;
+ALTER TABLE FACT_FLUX_TRESORERIE ADD COLUMN IF NOT EXISTS hash_contenu BIGINT;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_fact_cle_metier') THEN
+        ALTER TABLE FACT_FLUX_TRESORERIE ADD CONSTRAINT uq_fact_cle_metier UNIQUE (cle_metier);
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS ETL_HIGH_WATER_MARK (
+    source VARCHAR(255) PRIMARY KEY,
+    derniere_date DATE NOT NULL,
+    nb_lignes BIGINT,
+    maj_le TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Flux chargés avant la migration (sans clé métier) : supprimés, puis rechargés par le chargement complet
+-- (point de reprise remis à zéro seulement dans ce cas : la migration peut être rejouée sans effet)
+DO $$
+BEGIN
+    DELETE FROM FACT_FLUX_TRESORERIE WHERE cle_metier IS NULL;
+    IF FOUND THEN
+        DELETE FROM ETL_HIGH_WATER_MARK;
+    END IF;
+END $$;
+
+COMMENT ON TABLE ETL_HIGH_WATER_MARK IS 'Point de reprise du chargement incrémental par fichier source';
@@ -0,0 +1,56 @@
+-- =====================================================
+-- Migration 002 : prévisions du modèle versionnées
+-- À appliquer sur une base créée avant l'ajout de FORECAST_RUN / FACT_PREVISION
+-- (create_tables.sql contient déjà ces évolutions)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS FORECAST_RUN (
+    id_run SERIAL PRIMARY KEY,
+    genere_le TIMESTAMP NOT NULL DEFAULT NOW(),
+    nb_previsions INTEGER,
+    est_courante BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_forecast_run_courante ON FORECAST_RUN (est_courante) WHERE est_courante;
+
+CREATE TABLE IF NOT EXISTS FACT_PREVISION (
+    id_run INTEGER NOT NULL,
+    date_operation DATE NOT NULL,
+    montant_transaction NUMERIC(15, 2) NOT NULL,
+    montant_consolide_eur NUMERIC(15, 2),
+    type_operation VARCHAR(100),
+    statut VARCHAR(50),
+    id_compte INTEGER NOT NULL,
+    id_devise INTEGER NOT NULL,
+    id_scenario INTEGER NOT NULL,
+    id_temps INTEGER NOT NULL,
+    id_contrepartie INTEGER NOT NULL,
+    FOREIGN KEY (id_run) REFERENCES FORECAST_RUN(id_run),
+    FOREIGN KEY (id_compte) REFERENCES DIM_COMPTE(id_compte),
+    FOREIGN KEY (id_devise) REFERENCES DIM_DEVISE(id_devise),
+    FOREIGN KEY (id_scenario) REFERENCES DIM_SCENARIO(id_scenario),
+    FOREIGN KEY (id_temps) REFERENCES DIM_TEMPS(id_temps),
+    FOREIGN KEY (id_contrepartie) REFERENCES DIM_CONTREPARTIE(id_contrepartie)
+) PARTITION BY LIST (id_run);
+
+CREATE OR REPLACE VIEW V_PREVISION_COURANTE AS
+SELECT p.*
+FROM FACT_PREVISION p
+WHERE p.id_run = (SELECT id_run FROM FORECAST_RUN WHERE est_courante);
+
+CREATE OR REPLACE VIEW V_FLUX_TRESORERIE AS
+SELECT date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+       id_compte, id_devise, id_scenario, id_temps, id_contrepartie
+FROM FACT_FLUX_TRESORERIE
+UNION ALL
+SELECT date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+       id_compte, id_devise, id_scenario, id_temps, id_contrepartie
+FROM V_PREVISION_COURANTE;
+
+-- Les prévisions accumulées dans FACT_FLUX_TRESORERIE par les exécutions précédentes sont obsolètes :
+-- la prochaine exécution du modèle publie une génération complète dans FACT_PREVISION
+DELETE FROM FACT_FLUX_TRESORERIE WHERE type_operation = 'Prévision modèle';
+
+COMMENT ON TABLE FORECAST_RUN IS 'Registre des exécutions du modèle prédictif (génération courante et historique conservé)';
+COMMENT ON TABLE FACT_PREVISION IS 'Prévisions du modèle, partitionnées par exécution';
+COMMENT ON VIEW V_FLUX_TRESORERIE IS 'Flux de trésorerie et génération de prévisions courante';
@@ -0,0 +1,88 @@
+-- =====================================================
+-- Migration 003 : partitionnement mensuel de FACT_FLUX_TRESORERIE sur date_operation
+-- À appliquer après 001 et 002 sur une base où FACT_FLUX_TRESORERIE est encore une table simple
+-- (create_tables.sql contient déjà ces évolutions) ; sans effet si la table est déjà partitionnée
+-- Les lignes existantes sont recopiées dans une partition par mois, id_flux et sa séquence sont conservés
+-- =====================================================
+
+BEGIN;
+
+DO $$
+DECLARE
+    mois DATE;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'fact_flux_tresorerie' AND relkind = 'r') THEN
+        -- La vue dépend de l'ancienne table : recréée en fin de migration
+        DROP VIEW IF EXISTS V_FLUX_TRESORERIE;
+
+        ALTER TABLE FACT_FLUX_TRESORERIE RENAME TO fact_flux_tresorerie_avant_partition;
+        ALTER TABLE fact_flux_tresorerie_avant_partition DROP CONSTRAINT IF EXISTS uq_fact_cle_metier;
+        ALTER TABLE fact_flux_tresorerie_avant_partition DROP CONSTRAINT IF EXISTS fact_flux_tresorerie_pkey;
+        DROP INDEX IF EXISTS idx_fact_date_operation;
+        DROP INDEX IF EXISTS idx_fact_statut;
+        DROP INDEX IF EXISTS idx_fact_type_operation;
+        DROP INDEX IF EXISTS idx_fact_id_scenario;
+
+        CREATE TABLE FACT_FLUX_TRESORERIE (
+            id_flux INTEGER NOT NULL DEFAULT nextval('fact_flux_tresorerie_id_flux_seq'),
+            date_operation DATE NOT NULL,
+            montant_transaction NUMERIC(15, 2) NOT NULL,
+            montant_consolide_eur NUMERIC(15, 2),
+            type_operation VARCHAR(100),
+            statut VARCHAR(50),
+            id_compte INTEGER NOT NULL,
+            id_devise INTEGER NOT NULL,
+            id_scenario INTEGER NOT NULL,
+            id_temps INTEGER NOT NULL,
+            id_contrepartie INTEGER NOT NULL,
+            cle_metier BIGINT,
+            hash_contenu BIGINT,
+            CONSTRAINT pk_fact_flux_tresorerie PRIMARY KEY (id_flux, date_operation),
+            CONSTRAINT uq_fact_cle_metier UNIQUE (cle_metier, date_operation),
+            FOREIGN KEY (id_compte) REFERENCES DIM_COMPTE(id_compte),
+            FOREIGN KEY (id_devise) REFERENCES DIM_DEVISE(id_devise),
+            FOREIGN KEY (id_scenario) REFERENCES DIM_SCENARIO(id_scenario),
+            FOREIGN KEY (id_temps) REFERENCES DIM_TEMPS(id_temps),
+            FOREIGN KEY (id_contrepartie) REFERENCES DIM_CONTREPARTIE(id_contrepartie)
+        ) PARTITION BY RANGE (date_operation);
+
+        FOR mois IN
+            SELECT DISTINCT date_trunc('month', date_operation)::date
+            FROM fact_flux_tresorerie_avant_partition
+        LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF FACT_FLUX_TRESORERIE FOR VALUES FROM (%L) TO (%L)',
+                'fact_flux_tresorerie_' || to_char(mois, 'YYYY_MM'), mois, (mois + INTERVAL '1 month')::date
+            );
+        END LOOP;
+
+        INSERT INTO FACT_FLUX_TRESORERIE
+            (id_flux, date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+             id_compte, id_devise, id_scenario, id_temps, id_contrepartie, cle_metier, hash_contenu)
+        SELECT id_flux, date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+               id_compte, id_devise, id_scenario, id_temps, id_contrepartie, cle_metier, hash_contenu
+        FROM fact_flux_tresorerie_avant_partition;
+
+        ALTER SEQUENCE fact_flux_tresorerie_id_flux_seq OWNED BY FACT_FLUX_TRESORERIE.id_flux;
+        DROP TABLE fact_flux_tresorerie_avant_partition;
+
+        CREATE INDEX idx_fact_date_operation ON FACT_FLUX_TRESORERIE(date_operation);
+        CREATE INDEX idx_fact_statut ON FACT_FLUX_TRESORERIE(statut);
+        CREATE INDEX idx_fact_type_operation ON FACT_FLUX_TRESORERIE(type_operation);
+        CREATE INDEX idx_fact_id_scenario ON FACT_FLUX_TRESORERIE(id_scenario);
+    END IF;
+END $$;
+
+CREATE OR REPLACE VIEW V_FLUX_TRESORERIE AS
+SELECT date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+       id_compte, id_devise, id_scenario, id_temps, id_contrepartie
+FROM FACT_FLUX_TRESORERIE
+UNION ALL
+SELECT date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
+       id_compte, id_devise, id_scenario, id_temps, id_contrepartie
+FROM V_PREVISION_COURANTE;
+
+COMMENT ON TABLE FACT_FLUX_TRESORERIE IS 'Table de faits contenant les flux de trésorerie';
+COMMENT ON VIEW V_FLUX_TRESORERIE IS 'Flux de trésorerie et génération de prévisions courante';
+
+COMMIT;
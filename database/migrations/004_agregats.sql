@@ -0,0 +1,42 @@
+-- =====================================================
+-- Migration 004 : tables d'agrégats pour les tableaux de bord
+-- À appliquer sur une base créée avant l'ajout de AGG_FLUX_JOURNALIER / AGG_FLUX_MENSUEL
+-- (create_tables.sql contient déjà ces évolutions)
+-- Premier remplissage : déclencher le DAG avec {"full_reload": true}
+-- =====================================================
+
+-- Flux net quotidien par compte (alimenté par cresus/aggregates.py)
+CREATE TABLE IF NOT EXISTS AGG_FLUX_JOURNALIER (
+    date_operation DATE NOT NULL,
+    id_compte INTEGER NOT NULL,
+    statut VARCHAR(50),
+    encaissements_eur NUMERIC(18, 2) NOT NULL,
+    decaissements_eur NUMERIC(18, 2) NOT NULL,
+    flux_net_eur NUMERIC(18, 2) NOT NULL,
+    nb_operations INTEGER NOT NULL
+);
+
+-- Totaux mensuels par filiale / devise / scénario / type d'opération
+CREATE TABLE IF NOT EXISTS AGG_FLUX_MENSUEL (
+    annee INTEGER NOT NULL,
+    mois INTEGER NOT NULL,
+    id_filiale INTEGER NOT NULL,
+    id_devise INTEGER NOT NULL,
+    id_scenario INTEGER NOT NULL,
+    type_operation VARCHAR(100),
+    statut VARCHAR(50),
+    montant_transaction NUMERIC(18, 2) NOT NULL,
+    montant_consolide_eur NUMERIC(18, 2) NOT NULL,
+    nb_operations INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ETL_AGREGATS_A_RAFRAICHIR (
+    date_operation DATE PRIMARY KEY
+);
+
+CREATE INDEX IF NOT EXISTS idx_agg_jour_date_compte ON AGG_FLUX_JOURNALIER(date_operation, id_compte);
+CREATE INDEX IF NOT EXISTS idx_agg_mois_periode ON AGG_FLUX_MENSUEL(annee, mois);
+
+COMMENT ON TABLE AGG_FLUX_JOURNALIER IS 'Flux net quotidien par compte et statut (agrégat de FACT_FLUX_TRESORERIE)';
+COMMENT ON TABLE AGG_FLUX_MENSUEL IS 'Totaux mensuels par filiale, devise, scénario, type d''opération et statut';
+COMMENT ON TABLE ETL_AGREGATS_A_RAFRAICHIR IS 'File des dates d''opération dont les agrégats sont à recalculer';
@@ -0,0 +1,25 @@
+-- =====================================================
+-- Migration 005 : index de FACT_FLUX_TRESORERIE adaptés aux requêtes réelles
+-- (create_tables.sql contient déjà ces évolutions)
+-- - extraction du modèle (statut = 'Réalisé', tri par date / compte) : index partiel couvrant
+-- - jointures en étoile Power BI : index sur les clés étrangères id_temps, id_compte, id_contrepartie
+-- - filtres de période : BRIN sur date_operation (données chargées par ordre de date, index minuscule)
+-- Les index mono-colonne à très faible cardinalité (statut, id_scenario) et le B-tree sur date_operation,
+-- couverts par les index ci-dessus et le partitionnement mensuel, sont supprimés (coût à l'écriture)
+-- Mesure : python benchmarks/bench_indexes.py --rows 10000000
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_fact_realise_date_compte ON FACT_FLUX_TRESORERIE (date_operation, id_compte)
+    INCLUDE (montant_consolide_eur, id_temps)
+    WHERE statut = 'Réalisé' AND montant_consolide_eur IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_fact_compte_date ON FACT_FLUX_TRESORERIE (id_compte, date_operation)
+    INCLUDE (montant_consolide_eur, statut);
+CREATE INDEX IF NOT EXISTS idx_fact_id_temps ON FACT_FLUX_TRESORERIE (id_temps);
+CREATE INDEX IF NOT EXISTS idx_fact_id_contrepartie ON FACT_FLUX_TRESORERIE (id_contrepartie);
+CREATE INDEX IF NOT EXISTS idx_fact_date_operation_brin ON FACT_FLUX_TRESORERIE USING brin (date_operation);
+
+DROP INDEX IF EXISTS idx_fact_date_operation;
+DROP INDEX IF EXISTS idx_fact_statut;
+DROP INDEX IF EXISTS idx_fact_id_scenario;
+
+ANALYZE FACT_FLUX_TRESORERIE;
@@ -0,0 +1,19 @@
+-- =====================================================
+-- Migration 006 : chargement par lots avec points de reprise
+-- À appliquer sur une base créée avant l'ajout de ETL_CHECKPOINT_CHARGEMENT
+-- (create_tables.sql contient déjà ces évolutions)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS ETL_CHECKPOINT_CHARGEMENT (
+    id_chargement VARCHAR(255) NOT NULL,
+    nom_table VARCHAR(100) NOT NULL,
+    signature_source VARCHAR(64) NOT NULL,
+    position_source BIGINT NOT NULL DEFAULT 0,
+    nb_lignes_chargees BIGINT NOT NULL DEFAULT 0,
+    derniere_date DATE,
+    termine BOOLEAN NOT NULL DEFAULT FALSE,
+    maj_le TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id_chargement, nom_table)
+);
+
+COMMENT ON TABLE ETL_CHECKPOINT_CHARGEMENT IS 'Position du dernier lot validé par chargement et par table (reprise après échec)';
@@ -0,0 +1,23 @@
+-- =====================================================
+-- Migration 007 : métriques d'exécution du pipeline
+-- À appliquer sur une base créée avant l'ajout de PIPELINE_METRICS
+-- (create_tables.sql contient déjà ces évolutions)
+-- Sans cette table, les métriques sont seulement écrites dans les fichiers (CRESUS_METRICS_DIR)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS PIPELINE_METRICS (
+    id_mesure BIGSERIAL PRIMARY KEY,
+    run_id VARCHAR(255) NOT NULL,
+    etape VARCHAR(50) NOT NULL,
+    objet VARCHAR(255) NOT NULL,
+    debut TIMESTAMP NOT NULL,
+    duree_s DOUBLE PRECISION NOT NULL,
+    lignes_entree BIGINT,
+    lignes_sortie BIGINT,
+    lignes_par_s DOUBLE PRECISION,
+    rss_max_mo NUMERIC(12, 1)
+);
+
+CREATE INDEX IF NOT EXISTS idx_pipeline_metrics_etape ON PIPELINE_METRICS(etape, objet, debut);
+
+COMMENT ON TABLE PIPELINE_METRICS IS 'Métriques d''exécution du pipeline par étape et par table ou lot de comptes';
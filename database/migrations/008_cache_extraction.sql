@@ -0,0 +1,28 @@
+-- =====================================================
+-- Migration 008 : cache de l'extraction du DAG
+-- À appliquer sur une base créée avant l'ajout de ETL_CACHE_SOURCE et ETL_CACHE_RAPPORT
+-- (create_tables.sql contient déjà ces évolutions)
+-- Sans ces tables, le DAG relit et recharge toutes les sources à chaque exécution
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS ETL_CACHE_SOURCE (
+    nom_table VARCHAR(100) PRIMARY KEY,
+    taille_octets BIGINT NOT NULL,
+    mtime_ns BIGINT NOT NULL,
+    hash_contenu VARCHAR(64),
+    artefact TEXT,
+    run_id VARCHAR(255) NOT NULL,
+    maj_le TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS ETL_CACHE_RAPPORT (
+    run_id VARCHAR(255) NOT NULL,
+    nom_table VARCHAR(100) NOT NULL,
+    reutilisee BOOLEAN NOT NULL,
+    motif VARCHAR(255) NOT NULL,
+    cree_le TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (run_id, nom_table)
+);
+
+COMMENT ON TABLE ETL_CACHE_SOURCE IS 'Taille, date de modification et empreinte de chaque source au dernier chargement du DAG';
+COMMENT ON TABLE ETL_CACHE_RAPPORT IS 'Sources réutilisées ou retraitées par exécution du DAG (cache de l''extraction)';
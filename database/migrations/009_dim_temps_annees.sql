@@ -0,0 +1,9 @@
+-- =====================================================
+-- Migration 009 : calendrier DIM_TEMPS sur une période quelconque
+-- À appliquer sur une base créée avant cette évolution (create_tables.sql la contient déjà)
+-- etl/generate_data.py accepte toute période (--start / --end) : la contrainte sur l'année,
+-- limitée à 2020-2030, rejetait par exemple un historique généré depuis 2000
+-- =====================================================
+
+ALTER TABLE DIM_TEMPS DROP CONSTRAINT IF EXISTS chk_annee;
+ALTER TABLE DIM_TEMPS ADD CONSTRAINT chk_annee CHECK (annee >= 1900 AND annee <= 2100);
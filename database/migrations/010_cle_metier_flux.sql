@@ -0,0 +1,26 @@
+-- =====================================================
+-- Migration 010 : clé métier des flux limitée à date, compte, contrepartie et rang d'occurrence
+-- À appliquer sur une base créée avant cette évolution (create_tables.sql la contient déjà)
+-- Montant et type d'opération sortent de cle_metier : une correction à la source met à jour le flux
+-- au lieu d'en ajouter un second. Les clés, calculées en Python (cresus/incremental.py), changent pour
+-- tous les flux déjà chargés : les faits, les agrégats et les états de chargement sont vidés ;
+-- RELANCER ENSUITE UN CHARGEMENT COMPLET (DAG avec {"full_reload": true} ou scripts/load_data.py).
+-- Le commentaire de cle_metier marque la migration comme appliquée : la rejouer est sans effet
+-- =====================================================
+
+DO $$
+BEGIN
+    IF col_description('fact_flux_tresorerie'::regclass,
+                       (SELECT attnum FROM pg_attribute
+                        WHERE attrelid = 'fact_flux_tresorerie'::regclass AND attname = 'cle_metier'))
+       IS DISTINCT FROM 'Clé métier : date, compte, contrepartie et rang d''occurrence' THEN
+        TRUNCATE FACT_FLUX_TRESORERIE, AGG_FLUX_JOURNALIER, AGG_FLUX_MENSUEL, ETL_AGREGATS_A_RAFRAICHIR,
+                 ETL_HIGH_WATER_MARK, ETL_CHECKPOINT_CHARGEMENT;
+        -- Cache de l'extraction (migration 008) : le fichier de faits doit être relu
+        IF to_regclass('etl_cache_source') IS NOT NULL THEN
+            DELETE FROM ETL_CACHE_SOURCE;
+        END IF;
+    END IF;
+END $$;
+
+COMMENT ON COLUMN FACT_FLUX_TRESORERIE.cle_metier IS 'Clé métier : date, compte, contrepartie et rang d''occurrence';
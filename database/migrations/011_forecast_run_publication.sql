@@ -0,0 +1,18 @@
+-- =====================================================
+-- Migration 011 : date de publication des générations de prévisions
+-- La purge (cresus/forecast_runs.py) ne supprime que les générations publiées puis remplacées ;
+-- une exécution sans publiee_le est en cours (ou abandonnée après CRESUS_FORECAST_STALE_RUN_HOURS)
+-- (create_tables.sql contient déjà cette évolution) ; peut être rejouée sans effet
+-- =====================================================
+
+BEGIN;
+
+ALTER TABLE FORECAST_RUN ADD COLUMN IF NOT EXISTS publiee_le TIMESTAMP;
+
+-- Générations existantes : publiées si courantes ou si leur nombre de prévisions est renseigné
+UPDATE FORECAST_RUN SET publiee_le = genere_le
+WHERE publiee_le IS NULL AND (est_courante OR nb_previsions IS NOT NULL);
+
+COMMENT ON COLUMN FORECAST_RUN.publiee_le IS 'Date de publication ; NULL tant que l''exécution est en cours';
+
+COMMIT;
@@ -1,383 +1,795 @@
 """
 Script de génération de données synthétiques pour le POC Crésus
-Génère les fichiers CSV sources pour les dimensions et la table de faits
-Période : 2-3 ans d'historique (2022-2024)
+Génère les fichiers sources pour les dimensions et la table de faits
+Par défaut : 5000 transactions sur 2022-2024, 6 filiales, 4 devises (CSV)
+Volumes de test de charge : colonnes tirées en bloc (numpy.random.Generator initialisé par --seed) et
+écriture par blocs de --chunk-size lignes (CSV ou Parquet) : la mémoire ne dépend pas du volume
+Génération parallèle : --shards N parts (une par intervalle de dates) écrites par un pool de processus
+Taux de change : marche aléatoire de chaque devise contre EUR, toutes les paires cohérentes entre elles ;
+devises lues depuis un fichier JSON (--devises-config)
+Usage : python etl/generate_data.py [--transactions 100000000] [--format parquet] [--chunk-size 1000000]
+                                   [--shards 16] [--workers 8]
 """
 
-import csv
-import random
-from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
-# Configuration
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# Configuration par défaut
 DATA_DIR = Path("data/sources")
-DATA_DIR.mkdir(parents=True, exist_ok=True)
+DEFAULT_TRANSACTIONS = 5000
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Processus de la génération par parts (--shards)
+GENERATOR_WORKERS = int(os.getenv("CRESUS_GENERATOR_WORKERS", str(os.cpu_count() or 1)))
 
 # Période de génération : 2-3 ans (du 1er janvier 2022 au 31 décembre 2024)
 START_DATE = datetime(2022, 1, 1)
 END_DATE = datetime(2024, 12, 31)
 
 # Seed pour reproductibilité
-random.seed(42)
+DEFAULT_SEED = 42
+
+FILIALES = [
+    {"nom_filiale": "ZF Banque France", "pays": "France", "region": "Europe"},
+    {"nom_filiale": "ZF Banque Allemagne", "pays": "Allemagne", "region": "Europe"},
+    {"nom_filiale": "ZF Banque UK", "pays": "Royaume-Uni", "region": "Europe"},
+    {"nom_filiale": "ZF Banque Suisse", "pays": "Suisse", "region": "Europe"},
+    {"nom_filiale": "ZF Banque Espagne", "pays": "Espagne", "region": "Europe"},
+    {"nom_filiale": "ZF Banque Italie", "pays": "Italie", "region": "Europe"},
+]
+
+# Devises : taux de départ (unités de la devise pour 1 EUR) et volatilité quotidienne du cours contre EUR
+# (écart-type du log-rendement) ; remplaçables par un fichier JSON de même structure (--devises-config)
+DEVISES = [
+    {"code_iso": "EUR", "libelle_devise": "Euro", "taux_eur": 1.0, "volatilite": 0.0},
+    {"code_iso": "USD", "libelle_devise": "Dollar américain", "taux_eur": 1.10, "volatilite": 0.004},
+    {"code_iso": "GBP", "libelle_devise": "Livre sterling", "taux_eur": 0.85, "volatilite": 0.003},
+    {"code_iso": "CHF", "libelle_devise": "Franc suisse", "taux_eur": 1.05, "volatilite": 0.003},
+    {"code_iso": "JPY", "libelle_devise": "Yen japonais", "taux_eur": 150.0, "volatilite": 0.005},
+    {"code_iso": "CAD", "libelle_devise": "Dollar canadien", "taux_eur": 1.47, "volatilite": 0.004},
+    {"code_iso": "SEK", "libelle_devise": "Couronne suédoise", "taux_eur": 11.4, "volatilite": 0.004},
+    {"code_iso": "NOK", "libelle_devise": "Couronne norvégienne", "taux_eur": 11.6, "volatilite": 0.005},
+]
+DEFAULT_DEVISES = 4
+
+# Volatilité d'une devise de la configuration sans clé "volatilite"
+DEFAULT_VOLATILITE = 0.004
+
+# Chiffres significatifs des taux écrits dans taux_de_change.csv
+CHIFFRES_TAUX = 8
+
+# Schéma de taux_de_change.csv
+TAUX_SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("code_iso_source", pa.string()),
+    ("code_iso_cible", pa.string()),
+    ("taux", pa.float64()),
+])
+
+# Configuration des opérations : Poids, Signe (+/-), Plages de montants, Mode (pour distribution triangulaire)
+OPS_CONFIG = [
+    # Opérations courantes (flux réguliers)
+    {"type": "Virement émis",        "sign": -1, "weight": 30, "min": 100,    "max": 150000,  "mode": 2500},   # Paiements fournisseurs, charges...
+    {"type": "Virement reçu",        "sign": 1,  "weight": 30, "min": 100,    "max": 200000,  "mode": 5000},   # Paiements clients
+
+    # Opérations de guichet
+    {"type": "Dépôt",                "sign": 1,  "weight": 10, "min": 500,    "max": 50000,   "mode": 2000},
+    {"type": "Retrait",              "sign": -1, "weight": 5,  "min": 50,     "max": 3000,    "mode": 200},
+
+    # Opérations de financement (Montants importants, plus rares)
+    {"type": "Prêt",                 "sign": 1,  "weight": 1,  "min": 100000, "max": 5000000, "mode": 500000}, # Déblocage de fonds
+    {"type": "Remboursement prêt",   "sign": -1, "weight": 5,  "min": 1000,   "max": 50000,   "mode": 5000},   # Échéances
+
+    # Frais et intérêts (Petits montants, fréquents ou périodiques)
+    {"type": "Frais bancaires",      "sign": -1, "weight": 15, "min": 10,     "max": 500,     "mode": 30},
+    {"type": "Intérêts créditeurs",  "sign": 1,  "weight": 2,  "min": 50,     "max": 5000,    "mode": 200},    # Placements
+    {"type": "Intérêts débiteurs",   "sign": -1, "weight": 2,  "min": 50,     "max": 10000,   "mode": 500},    # Agios, découverts
+]
+
+STATUTS = ["Réalisé", "Prévisionnel"]
+
+# Schéma du fichier de faits (identique en CSV et en Parquet)
+FACT_SCHEMA = pa.schema([
+    ("date_operation", pa.date32()),
+    ("montant_transaction", pa.float64()),
+    ("montant_consolide_eur", pa.float64()),
+    ("type_operation", pa.string()),
+    ("statut", pa.string()),
+    ("id_compte", pa.int32()),
+    ("id_devise", pa.int32()),
+    ("id_scenario", pa.int32()),
+    ("id_temps", pa.int32()),
+    ("id_contrepartie", pa.int32()),
+])
 
+# Profils de génération des faits :
+# - uniforme : dates, comptes et types tirés indépendamment (volume exact)
+# - realiste : séries par compte avec tendance, saisonnalité, cycles de fin de mois et échéanciers de prêts,
+#   accompagnées d'un fichier de vérité terrain (volume approché)
+PROFILS = ["uniforme", "realiste"]
 
-def generate_dim_filiale():
-    """Génère la dimension Filiale"""
+# Jours générés après la période pour la vérité terrain (horizon de prévision du modèle)
+DEFAULT_HORIZON = 30
+
+# Profil réaliste : flux aléatoires (nombre de Poisson par compte et par jour) et leur valeur mensuelle
+# moyenne, en part des encaissements mensuels de référence du compte
+FLUX_ALEATOIRES = [
+    {"type": "Virement reçu", "part": 1.00},
+    {"type": "Virement émis", "part": 0.25},
+    {"type": "Dépôt", "part": 0.05},
+    {"type": "Retrait", "part": 0.03},
+]
+PART_PAIE = 0.30            # Virement émis, dernier jour ouvré du mois
+PART_FOURNISSEURS = 0.15    # Virement émis, le 10 et le 25 (jour ouvré suivant)
+PART_INTERETS = 0.002       # Intérêts créditeurs ou débiteurs, dernier jour ouvré du trimestre
+PROBA_PRET = 0.3            # Part des comptes avec un prêt (Prêt débloqué puis Remboursement prêt mensuel)
+FACTEUR_WEEK_END = 0.05     # Activité du week-end par rapport à un jour ouvré
+
+# Contreparties de chaque type d'opération (type_contrepartie de DIM_CONTREPARTIE), banque par défaut
+CONTREPARTIE_PAR_TYPE = {"Virement reçu": "Client", "Virement émis": "Fournisseur"}
+CONTREPARTIE_DEFAUT = "Banque partenaire"
+
+# Vérité terrain : flux net quotidien attendu (espérance du modèle génératif) et réalisé, par compte,
+# en devise du compte ; horizon = jour postérieur à la période des faits
+TRUTH_SCHEMA = pa.schema([
+    ("date_operation", pa.date32()),
+    ("id_compte", pa.int32()),
+    ("flux_attendu", pa.float64()),
+    ("flux_realise", pa.float64()),
+    ("nb_operations", pa.int32()),
+    ("horizon", pa.bool_()),
+])
+
+
+def generate_dim_filiale(data_dir, num_filiales):
+    """Génère la dimension Filiale (filiales supplémentaires numérotées au-delà de la liste de référence)"""
     filiales = [
-        {"nom_filiale": "ZF Banque France", "pays": "France", "region": "Europe"},
-        {"nom_filiale": "ZF Banque Allemagne", "pays": "Allemagne", "region": "Europe"},
-        {"nom_filiale": "ZF Banque UK", "pays": "Royaume-Uni", "region": "Europe"},
-        {"nom_filiale": "ZF Banque Suisse", "pays": "Suisse", "region": "Europe"},
-        {"nom_filiale": "ZF Banque Espagne", "pays": "Espagne", "region": "Europe"},
-        {"nom_filiale": "ZF Banque Italie", "pays": "Italie", "region": "Europe"},
-    ]
-    
-    with open(DATA_DIR / "dim_filiale.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["id_filiale", "nom_filiale", "pays", "region"])
-        writer.writeheader()
-        for idx, filiale in enumerate(filiales, start=1):
-            writer.writerow({
-                "id_filiale": idx,
-                "nom_filiale": filiale["nom_filiale"],
-                "pays": filiale["pays"],
-                "region": filiale["region"]
-            })
-    print(f"[OK] Généré dim_filiale.csv ({len(filiales)} lignes)")
-
-
-def generate_dim_devise():
-    """Génère la dimension Devise"""
-    devises = [
-        {"code_iso": "EUR", "libelle_devise": "Euro"},
-        {"code_iso": "USD", "libelle_devise": "Dollar américain"},
-        {"code_iso": "GBP", "libelle_devise": "Livre sterling"},
-        {"code_iso": "CHF", "libelle_devise": "Franc suisse"},
+        FILIALES[idx] if idx < len(FILIALES) else {
+            "nom_filiale": f"ZF Banque Filiale {idx + 1:03d}",
+            "pays": FILIALES[idx % len(FILIALES)]["pays"],
+            "region": "Europe",
+        }
+        for idx in range(num_filiales)
     ]
-    
-    with open(DATA_DIR / "dim_devise.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["id_devise", "code_iso", "libelle_devise"])
-        writer.writeheader()
-        for idx, devise in enumerate(devises, start=1):
-            writer.writerow({
-                "id_devise": idx,
-                "code_iso": devise["code_iso"],
-                "libelle_devise": devise["libelle_devise"]
-            })
-    print(f"[OK] Généré dim_devise.csv ({len(devises)} lignes)")
+    df = pd.DataFrame(filiales)
+    df.insert(0, "id_filiale", range(1, len(df) + 1))
+    df.to_csv(data_dir / "dim_filiale.csv", index=False, encoding="utf-8")
+    print(f"[OK] Généré dim_filiale.csv ({len(df)} lignes)")
+    return df
+
+
+def load_devises(path=None):
+    """
+    Devises disponibles : DEVISES, ou liste JSON de {"code_iso", "libelle_devise", "taux_eur"[, "volatilite"]}
+    taux_eur = unités de la devise pour 1 EUR au premier jour ; EUR (devise pivot) doit être listé et vaut 1
+    """
+    if path is None:
+        return [dict(devise) for devise in DEVISES]
+    with open(path, encoding="utf-8") as f:
+        devises = json.load(f)
+
+    codes = [devise["code_iso"] for devise in devises]
+    if len(set(codes)) != len(codes):
+        raise ValueError(f"Codes ISO en double dans {path} : {codes}")
+    if "EUR" not in codes:
+        raise ValueError(f"EUR est la devise pivot et doit figurer dans {path} (taux_eur = 1, volatilite = 0)")
+    for devise in devises:
+        devise.setdefault("volatilite", 0.0 if devise["code_iso"] == "EUR" else DEFAULT_VOLATILITE)
+        if devise["taux_eur"] <= 0 or devise["volatilite"] < 0:
+            raise ValueError(f"Taux ou volatilité invalide pour {devise['code_iso']} dans {path}")
+        if devise["code_iso"] == "EUR" and (devise["taux_eur"] != 1 or devise["volatilite"] != 0):
+            raise ValueError(f"EUR est la devise pivot : taux_eur = 1 et volatilite = 0 ({path})")
+    return devises
+
+
+def generate_dim_devise(data_dir, devises, num_devises):
+    """Génère la dimension Devise (les `num_devises` premières devises de la liste) et retourne ces devises"""
+    if not 1 <= num_devises <= len(devises):
+        raise ValueError(f"Nombre de devises entre 1 et {len(devises)} : {num_devises}")
+    devises = devises[:num_devises]
+    if "EUR" not in [devise["code_iso"] for devise in devises]:
+        raise ValueError(f"EUR (devise pivot) absent des {num_devises} premières devises de la liste")
+    df = pd.DataFrame(devises, columns=["code_iso", "libelle_devise"])
+    df.insert(0, "id_devise", range(1, len(df) + 1))
+    df.to_csv(data_dir / "dim_devise.csv", index=False, encoding="utf-8")
+    print(f"[OK] Généré dim_devise.csv ({len(df)} lignes)")
     return devises
 
 
-def generate_dim_scenario():
+def generate_dim_scenario(data_dir):
     """Génère la dimension Scénario"""
     scenarios = [
         {"nom_scenario": "Réalisé", "description": "Données historiques réelles"},
         {"nom_scenario": "Prévisionnel", "description": "Prévisions basées sur le modèle prédictif"},
         {"nom_scenario": "Simulation Taux +1%", "description": "Simulation avec augmentation de 1% des taux"},
     ]
-    
-    with open(DATA_DIR / "dim_scenario.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["id_scenario", "nom_scenario", "description"])
-        writer.writeheader()
-        for idx, scenario in enumerate(scenarios, start=1):
-            writer.writerow({
-                "id_scenario": idx,
-                "nom_scenario": scenario["nom_scenario"],
-                "description": scenario["description"]
-            })
-    print(f"[OK] Généré dim_scenario.csv ({len(scenarios)} lignes)")
-    return scenarios
-
-
-def generate_dim_contrepartie():
+    df = pd.DataFrame(scenarios)
+    df.insert(0, "id_scenario", range(1, len(df) + 1))
+    df.to_csv(data_dir / "dim_scenario.csv", index=False, encoding="utf-8")
+    print(f"[OK] Généré dim_scenario.csv ({len(df)} lignes)")
+    return df
+
+
+def generate_dim_contrepartie(data_dir):
     """Génère la dimension Contrepartie"""
     contreparties = []
-    types_contrepartie = ["Client", "Fournisseur", "Banque partenaire", "Institution financière"]
-    
+
     # Clients
     for i in range(1, 21):
-        contreparties.append({
-            "nom_contrepartie": f"Client Entreprise {i:03d}",
-            "type_contrepartie": "Client"
-        })
-    
+        contreparties.append({"nom_contrepartie": f"Client Entreprise {i:03d}", "type_contrepartie": "Client"})
+
     # Fournisseurs
     for i in range(1, 16):
-        contreparties.append({
-            "nom_contrepartie": f"Fournisseur {i:03d}",
-            "type_contrepartie": "Fournisseur"
-        })
-    
+        contreparties.append({"nom_contrepartie": f"Fournisseur {i:03d}", "type_contrepartie": "Fournisseur"})
+
     # Banques partenaires
     banques = ["BNP Paribas", "Société Générale", "Crédit Agricole", "Deutsche Bank", "HSBC", "UBS"]
     for banque in banques:
-        contreparties.append({
-            "nom_contrepartie": banque,
-            "type_contrepartie": "Banque partenaire"
-        })
-    
+        contreparties.append({"nom_contrepartie": banque, "type_contrepartie": "Banque partenaire"})
+
     # Institutions financières
     institutions = ["Banque Centrale Européenne", "FMI", "Banque Mondiale"]
     for inst in institutions:
-        contreparties.append({
-            "nom_contrepartie": inst,
-            "type_contrepartie": "Institution financière"
-        })
-    
-    with open(DATA_DIR / "dim_contrepartie.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["id_contrepartie", "nom_contrepartie", "type_contrepartie"])
-        writer.writeheader()
-        for idx, contrepartie in enumerate(contreparties, start=1):
-            writer.writerow({
-                "id_contrepartie": idx,
-                "nom_contrepartie": contrepartie["nom_contrepartie"],
-                "type_contrepartie": contrepartie["type_contrepartie"]
-            })
-    print(f"[OK] Généré dim_contrepartie.csv ({len(contreparties)} lignes)")
-    return contreparties
-
-
-def generate_dim_compte(num_filiales, num_devises):
-    """Génère la dimension Compte"""
-    comptes = []
-    types_compte = ["Compte courant", "Compte épargne", "Compte professionnel", "Compte de trésorerie"]
-    
-    # Générer 3-5 comptes par filiale et par devise
-    compte_id = 1
-    for filiale_id in range(1, num_filiales + 1):
-        for devise_id in range(1, num_devises + 1):
-            num_comptes_filiale_devise = random.randint(3, 5)
-            for _ in range(num_comptes_filiale_devise):
-                # Générer un numéro de compte IBAN-like
-                pays_code = random.choice(["FR", "DE", "GB", "CH", "ES", "IT"])
-                numero = f"{pays_code}{random.randint(10, 99)} {random.randint(1000, 9999)} {random.randint(1000, 9999)} {random.randint(1000, 9999)} {random.randint(1000, 9999)} {random.randint(10, 99)}"
-                
-                comptes.append({
-                    "id_compte": compte_id,
-                    "numero_compte": numero,
-                    "type_compte": random.choice(types_compte),
-                    "id_devise": devise_id,
-                    "id_filiale": filiale_id
-                })
-                compte_id += 1
-    
-    with open(DATA_DIR / "dim_compte.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["id_compte", "numero_compte", "type_compte", "id_devise", "id_filiale"])
-        writer.writeheader()
-        for compte in comptes:
-            writer.writerow(compte)
-    print(f"[OK] Généré dim_compte.csv ({len(comptes)} lignes)")
-    return comptes
-
-
-def generate_dim_temps():
-    """Génère la dimension Temps"""
-    temps_records = []
-    current_date = START_DATE
-    id_temps = 1
-    
-    while current_date <= END_DATE:
-        temps_records.append({
-            "id_temps": id_temps,
-            "jour": current_date.day,
-            "mois": current_date.month,
-            "annee": current_date.year
-        })
-        current_date += timedelta(days=1)
-        id_temps += 1
-    
-    with open(DATA_DIR / "dim_temps.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["id_temps", "jour", "mois", "annee"])
-        writer.writeheader()
-        for record in temps_records:
-            writer.writerow(record)
-    print(f"[OK] Généré dim_temps.csv ({len(temps_records)} lignes)")
-    return temps_records
-
-
-def generate_taux_de_change():
-    """Génère l'historique des taux de change"""
-    taux_records = []
-    current_date = START_DATE
-    
-    # Taux de base (approximatifs)
-    taux_base = {
-        ("EUR", "USD"): 1.10,
-        ("EUR", "GBP"): 0.85,
-        ("EUR", "CHF"): 1.05,
-        ("USD", "EUR"): 0.91,
-        ("GBP", "EUR"): 1.18,
-        ("CHF", "EUR"): 0.95,
+        contreparties.append({"nom_contrepartie": inst, "type_contrepartie": "Institution financière"})
+
+    df = pd.DataFrame(contreparties)
+    df.insert(0, "id_contrepartie", range(1, len(df) + 1))
+    df.to_csv(data_dir / "dim_contrepartie.csv", index=False, encoding="utf-8")
+    print(f"[OK] Généré dim_contrepartie.csv ({len(df)} lignes)")
+    return df
+
+
+def generate_dim_compte(data_dir, num_filiales, num_devises, rng, num_comptes=None):
+    """
+    Génère la dimension Compte
+    num_comptes=None : 3 à 5 comptes par filiale et par devise ; sinon num_comptes répartis
+    uniformément sur les couples (filiale, devise)
+    """
+    types_compte = np.array(["Compte courant", "Compte épargne", "Compte professionnel", "Compte de trésorerie"])
+    pays_codes = np.array(["FR", "DE", "GB", "CH", "ES", "IT"])
+
+    num_couples = num_filiales * num_devises
+    if num_comptes is None:
+        par_couple = rng.integers(3, 6, size=num_couples)
+    else:
+        par_couple = np.full(num_couples, num_comptes // num_couples)
+        par_couple[:num_comptes % num_couples] += 1
+    couples = np.repeat(np.arange(num_couples), par_couple)
+    n = len(couples)
+
+    # Numéro de compte IBAN-like
+    blocs = rng.integers(1000, 10000, size=(n, 4)).astype(str)
+    numeros = (
+        pays_codes[rng.integers(0, len(pays_codes), size=n)].astype(object)
+        + rng.integers(10, 100, size=n).astype(str)
+        + " " + blocs[:, 0] + " " + blocs[:, 1] + " " + blocs[:, 2] + " " + blocs[:, 3]
+        + " " + rng.integers(10, 100, size=n).astype(str)
+    )
+
+    df = pd.DataFrame({
+        "id_compte": np.arange(1, n + 1),
+        "numero_compte": numeros,
+        "type_compte": types_compte[rng.integers(0, len(types_compte), size=n)],
+        "id_devise": couples % num_devises + 1,
+        "id_filiale": couples // num_devises + 1,
+    })
+    df.to_csv(data_dir / "dim_compte.csv", index=False, encoding="utf-8")
+    print(f"[OK] Généré dim_compte.csv ({len(df)} lignes)")
+    return df
+
+
+def generate_dim_temps(data_dir, start_date, end_date):
+    """Génère la dimension Temps (un jour par ligne, id_temps = rang du jour dans la période)"""
+    dates = pd.date_range(start_date, end_date, freq="D")
+    df = pd.DataFrame({
+        "id_temps": np.arange(1, len(dates) + 1),
+        "jour": dates.day,
+        "mois": dates.month,
+        "annee": dates.year,
+    })
+    df.to_csv(data_dir / "dim_temps.csv", index=False, encoding="utf-8")
+    print(f"[OK] Généré dim_temps.csv ({len(df)} lignes)")
+    return df
+
+
+def draw_fx_paths(rng, devises, num_jours):
+    """
+    Cours de chaque devise contre EUR (unités pour 1 EUR), tableau [jour, devise] :
+    marche aléatoire géométrique partant de taux_eur, log-rendements N(0, volatilite) à partir du 2e jour
+    """
+    depart = np.log([devise["taux_eur"] for devise in devises])
+    volatilite = np.array([devise["volatilite"] for devise in devises], dtype=float)
+    rendements = rng.normal(0.0, 1.0, size=(num_jours, len(devises))) * volatilite
+    rendements[0] = 0.0
+    return np.exp(depart + np.cumsum(rendements, axis=0))
+
+
+def _round_significant(values, digits=CHIFFRES_TAUX):
+    """Arrondi à `digits` chiffres significatifs (taux de tous ordres de grandeur : JPY → EUR comme EUR → JPY)"""
+    decimales = digits - 1 - np.floor(np.log10(np.abs(values))).astype(int)
+    echelle = 10.0 ** decimales
+    return np.round(values * echelle) / echelle
+
+
+def generate_taux_de_change(data_dir, devises, start_date, end_date, rng, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Génère l'historique des taux de change de toutes les paires (source ≠ cible) de `devises`
+    Chaque devise suit une marche aléatoire contre EUR (draw_fx_paths) ; taux source → cible = cours cible /
+    cours source : inverses et taux croisés sont cohérents chaque jour (à l'arrondi près)
+    Écriture par blocs de jours d'au plus `chunk_size` lignes
+    """
+    dates = pd.date_range(start_date, end_date, freq="D").to_numpy().astype("datetime64[D]")
+    codes = np.array([devise["code_iso"] for devise in devises], dtype=object)
+    cours = draw_fx_paths(rng, devises, len(dates))
+
+    n = len(codes)
+    source, cible = np.nonzero(~np.eye(n, dtype=bool))
+    jours_par_bloc = max(chunk_size // max(len(source), 1), 1)
+    with _writer(data_dir / "taux_de_change.csv", "csv", TAUX_SCHEMA) as writer:
+        for debut in range(0, len(dates), jours_par_bloc):
+            bloc = cours[debut:debut + jours_par_bloc]
+            taux = bloc[:, cible] / bloc[:, source]
+            writer.write_table(pa.table({
+                "date": np.repeat(dates[debut:debut + jours_par_bloc], len(source)),
+                "code_iso_source": np.tile(codes[source], len(bloc)),
+                "code_iso_cible": np.tile(codes[cible], len(bloc)),
+                "taux": _round_significant(taux.ravel()),
+            }, schema=TAUX_SCHEMA))
+    print(f"[OK] Généré taux_de_change.csv ({len(dates) * len(source)} lignes, {n} devises)")
+    return cours
+
+
+def draw_fact_chunk(rng, size, comptes, start_date, num_contreparties, premier_jour, num_jours):
+    """
+    Tire un bloc de `size` transactions, colonne par colonne, sur les jours
+    [premier_jour, premier_jour + num_jours) de la période
+    Les id_temps suivent DIM_TEMPS (un identifiant par jour à partir du début de période)
+    """
+    types = np.array([op["type"] for op in OPS_CONFIG], dtype=object)
+    poids = np.array([op["weight"] for op in OPS_CONFIG], dtype=float)
+    signes = np.array([op["sign"] for op in OPS_CONFIG], dtype=float)
+    minimums = np.array([op["min"] for op in OPS_CONFIG], dtype=float)
+    maximums = np.array([op["max"] for op in OPS_CONFIG], dtype=float)
+    modes = np.array([op["mode"] for op in OPS_CONFIG], dtype=float)
+
+    jours = premier_jour + rng.integers(0, num_jours, size=size)
+    idx_compte = rng.integers(0, len(comptes), size=size)
+
+    # Type d'opération pondéré, puis montant réaliste (distribution triangulaire propre au type)
+    idx_type = rng.choice(len(OPS_CONFIG), size=size, p=poids / poids.sum())
+    montants = rng.triangular(minimums[idx_type], modes[idx_type], maximums[idx_type])
+
+    # Statut (majoritairement Réalisé pour l'historique), scénario 1 = Réalisé, sinon 2 ou 3
+    realise = rng.random(size) < 0.9
+    id_scenario = np.where(realise, 1, rng.integers(2, 4, size=size))
+
+    return pa.table({
+        "date_operation": np.datetime64(start_date.date(), "D") + jours,
+        "montant_transaction": np.round(montants * signes[idx_type], 2),
+        "montant_consolide_eur": pa.nulls(size, pa.float64()),  # Sera calculé dans le pipeline ETL
+        "type_operation": types[idx_type],
+        "statut": np.where(realise, STATUTS[0], STATUTS[1]).astype(object),
+        "id_compte": comptes["id_compte"].to_numpy()[idx_compte],
+        "id_devise": comptes["id_devise"].to_numpy()[idx_compte],
+        "id_scenario": id_scenario,
+        "id_temps": jours + 1,
+        "id_contrepartie": rng.integers(1, num_contreparties + 1, size=size),
+    })
+
+
+def _writer(path, output_format, schema=FACT_SCHEMA):
+    """Écrivain par blocs (CSV ou Parquet, un groupe de lignes par bloc)"""
+    if output_format == "parquet":
+        return pq.ParquetWriter(path, schema)
+    return pacsv.CSVWriter(path, schema, write_options=pacsv.WriteOptions(quoting_style="needed"))
+
+
+def write_fact_file(path, rng, num_transactions, comptes, start_date, num_contreparties,
+                    premier_jour, num_jours, output_format="csv", chunk_size=DEFAULT_CHUNK_SIZE):
+    """Tire et écrit `num_transactions` transactions (profil uniforme) par blocs de `chunk_size` lignes"""
+    with _writer(path, output_format) as writer:
+        for debut in range(0, num_transactions, chunk_size):
+            size = min(chunk_size, num_transactions - debut)
+            table = draw_fact_chunk(rng, size, comptes, start_date, num_contreparties, premier_jour, num_jours)
+            writer.write_table(table.cast(FACT_SCHEMA))
+    return num_transactions
+
+
+def build_calendar(start_date, num_jours):
+    """
+    Calendrier du profil réaliste, un élément par jour depuis start_date
+    Retourne {nom: tableau NumPy} : activité du jour (week-end réduit), jours de paie / fournisseurs /
+    frais / intérêts, ancienneté en années, angle saisonnier, mois (depuis 1970) et jour du mois
+    """
+    jours = np.datetime64(start_date.date(), "D") + np.arange(num_jours)
+    mois = jours.astype("datetime64[M]")
+    bornes = np.arange(mois[0], mois[-1] + 2).astype("datetime64[D]")
+    debuts_mois, fins_mois = bornes[:-1], bornes[1:] - 1
+
+    paie = np.busday_offset(fins_mois, 0, roll="backward")
+    fournisseurs = np.busday_offset(np.concatenate([debuts_mois + 9, debuts_mois + 24]), 0, roll="forward")
+    frais = np.busday_offset(debuts_mois, 0, roll="forward")
+    trimestres = paie[(debuts_mois.astype("datetime64[M]").astype(int) % 12 + 1) % 3 == 0]
+
+    return {
+        "activite": np.where(np.is_busday(jours), 1.0, FACTEUR_WEEK_END),
+        "paie": np.isin(jours, paie),
+        "fournisseurs": np.isin(jours, fournisseurs),
+        "frais": np.isin(jours, frais),
+        "interets": np.isin(jours, trimestres),
+        "annees": np.arange(num_jours) / 365.25,
+        "angle": 2 * np.pi * (jours - jours.astype("datetime64[Y]")).astype(int) / 365.25,
+        "mois": mois.astype(int),
+        "jour_mois": (jours - mois).astype(int) + 1,
+    }
+
+
+def draw_account_profiles(rng, comptes, devises, calendrier, num_jours, num_transactions):
+    """
+    Paramètres du profil réaliste de chaque compte, tirés une fois et partagés par toutes les parts
+    La valeur des flux ne dépend que des encaissements mensuels de référence du compte (en devise du compte) ;
+    le volume cible fixe le nombre de flux aléatoires : plus de transactions = des montants unitaires plus petits
+    """
+    n = len(comptes)
+    change = np.array([devise["taux_eur"] for devise in devises])[comptes["id_devise"].to_numpy() - 1]
+    reference = np.exp(rng.normal(np.log(300_000), 0.8, size=n)) * change
+    activite = rng.gamma(2.0, 0.5, size=n)
+    modele = {
+        "id_compte": comptes["id_compte"].to_numpy(),
+        "id_devise": comptes["id_devise"].to_numpy(),
+        "reference": reference,
+        "croissance": rng.normal(0.03, 0.05, size=n),       # tendance annuelle
+        "amplitude": rng.uniform(0.1, 0.4, size=n),         # saisonnalité annuelle
+        "phase": rng.uniform(0, 2 * np.pi, size=n),
+        "frais": rng.uniform(20, 300, size=n) * change,
+        "interets_crediteurs": rng.random(n) < 0.5,
     }
-    
-    # Codes ISO des devises
-    devises_codes = ["EUR", "USD", "GBP", "CHF"]
-    
-    while current_date <= END_DATE:
-        # Générer des taux avec une légère variation quotidienne (±0.5%)
-        for source in devises_codes:
-            for cible in devises_codes:
-                if source != cible:
-                    if (source, cible) in taux_base:
-                        base_taux = taux_base[(source, cible)]
-                    else:
-                        # Calculer taux inverse ou croisé
-                        if (cible, source) in taux_base:
-                            base_taux = 1 / taux_base[(cible, source)]
-                        else:
-                            continue
-                    
-                    # Variation aléatoire quotidienne
-                    variation = random.uniform(-0.005, 0.005)
-                    taux = base_taux * (1 + variation)
-                    
-                    taux_records.append({
-                        "date": current_date.strftime("%Y-%m-%d"),
-                        "code_iso_source": source,
-                        "code_iso_cible": cible,
-                        "taux": round(taux, 6)
-                    })
-        
-        current_date += timedelta(days=1)
-    
-    with open(DATA_DIR / "taux_de_change.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["date", "code_iso_source", "code_iso_cible", "taux"])
-        writer.writeheader()
-        for record in taux_records:
-            writer.writerow(record)
-    print(f"[OK] Généré taux_de_change.csv ({len(taux_records)} lignes)")
-    return taux_records
-
-
-def generate_fact_flux_tresorerie(comptes, temps_records, num_contreparties):
-    """Génère la table de faits FACT_FLUX_TRESORERIE avec des données réalistes"""
-    flux_records = []
-    
-    # Configuration des opérations : Poids, Signe (+/-), Plages de montants, Mode (pour distribution triangulaire)
-    ops_config = [
-        # Opérations courantes (flux réguliers)
-        {"type": "Virement émis",        "sign": -1, "weight": 30, "min": 100,    "max": 150000,  "mode": 2500},   # Paiements fournisseurs, charges...
-        {"type": "Virement reçu",        "sign": 1,  "weight": 30, "min": 100,    "max": 200000,  "mode": 5000},   # Paiements clients
-        
-        # Opérations de guichet
-        {"type": "Dépôt",                "sign": 1,  "weight": 10, "min": 500,    "max": 50000,   "mode": 2000},
-        {"type": "Retrait",              "sign": -1, "weight": 5,  "min": 50,     "max": 3000,    "mode": 200},
-        
-        # Opérations de financement (Montants importants, plus rares)
-        {"type": "Prêt",                 "sign": 1,  "weight": 1,  "min": 100000, "max": 5000000, "mode": 500000}, # Déblocage de fonds
-        {"type": "Remboursement prêt",   "sign": -1, "weight": 5,  "min": 1000,   "max": 50000,   "mode": 5000},   # Échéances
-        
-        # Frais et intérêts (Petits montants, fréquents ou périodiques)
-        {"type": "Frais bancaires",      "sign": -1, "weight": 15, "min": 10,     "max": 500,     "mode": 30},
-        {"type": "Intérêts créditeurs",  "sign": 1,  "weight": 2,  "min": 50,     "max": 5000,    "mode": 200},    # Placements
-        {"type": "Intérêts débiteurs",   "sign": -1, "weight": 2,  "min": 50,     "max": 10000,   "mode": 500},    # Agios, découverts
+
+    # Prêts : déblocage dans les premiers 60 % de la période, puis échéances mensuelles constantes (annuités)
+    a_pret = rng.random(n) < PROBA_PRET
+    principal = reference * rng.uniform(1, 6, size=n)
+    debut = rng.integers(0, max(1, int(num_jours * 0.6)), size=n)
+    duree = rng.integers(24, 85, size=n)
+    taux = rng.uniform(0.02, 0.06, size=n) / 12
+    modele.update({
+        "pret_principal": principal,
+        "pret_debut": np.where(a_pret, debut, -1),
+        "pret_mois": calendrier["mois"][debut],
+        "pret_jour": np.minimum(calendrier["jour_mois"][debut], 28),
+        "pret_duree": np.where(a_pret, duree, 0),
+        "pret_echeance": principal * taux / (1 - (1 + taux) ** -duree),
+    })
+
+    # Volume : les flux récurrents attendus sur la période, le reste (au moins autant) en flux aléatoires
+    recurrents = n * sum(calendrier[nom][:num_jours].sum() for nom in ("paie", "fournisseurs", "frais", "interets"))
+    mois_restants = calendrier["mois"][num_jours - 1] - modele["pret_mois"]
+    recurrents += (np.minimum(duree, mois_restants) + 1)[a_pret].sum()
+    aleatoires = max(num_transactions - recurrents, recurrents)
+
+    config = {op["type"]: op for op in OPS_CONFIG}
+    poids = np.array([config[flux["type"]]["weight"] for flux in FLUX_ALEATOIRES], dtype=float)
+    parts = np.array([flux["part"] for flux in FLUX_ALEATOIRES])
+    activite_moyenne = calendrier["activite"][:num_jours].mean()
+    # Nombre moyen de flux par jour ouvré (type × compte) et montant unitaire moyen correspondant
+    modele["lambdas"] = (aleatoires * (poids / poids.sum())[:, None] * (activite / activite.sum())[None, :]
+                         / (num_jours * activite_moyenne))
+    modele["tickets"] = parts[:, None] * reference[None, :] * 12 / 365.25 / (modele["lambdas"] * activite_moyenne)
+    return modele
+
+
+def _recurring_rows(rng, masque, valeurs, bruit=0.0):
+    """Une transaction par cellule (jour × compte) du masque, de montant `valeurs` à un bruit relatif près"""
+    cellules = np.flatnonzero(masque)
+    montants = np.broadcast_to(valeurs, masque.shape).ravel()[cellules]
+    if bruit:
+        montants = montants * (1 + rng.normal(0, bruit, size=len(cellules)))
+    return cellules, montants
+
+
+def draw_realistic_block(rng, modele, calendrier, contreparties, start_date, jours, num_jours):
+    """
+    Tire les transactions de tous les comptes sur les jours `jours` (indices depuis le début de période)
+    Retourne (transactions des jours < num_jours triées par jour et compte, flux attendu, flux réalisé,
+    nombre d'opérations), ces trois derniers en matrices jours × comptes
+    """
+    n = len(modele["reference"])
+    config = {op["type"]: op for op in OPS_CONFIG}
+    types = [op["type"] for op in OPS_CONFIG]
+    activite = calendrier["activite"][jours][:, None]
+    tendance = (1 + modele["croissance"]) ** calendrier["annees"][jours][:, None]
+    saison = 1 + modele["amplitude"] * np.sin(calendrier["angle"][jours][:, None] + modele["phase"])
+    attendu = np.zeros((len(jours), n))
+    morceaux = []  # (cellules jour × compte, type d'opération, montants, type de contrepartie)
+
+    # Flux aléatoires : nombre de Poisson suivant l'activité du jour, la tendance et la saison du compte,
+    # montants unitaires en distribution triangulaire (forme de OPS_CONFIG ramenée à une moyenne de 1)
+    for i, flux in enumerate(FLUX_ALEATOIRES):
+        op = config[flux["type"]]
+        moyenne = (op["min"] + op["mode"] + op["max"]) / 3
+        taux = activite * tendance * saison * modele["lambdas"][i]
+        cellules = np.repeat(np.arange(taux.size), rng.poisson(taux).ravel())
+        formes = rng.triangular(op["min"] / moyenne, op["mode"] / moyenne, op["max"] / moyenne, size=len(cellules))
+        montants = op["sign"] * modele["tickets"][i][cellules % n] * formes
+        morceaux.append((cellules, flux["type"], montants, CONTREPARTIE_PAR_TYPE.get(flux["type"], CONTREPARTIE_DEFAUT)))
+        attendu += op["sign"] * taux * modele["tickets"][i]
+
+    # Flux récurrents : paie et fournisseurs (fin de mois), frais, intérêts trimestriels, prêts
+    tous_comptes = np.ones((1, n), dtype=bool)
+    reference = modele["reference"]
+    crediteurs = modele["interets_crediteurs"]
+    mois_pret = calendrier["mois"][jours][:, None] - modele["pret_mois"]
+    echeance = ((calendrier["jour_mois"][jours][:, None] == modele["pret_jour"])
+                & (mois_pret >= 1) & (mois_pret <= modele["pret_duree"]))
+    recurrents = [
+        # (type, masque, valeur attendue, bruit relatif, type de contrepartie)
+        ("Virement émis", calendrier["paie"][jours][:, None] & tous_comptes,
+         -PART_PAIE * reference * tendance, 0.02, CONTREPARTIE_DEFAUT),
+        ("Virement émis", calendrier["fournisseurs"][jours][:, None] & tous_comptes,
+         -PART_FOURNISSEURS * reference * tendance * saison, 0.10, "Fournisseur"),
+        ("Frais bancaires", calendrier["frais"][jours][:, None] & tous_comptes, -modele["frais"], 0.0, CONTREPARTIE_DEFAUT),
+        ("Intérêts créditeurs", calendrier["interets"][jours][:, None] & crediteurs,
+         PART_INTERETS * reference * tendance, 0.0, CONTREPARTIE_DEFAUT),
+        ("Intérêts débiteurs", calendrier["interets"][jours][:, None] & ~crediteurs,
+         -PART_INTERETS * reference * tendance, 0.0, CONTREPARTIE_DEFAUT),
+        ("Prêt", jours[:, None] == modele["pret_debut"], modele["pret_principal"], 0.0, CONTREPARTIE_DEFAUT),
+        ("Remboursement prêt", echeance, -modele["pret_echeance"], 0.0, CONTREPARTIE_DEFAUT),
+    ]
+    for type_operation, masque, valeurs, bruit, categorie in recurrents:
+        cellules, montants = _recurring_rows(rng, masque, valeurs, bruit)
+        morceaux.append((cellules, type_operation, montants, categorie))
+        attendu += np.where(masque, valeurs, 0.0)
+
+    # Assemblage, contreparties tirées dans la catégorie de chaque flux, tri par jour puis compte
+    cellules = np.concatenate([m[0] for m in morceaux])
+    idx_type = np.concatenate([np.full(len(m[0]), types.index(m[1])) for m in morceaux])
+    montants = np.round(np.concatenate([m[2] for m in morceaux]), 2)
+    id_contrepartie = np.concatenate([
+        contreparties[m[3]][rng.integers(0, len(contreparties[m[3]]), size=len(m[0]))] for m in morceaux
+    ])
+    ordre = np.argsort(cellules, kind="stable")
+    cellules, idx_type, montants, id_contrepartie = (
+        cellules[ordre], idx_type[ordre], montants[ordre], id_contrepartie[ordre]
+    )
+    realise = np.bincount(cellules, weights=montants, minlength=attendu.size).reshape(attendu.shape)
+    nombre = np.bincount(cellules, minlength=attendu.size).reshape(attendu.shape)
+
+    jour, compte = jours[cellules // n], cellules % n
+    faits = jour < num_jours
+    jour, compte, size = jour[faits], compte[faits], int(faits.sum())
+    table = pa.table({
+        "date_operation": np.datetime64(start_date.date(), "D") + jour,
+        "montant_transaction": montants[faits],
+        "montant_consolide_eur": pa.nulls(size, pa.float64()),  # Sera calculé dans le pipeline ETL
+        "type_operation": np.array(types, dtype=object)[idx_type[faits]],
+        "statut": np.full(size, STATUTS[0], dtype=object),
+        "id_compte": modele["id_compte"][compte],
+        "id_devise": modele["id_devise"][compte],
+        "id_scenario": np.ones(size, dtype="int32"),
+        "id_temps": jour + 1,
+        "id_contrepartie": id_contrepartie[faits],
+    })
+    return table, attendu, realise, nombre
+
+
+def write_realistic_range(fact_path, truth_path, rng, modele, calendrier, contreparties, start_date,
+                          premier_jour, nb_jours, num_jours, output_format="csv", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Génère le profil réaliste des jours [premier_jour, premier_jour + nb_jours) par blocs de jours
+    (au plus chunk_size transactions attendues et chunk_size cellules jour × compte par bloc)
+    Les jours >= num_jours (horizon) ne sont écrits que dans la vérité terrain
+    Retourne le nombre de transactions écrites dans le fichier de faits
+    """
+    n = len(modele["reference"])
+    par_jour = modele["lambdas"].sum() + 0.2 * n
+    jours_par_bloc = int(max(1, min(chunk_size // n, chunk_size // par_jour)))
+    ecrites = 0
+    with _writer(fact_path, output_format) as faits, _writer(truth_path, output_format, TRUTH_SCHEMA) as verite:
+        for debut in range(premier_jour, premier_jour + nb_jours, jours_par_bloc):
+            jours = np.arange(debut, min(debut + jours_par_bloc, premier_jour + nb_jours))
+            table, attendu, realise, nombre = draw_realistic_block(
+                rng, modele, calendrier, contreparties, start_date, jours, num_jours
+            )
+            faits.write_table(table.cast(FACT_SCHEMA))
+            ecrites += table.num_rows
+            verite.write_table(pa.table({
+                "date_operation": np.repeat(np.datetime64(start_date.date(), "D") + jours, n),
+                "id_compte": np.tile(modele["id_compte"], len(jours)),
+                "flux_attendu": np.round(attendu.ravel(), 2),
+                "flux_realise": np.round(realise.ravel(), 2),
+                "nb_operations": nombre.ravel(),
+                "horizon": np.repeat(jours >= num_jours, n),
+            }).cast(TRUTH_SCHEMA))
+    return ecrites
+
+
+def shard_plan(num_transactions, num_jours, shards):
+    """
+    Découpe la période en `shards` intervalles de jours contigus ; les transactions sont réparties
+    au prorata du nombre de jours (même densité quotidienne qu'une génération en une part)
+    Retourne [(premier jour, nombre de jours, nombre de transactions)]
+    """
+    if not 1 <= shards <= num_jours:
+        raise ValueError(f"Nombre de parts entre 1 et {num_jours} (jours de la période) : {shards}")
+    jours = [i * num_jours // shards for i in range(shards + 1)]
+    transactions = [num_transactions * jour // num_jours for jour in jours]
+    return [
+        (jours[i], jours[i + 1] - jours[i], transactions[i + 1] - transactions[i])
+        for i in range(shards)
     ]
-    
-    # Préparation des poids et types pour random.choices
-    types_list = [op["type"] for op in ops_config]
-    weights_list = [op["weight"] for op in ops_config]
-    config_map = {op["type"]: op for op in ops_config}
-
-    statuts = ["Réalisé", "Prévisionnel"]
-    
-    # Générer environ 5000 transactions sur la période
-    num_transactions = 5000
-    
-    # Créer un dictionnaire pour mapper date -> id_temps
-    date_to_id_temps = {}
-    for temps in temps_records:
-        date_key = f"{temps['annee']}-{temps['mois']:02d}-{temps['jour']:02d}"
-        date_to_id_temps[date_key] = temps['id_temps']
-    
-    for _ in range(num_transactions):
-        # Date aléatoire dans la période
-        days_offset = random.randint(0, (END_DATE - START_DATE).days)
-        date_operation = START_DATE + timedelta(days=days_offset)
-        date_key = date_operation.strftime("%Y-%m-%d")
-        
-        if date_key not in date_to_id_temps:
-            continue
-        
-        id_temps = date_to_id_temps[date_key]
-        
-        # Sélectionner un compte aléatoire
-        compte = random.choice(comptes)
-        id_compte = compte['id_compte']
-        id_devise = compte['id_devise']
-        
-        # Sélectionner un type d'opération pondéré
-        type_operation = random.choices(types_list, weights=weights_list, k=1)[0]
-        op_cfg = config_map[type_operation]
-        
-        # Générer un montant réaliste (distribution triangulaire)
-        base_amount = random.triangular(op_cfg["min"], op_cfg["max"], op_cfg["mode"])
-        montant_transaction = round(base_amount * op_cfg["sign"], 2)
-        
-        # Statut (majoritairement Réalisé pour l'historique)
-        # Les dates futures par rapport à aujourd'hui devraient être prévisionnelles, mais ici on simule un historique complet
-        # On garde la logique aléatoire simple pour l'instant
-        statut = random.choices(statuts, weights=[90, 10])[0]
-        
-        # Scénario (1 = Réalisé pour la plupart)
-        id_scenario = 1 if statut == "Réalisé" else random.choice([2, 3])
-        
-        # Contrepartie aléatoire
-        id_contrepartie = random.randint(1, num_contreparties)
-        
-        flux_records.append({
-            "date_operation": date_key,
-            "montant_transaction": montant_transaction,
-            "montant_consolide_eur": None,  # Sera calculé dans le pipeline ETL
-            "type_operation": type_operation,
-            "statut": statut,
-            "id_compte": id_compte,
-            "id_devise": id_devise,
-            "id_scenario": id_scenario,
-            "id_temps": id_temps,
-            "id_contrepartie": id_contrepartie
-        })
-    
-    with open(DATA_DIR / "fact_flux_tresorerie.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=[
-            "date_operation", "montant_transaction", "montant_consolide_eur",
-            "type_operation", "statut", "id_compte", "id_devise",
-            "id_scenario", "id_temps", "id_contrepartie"
-        ])
-        writer.writeheader()
-        for record in flux_records:
-            writer.writerow(record)
-    print(f"[OK] Généré fact_flux_tresorerie.csv ({len(flux_records)} lignes) avec logique réaliste")
-
-
-def main():
-    """Fonction principale"""
+
+
+def _run_shard(task):
+    """Génère une part dans un processus du pool : (fonction d'écriture, SeedSequence propre à la part, arguments)"""
+    write, seed_sequence, kwargs = task
+    return write(rng=np.random.default_rng(seed_sequence), **kwargs)
+
+
+def _clear_fact_outputs(data_dir):
+    """Une seule disposition à la fois : les faits et la vérité terrain d'une génération précédente sont supprimés"""
+    for name in ("fact_flux_tresorerie", "verite_terrain"):
+        if (data_dir / name).is_dir():
+            shutil.rmtree(data_dir / name)
+        for extension in ("csv", "parquet"):
+            (data_dir / f"{name}.{extension}").unlink(missing_ok=True)
+
+
+def generate_fact_flux_tresorerie(data_dir, comptes, contreparties, devises, start_date, end_date, rng,
+                                  num_transactions=DEFAULT_TRANSACTIONS, output_format="csv",
+                                  chunk_size=DEFAULT_CHUNK_SIZE, shards=1, seed=DEFAULT_SEED,
+                                  workers=GENERATOR_WORKERS, profil="uniforme", horizon=DEFAULT_HORIZON):
+    """
+    Génère la table de faits FACT_FLUX_TRESORERIE par blocs de `chunk_size` lignes
+    profil="realiste" : séries par compte (build_calendar, draw_account_profiles) et vérité terrain
+    verite_terrain.<format> sur la période et `horizon` jours supplémentaires
+    shards=1 : un fichier fact_flux_tresorerie.<format>, tiré avec `rng`
+    shards>1 : répertoire fact_flux_tresorerie/ de parts part-NNNNN.<format>, une par intervalle de dates,
+    générées en parallèle sur `workers` processus ; chaque part a son propre flux aléatoire, dérivé de
+    `seed` (SeedSequence.spawn) : à graine, nombre de parts et taille de bloc identiques, les fichiers
+    sont identiques octet pour octet, quel que soit le nombre de processus
+    Retourne le chemin du fichier ou du répertoire écrit
+    """
+    num_jours = (end_date - start_date).days + 1
+    _clear_fact_outputs(data_dir)
+
+    plan = shard_plan(num_transactions, num_jours, max(shards, 1))
+    if profil == "realiste":
+        calendrier = build_calendar(start_date, num_jours + horizon)
+        modele = draw_account_profiles(rng, comptes, devises, calendrier, num_jours, num_transactions)
+        categories = {
+            categorie: ids.to_numpy()
+            for categorie, ids in contreparties.groupby("type_contrepartie")["id_contrepartie"]
+        }
+        write = write_realistic_range
+        # Les jours de l'horizon sont générés par la dernière part
+        arguments = [
+            {"modele": modele, "calendrier": calendrier, "contreparties": categories, "start_date": start_date,
+             "premier_jour": premier_jour, "nb_jours": nb_jours + (horizon if numero == len(plan) - 1 else 0),
+             "num_jours": num_jours, "output_format": output_format, "chunk_size": chunk_size}
+            for numero, (premier_jour, nb_jours, _) in enumerate(plan)
+        ]
+    else:
+        write = write_fact_file
+        arguments = [
+            {"num_transactions": nb_transactions, "comptes": comptes, "start_date": start_date,
+             "num_contreparties": len(contreparties), "premier_jour": premier_jour, "num_jours": nb_jours,
+             "output_format": output_format, "chunk_size": chunk_size}
+            for premier_jour, nb_jours, nb_transactions in plan
+        ]
+
+    if shards <= 1:
+        path = data_dir / f"fact_flux_tresorerie.{output_format}"
+        kwargs = dict(arguments[0], path=path) if write is write_fact_file else dict(
+            arguments[0], fact_path=path, truth_path=data_dir / f"verite_terrain.{output_format}")
+        ecrites = write(rng=rng, **kwargs)
+        print(f"[OK] Généré {path.name} ({ecrites} lignes), profil {profil}")
+        return path
+
+    parts_dir = data_dir / "fact_flux_tresorerie"
+    parts_dir.mkdir()
+    if profil == "realiste":
+        (data_dir / "verite_terrain").mkdir()
+    seed_sequences = np.random.SeedSequence(seed).spawn(shards)
+    tasks = []
+    for numero, kwargs in enumerate(arguments):
+        part = f"part-{numero:05d}.{output_format}"
+        if write is write_fact_file:
+            kwargs = dict(kwargs, path=parts_dir / part)
+        else:
+            kwargs = dict(kwargs, fact_path=parts_dir / part, truth_path=data_dir / "verite_terrain" / part)
+        tasks.append((write, seed_sequences[numero], kwargs))
+    if workers <= 1:
+        written = [_run_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, shards)) as executor:
+            written = list(executor.map(_run_shard, tasks))
+    print(f"[OK] Généré {parts_dir.name}/ ({sum(written)} lignes en {shards} parts), profil {profil}")
+    return parts_dir
+
+
+def main(num_transactions=DEFAULT_TRANSACTIONS, num_filiales=len(FILIALES), num_devises=None, num_comptes=None,
+         start_date=START_DATE, end_date=END_DATE, output_format="csv", chunk_size=DEFAULT_CHUNK_SIZE,
+         seed=DEFAULT_SEED, data_dir=DATA_DIR, shards=1, workers=GENERATOR_WORKERS, profil="uniforme",
+         horizon=DEFAULT_HORIZON, devises_config=None):
+    """
+    Fonction principale
+    num_devises=None : DEFAULT_DEVISES devises de DEVISES, ou toutes celles de `devises_config`
+    """
     print("=" * 60)
     print("Génération des données sources pour le POC Crésus")
     print("=" * 60)
-    
+
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    catalogue = load_devises(devises_config)
+    if num_devises is None:
+        num_devises = DEFAULT_DEVISES if devises_config is None else len(catalogue)
+
     # Générer les dimensions
-    generate_dim_filiale()
-    generate_dim_devise()
-    generate_dim_scenario()
-    contreparties = generate_dim_contrepartie()
-    temps_records = generate_dim_temps()
-    
+    generate_dim_filiale(data_dir, num_filiales)
+    devises = generate_dim_devise(data_dir, catalogue, num_devises)
+    generate_dim_scenario(data_dir)
+    contreparties = generate_dim_contrepartie(data_dir)
+    generate_dim_temps(data_dir, start_date, end_date)
+
     # Générer DIM_COMPTE (nécessite les dimensions filiale et devise)
-    num_filiales = 6
-    num_devises = 4
-    comptes = generate_dim_compte(num_filiales, num_devises)
-    
+    comptes = generate_dim_compte(data_dir, num_filiales, num_devises, rng, num_comptes)
+
     # Générer les données externes
-    generate_taux_de_change()
-    
+    generate_taux_de_change(data_dir, devises, start_date, end_date, rng, chunk_size)
+
     # Générer la table de faits
-    generate_fact_flux_tresorerie(comptes, temps_records, len(contreparties))
-    
+    generate_fact_flux_tresorerie(data_dir, comptes, contreparties, devises, start_date,
+                                  end_date, rng, num_transactions, output_format, chunk_size, shards, seed,
+                                  workers, profil, horizon)
+
     print("=" * 60)
     print("[OK] Génération terminée avec succès!")
-    print(f"[OK] Fichiers générés dans : {DATA_DIR}")
+    print(f"[OK] Fichiers générés dans : {data_dir}")
     print("=" * 60)
 
 
 if __name__ == "__main__":
-    main()
-
+    parser = argparse.ArgumentParser(description="Génération des données sources du POC Crésus")
+    parser.add_argument("--transactions", type=int, default=DEFAULT_TRANSACTIONS,
+                        help="Nombre de transactions de la table de faits")
+    parser.add_argument("--filiales", type=int, default=len(FILIALES), help="Nombre de filiales")
+    parser.add_argument("--devises", type=int, default=None,
+                        help=f"Nombre de devises (défaut : {DEFAULT_DEVISES}, ou toutes celles de --devises-config)")
+    parser.add_argument("--devises-config", type=Path, default=None,
+                        help="Fichier JSON des devises (code_iso, libelle_devise, taux_eur, volatilite)")
+    parser.add_argument("--comptes", type=int, default=None,
+                        help="Nombre total de comptes (défaut : 3 à 5 par filiale et par devise)")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=START_DATE,
+                        help="Premier jour de la période (AAAA-MM-JJ)")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=END_DATE,
+                        help="Dernier jour de la période (AAAA-MM-JJ)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Format du fichier de faits")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Transactions tirées et écrites par bloc (mémoire bornée)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Graine du générateur aléatoire")
+    parser.add_argument("--output-dir", type=Path, default=DATA_DIR, help="Répertoire des fichiers générés")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Nombre de parts (intervalles de dates) générées en parallèle")
+    parser.add_argument("--workers", type=int, default=GENERATOR_WORKERS,
+                        help="Processus de la génération par parts (défaut : CRESUS_GENERATOR_WORKERS ou nb de CPU)")
+    parser.add_argument("--profil", choices=PROFILS, default="uniforme",
+                        help="uniforme : tirages indépendants ; realiste : séries par compte + vérité terrain")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON,
+                        help="Profil réaliste : jours de vérité terrain après la période")
+    args = parser.parse_args()
+    main(args.transactions, args.filiales, args.devises, args.comptes, args.start, args.end,
+         args.format, args.chunk_size, args.seed, args.output_dir, args.shards, args.workers,
+         args.profil, args.horizon, args.devises_config)
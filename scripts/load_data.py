@@ -1,235 +1,125 @@
 """
 Script simple pour charger les données CSV directement dans PostgreSQL
-Alternative au pipeline Airflow pour tests rapides
+Alternative au pipeline Airflow pour tests rapides (moteur : package cresus, commun avec le DAG)
 """
 
-import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_values
-import os
+import argparse
+import sys
+from datetime import datetime
 from pathlib import Path
-import re
-
-# Configuration
-DATA_DIR = Path("data/sources")
-DB_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "localhost"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-    "database": os.getenv("POSTGRES_DB", "cresus_db"),
-    "user": os.getenv("POSTGRES_USER", "postgres"),
-    "password": os.getenv("POSTGRES_PASSWORD", "postgres")
-}
-
-# Dictionnaire de mapping pays -> région
-PAYS_REGION_MAPPING = {
-    "France": "Europe",
-    "Allemagne": "Europe",
-    "Royaume-Uni": "Europe",
-    "Suisse": "Europe",
-    "Espagne": "Europe",
-    "Italie": "Europe",
-}
-
-# Dictionnaire de normalisation type_contrepartie
-TYPE_CONTREPARTIE_MAPPING = {
-    "client": "Client",
-    "fournisseur": "Fournisseur",
-    "banque": "Banque partenaire",
-    "institution": "Institution financière",
-}
-
-
-def clean_amount(amount):
-    """Nettoie le montant en supprimant les caractères non numériques"""
-    if pd.isna(amount):
-        return None
-    amount_str = str(amount)
-    cleaned = re.sub(r'[^\d\.\-]', '', amount_str)
-    try:
-        return float(cleaned) if cleaned else None
-    except:
-        return None
-
-
-def mask_account_number(numero):
-    """Masque partiellement un numéro de compte"""
-    if pd.isna(numero):
-        return numero
-    numero_str = str(numero).strip()
-    if len(numero_str) > 8:
-        masked = numero_str[:4] + " **** **** **** " + numero_str[-4:]
-    else:
-        masked = numero_str
-    return masked
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cresus.aggregates import refresh_aggregates  # noqa: E402
+from cresus.checkpoints import DEFAULT_BATCH_SIZE, clear_checkpoints, has_checkpoints  # noqa: E402
+from cresus.config import DATA_DIR  # noqa: E402
+from cresus.db import get_connection, release_connection  # noqa: E402
+from cresus.extract import extract_sources  # noqa: E402
+from cresus.fx_rates import FxRateTable  # noqa: E402
+from cresus.incremental import set_high_water_mark  # noqa: E402
+from cresus.load import FACT_SOURCE, load_dimensions, load_fact_frame, reset_tables  # noqa: E402
+from cresus.metrics import measure, publish_run, start_run  # noqa: E402
+from cresus.streaming import DEFAULT_CHUNK_SIZE, stream_fact_file  # noqa: E402
+from cresus.transformations import prepare_fact_flux_tresorerie, transform_dimensions  # noqa: E402
 
-def normalize_type_contrepartie(type_str):
-    """Normalise le type de contrepartie"""
-    if pd.isna(type_str):
-        return type_str
-    type_lower = str(type_str).lower().strip()
-    for key, value in TYPE_CONTREPARTIE_MAPPING.items():
-        if key in type_lower:
-            return value
-    return type_str
+# Identifiant des points de reprise du script (une seule exécution interrompue à la fois)
+CLI_LOAD_ID = "scripts/load_data.py"
 
 
-def main():
+def main(chunk_size=None, data_dir=DATA_DIR, batch_size=DEFAULT_BATCH_SIZE, resume=False):
     print("=" * 60)
     print("Chargement des donnees CSV dans PostgreSQL")
     print("=" * 60)
-    
-    # Connexion à PostgreSQL
+    # Métriques par étape et par table (PIPELINE_METRICS et CRESUS_METRICS_DIR)
+    start_run(f"load_data_{datetime.now():%Y%m%dT%H%M%S}")
+
+    # Connexion à PostgreSQL (pool cresus/db.py : la même connexion sert au chargement et à la vérification)
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_connection()
         cursor = conn.cursor()
         print("Connexion a PostgreSQL etablie")
     except Exception as e:
         print(f"Erreur de connexion: {e}")
         return
-    
-    # Vider les tables existantes (pour rechargement propre)
-    print("\nNettoyage des tables existantes...")
-    cursor.execute("TRUNCATE TABLE FACT_FLUX_TRESORERIE CASCADE;")
-    cursor.execute("TRUNCATE TABLE DIM_COMPTE CASCADE;")
-    cursor.execute("TRUNCATE TABLE DIM_TEMPS CASCADE;")
-    cursor.execute("TRUNCATE TABLE DIM_SCENARIO CASCADE;")
-    cursor.execute("TRUNCATE TABLE DIM_DEVISE CASCADE;")
-    cursor.execute("TRUNCATE TABLE DIM_FILIALE CASCADE;")
-    cursor.execute("TRUNCATE TABLE DIM_CONTREPARTIE CASCADE;")
-    print("Tables nettoyees")
-    
-    # Charger les dimensions dans l'ordre des dépendances
-    
-    # 1. DIM_DEVISE
-    print("\nChargement DIM_DEVISE...")
-    df_devise = pd.read_csv(DATA_DIR / "dim_devise.csv")
-    execute_values(
-        cursor,
-        "INSERT INTO DIM_DEVISE (id_devise, code_iso, libelle_devise) VALUES %s",
-        [tuple(int(x) if isinstance(x, (int, float)) and not pd.isna(x) else x for x in row) for row in df_devise[['id_devise', 'code_iso', 'libelle_devise']].values]
-    )
-    print(f"  {len(df_devise)} lignes inserees")
-    
-    # 2. DIM_FILIALE (avec ajout automatique de région)
-    print("\nChargement DIM_FILIALE...")
-    df_filiale = pd.read_csv(DATA_DIR / "dim_filiale.csv")
-    df_filiale['region'] = df_filiale['pays'].map(PAYS_REGION_MAPPING).fillna(df_filiale['region'])
-    execute_values(
-        cursor,
-        "INSERT INTO DIM_FILIALE (id_filiale, nom_filiale, pays, region) VALUES %s",
-        [tuple(int(x) if isinstance(x, (int, float)) and not pd.isna(x) else x for x in row) for row in df_filiale[['id_filiale', 'nom_filiale', 'pays', 'region']].values]
-    )
-    print(f"  {len(df_filiale)} lignes inserees")
-    
-    # 3. DIM_SCENARIO
-    print("\nChargement DIM_SCENARIO...")
-    df_scenario = pd.read_csv(DATA_DIR / "dim_scenario.csv")
-    execute_values(
-        cursor,
-        "INSERT INTO DIM_SCENARIO (id_scenario, nom_scenario, description) VALUES %s",
-        [tuple(int(x) if isinstance(x, (int, float)) and not pd.isna(x) else x for x in row) for row in df_scenario[['id_scenario', 'nom_scenario', 'description']].values]
-    )
-    print(f"  {len(df_scenario)} lignes inserees")
-    
-    # 4. DIM_CONTREPARTIE (avec normalisation)
-    print("\nChargement DIM_CONTREPARTIE...")
-    df_contrepartie = pd.read_csv(DATA_DIR / "dim_contrepartie.csv")
-    df_contrepartie['type_contrepartie'] = df_contrepartie['type_contrepartie'].apply(normalize_type_contrepartie)
-    execute_values(
-        cursor,
-        "INSERT INTO DIM_CONTREPARTIE (id_contrepartie, nom_contrepartie, type_contrepartie) VALUES %s",
-        [tuple(int(x) if isinstance(x, (int, float)) and not pd.isna(x) else x for x in row) for row in df_contrepartie[['id_contrepartie', 'nom_contrepartie', 'type_contrepartie']].values]
-    )
-    print(f"  {len(df_contrepartie)} lignes inserees")
-    
-    # 5. DIM_TEMPS
-    print("\nChargement DIM_TEMPS...")
-    df_temps = pd.read_csv(DATA_DIR / "dim_temps.csv")
-    # Convertir explicitement en types Python natifs
-    df_temps = df_temps.astype({'id_temps': 'int64', 'jour': 'int64', 'mois': 'int64', 'annee': 'int64'})
-    rows = []
-    for _, row in df_temps.iterrows():
-        rows.append((int(row['id_temps']), int(row['jour']), int(row['mois']), int(row['annee'])))
-    execute_values(
-        cursor,
-        "INSERT INTO DIM_TEMPS (id_temps, jour, mois, annee) VALUES %s",
-        rows
-    )
-    print(f"  {len(df_temps)} lignes inserees")
-    
-    # 6. DIM_COMPTE (avec masquage des numéros)
-    print("\nChargement DIM_COMPTE...")
-    df_compte = pd.read_csv(DATA_DIR / "dim_compte.csv")
-    df_compte['numero_compte'] = df_compte['numero_compte'].apply(mask_account_number)
-    execute_values(
-        cursor,
-        "INSERT INTO DIM_COMPTE (id_compte, numero_compte, type_compte, id_devise, id_filiale) VALUES %s",
-        [tuple(int(x) if isinstance(x, (int, float)) and not pd.isna(x) else x for x in row) for row in df_compte[['id_compte', 'numero_compte', 'type_compte', 'id_devise', 'id_filiale']].values]
-    )
-    print(f"  {len(df_compte)} lignes inserees")
-    
-    # 7. FACT_FLUX_TRESORERIE (avec transformations)
+
+    # Reprise d'un chargement par lots interrompu : tables conservées, lots déjà validés sautés
+    id_chargement = CLI_LOAD_ID if batch_size else None
+    if resume and batch_size and has_checkpoints(cursor, CLI_LOAD_ID):
+        print(f"\nReprise du chargement interrompu (lots de {batch_size} lignes)")
+    else:
+        # Vider les tables existantes (pour rechargement propre)
+        print("\nNettoyage des tables existantes...")
+        reset_tables(cursor)
+        if id_chargement:
+            clear_checkpoints(cursor, id_chargement)
+        print("Tables nettoyees")
+
+    # Lecture des sources (faits lus par blocs au chargement en mode flux)
+    with measure("extract"):
+        dataframes, fact_source = extract_sources(data_dir, read_facts=not chunk_size)
+    dataframes = transform_dimensions(dataframes)
+
+    # Dimensions dans l'ordre des dépendances (région, masquage des numéros, normalisation des contreparties)
+    for table, nb_lignes in load_dimensions(cursor, dataframes, upsert=False, id_chargement=id_chargement):
+        print(f"\nChargement {table}...")
+        print(f"  {nb_lignes} lignes inserees")
+
+    # FACT_FLUX_TRESORERIE (avec transformations et conversion en EUR)
     print("\nChargement FACT_FLUX_TRESORERIE...")
-    df_fact = pd.read_csv(DATA_DIR / "fact_flux_tresorerie.csv")
-    
-    # Transformations
-    df_fact['date_operation'] = pd.to_datetime(df_fact['date_operation'], errors='coerce').dt.date
-    df_fact['montant_transaction'] = df_fact['montant_transaction'].apply(clean_amount)
-    df_fact['type_operation'] = df_fact['type_operation'].str.lower().str.strip()
-    df_fact['montant_consolide_eur'] = df_fact['montant_consolide_eur'].fillna(df_fact['montant_transaction'])
-    
-    # Nettoyer les valeurs NaN
-    df_fact_clean = df_fact.dropna(subset=['date_operation', 'montant_transaction', 'id_compte', 'id_devise', 'id_scenario', 'id_temps', 'id_contrepartie'])
-    
-    # Convertir les valeurs numpy en types Python natifs
-    def convert_row(row):
-        result = []
-        for val in row:
-            if pd.isna(val):
-                result.append(None)
-            elif isinstance(val, (int, float)) and not isinstance(val, bool):
-                if isinstance(val, float):
-                    result.append(float(val))
-                else:
-                    result.append(int(val))
-            else:
-                result.append(val)
-        return tuple(result)
-    
-    execute_values(
-        cursor,
-        """INSERT INTO FACT_FLUX_TRESORERIE 
-        (date_operation, montant_transaction, montant_consolide_eur, type_operation, statut,
-         id_compte, id_devise, id_scenario, id_temps, id_contrepartie)
-        VALUES %s""",
-        [convert_row(row) for row in df_fact_clean[[
-            'date_operation', 'montant_transaction', 'montant_consolide_eur',
-            'type_operation', 'statut', 'id_compte', 'id_devise',
-            'id_scenario', 'id_temps', 'id_contrepartie'
-        ]].values]
-    )
-    print(f"  {len(df_fact_clean)} lignes inserees")
-    
-    # Commit
+    fx_table = FxRateTable.from_dataframe(dataframes["taux_de_change"])
+    df_compte, df_devise = dataframes["dim_compte"], dataframes["dim_devise"]
+
+    if chunk_size:
+        # Mode flux : chaque bloc est transformé puis envoyé par COPY avant la lecture du suivant
+        print(f"  Lecture par blocs de {chunk_size} lignes")
+        nb_lues, nb_chargees, derniere_date = stream_fact_file(
+            cursor, fact_source, chunk_size,
+            df_compte, df_devise, fx_table, upsert=False,
+            id_chargement=id_chargement, batch_size=batch_size,
+        )
+        set_high_water_mark(cursor, FACT_SOURCE, derniere_date, nb_lues)
+    else:
+        # Clé métier et empreinte : un chargement incrémental ultérieur (DAG) reconnaîtra ces flux
+        df_fact = prepare_fact_flux_tresorerie(dataframes["fact_flux_tresorerie"], df_compte, df_devise, fx_table)
+        # COPY direct dans chaque partition mensuelle (créée si besoin)
+        nb_chargees = load_fact_frame(cursor, df_fact, upsert=False,
+                                      id_chargement=id_chargement, batch_size=batch_size)
+    print(f"  {nb_chargees} lignes inserees")
+
+    # Agrégats des tableaux de bord (reconstruction complète après un rechargement)
+    print("\nCalcul des agregats...")
+    with measure("aggregates"):
+        nb_jours, nb_mois = refresh_aggregates(cursor, full=True)
+    print(f"  {nb_jours} jours, {nb_mois} mois agreges")
+
+    # Commit (avec le dernier lot : les points de reprise du chargement terminé sont supprimés)
+    if id_chargement:
+        clear_checkpoints(cursor, id_chargement)
     conn.commit()
-    cursor.close()
-    conn.close()
-    
+
     print("\n" + "=" * 60)
     print("Chargement termine avec succes!")
     print("=" * 60)
-    
-    # Vérification
-    conn = psycopg2.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+
+    # Vérification (sans nouvelle connexion)
     cursor.execute("SELECT COUNT(*) FROM FACT_FLUX_TRESORERIE;")
     count = cursor.fetchone()[0]
     print(f"\nNombre total de transactions dans FACT_FLUX_TRESORERIE: {count}")
     cursor.close()
-    conn.close()
+    publish_run(conn)
+    release_connection(conn)
 
 
 if __name__ == "__main__":
-    main()
-
+    parser = argparse.ArgumentParser(description="Chargement des fichiers CSV dans PostgreSQL")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE or None,
+                        help="Lire fact_flux_tresorerie.csv par blocs de N lignes (mémoire bornée)")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR,
+                        help="Répertoire des fichiers sources (défaut : CRESUS_DATA_DIR ou data/sources)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE or None,
+                        help="Valider le chargement par lots de N lignes de faits, avec points de reprise")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reprendre un chargement par lots interrompu après le dernier lot validé")
+    args = parser.parse_args()
+    if args.resume and not args.batch_size:
+        parser.error("--resume nécessite --batch-size (ou CRESUS_LOAD_BATCH_SIZE)")
+    main(chunk_size=args.chunk_size, data_dir=args.data_dir, batch_size=args.batch_size, resume=args.resume)
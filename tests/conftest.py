@@ -0,0 +1,42 @@
+"""
+Fixtures communes des tests du moteur cresus
+Les tests marqués par la fixture `db_cursor` utilisent PostgreSQL (variables POSTGRES_*) dans un schéma
+dédié, créé à partir de database/create_tables.sql puis supprimé ; ils sont ignorés sans serveur
+"""
+
+import sys
+from pathlib import Path
+
+import psycopg2
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+from cresus.db import connection_parameters  # noqa: E402
+
+TEST_SCHEMA = "cresus_tests"
+CREATE_TABLES_SQL = ROOT_DIR / "database" / "create_tables.sql"
+
+
+@pytest.fixture
+def db_cursor():
+    """Curseur sur un schéma vierge (tables de create_tables.sql), dans une transaction annulée à la fin"""
+    try:
+        conn = psycopg2.connect(**connection_parameters())
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL indisponible : {e}")
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {TEST_SCHEMA}")
+    # Schéma dédié seul dans le search_path : les DROP TABLE de create_tables.sql ne touchent pas public
+    cursor.execute(f"SET search_path TO {TEST_SCHEMA}")
+    cursor.execute(CREATE_TABLES_SQL.read_text(encoding="utf-8"))
+    conn.autocommit = False
+    try:
+        yield cursor
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        cursor.execute(f"DROP SCHEMA {TEST_SCHEMA} CASCADE")
+        conn.close()
@@ -0,0 +1,44 @@
+"""Rafraîchissement incrémental des agrégats (cresus/aggregates.py)"""
+
+import pandas as pd
+
+from cresus.aggregates import refresh_aggregates
+from cresus.incremental import upsert_facts
+from cresus.load import load_dimensions
+from cresus.transformations import prepare_fact_flux_tresorerie
+from test_incremental import _insert_dimensions, raw_facts
+
+# Totaux mensuels par filiale recalculés depuis la jointure en étoile
+_TOTAUX_ETOILE = """
+    SELECT c.id_filiale, SUM(f.montant_consolide_eur)
+    FROM FACT_FLUX_TRESORERIE f JOIN DIM_COMPTE c ON c.id_compte = f.id_compte
+    GROUP BY c.id_filiale ORDER BY c.id_filiale
+"""
+_TOTAUX_AGREGAT = """
+    SELECT id_filiale, SUM(montant_consolide_eur) FROM AGG_FLUX_MENSUEL
+    GROUP BY id_filiale ORDER BY id_filiale
+"""
+
+
+def test_account_moved_to_another_filiale_refreshes_monthly_totals(db_cursor):
+    _insert_dimensions(db_cursor)
+    db_cursor.execute("INSERT INTO DIM_FILIALE (id_filiale, nom_filiale, pays, region) "
+                      "VALUES (2, 'ZF Banque Allemagne', 'Allemagne', 'Europe')")
+    upsert_facts(db_cursor, prepare_fact_flux_tresorerie(raw_facts()))
+    refresh_aggregates(db_cursor, full=True)
+
+    # Même compte, rattaché à la filiale 2 : aucun flux modifié
+    dim_compte = pd.DataFrame({"id_compte": [1], "numero_compte": ["FR76 **** **** **** 0001"],
+                               "type_compte": ["Courant"], "id_devise": [1], "id_filiale": [2]})
+    load_dimensions(db_cursor, {"dim_compte": dim_compte}, upsert=True)
+    assert refresh_aggregates(db_cursor) == (2, 1)
+
+    db_cursor.execute(_TOTAUX_ETOILE)
+    attendu = db_cursor.fetchall()
+    db_cursor.execute(_TOTAUX_AGREGAT)
+    assert db_cursor.fetchall() == attendu
+    assert [filiale for filiale, _ in attendu] == [2]
+
+    # Rechargement sans changement : rien à recalculer
+    load_dimensions(db_cursor, {"dim_compte": dim_compte}, upsert=True)
+    assert refresh_aggregates(db_cursor) == (0, 0)
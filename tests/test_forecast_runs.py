@@ -0,0 +1,38 @@
+"""Générations de prévisions et purge (cresus/forecast_runs.py)"""
+
+from cresus.forecast_runs import publish_forecast_run, purge_forecast_runs, start_forecast_run
+
+
+def _runs(cursor):
+    cursor.execute("SELECT id_run FROM FORECAST_RUN ORDER BY id_run")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def test_purge_keeps_runs_in_progress(db_cursor):
+    conn = db_cursor.connection
+    publies = []
+    for nb in range(4):
+        id_run = start_forecast_run(conn)
+        publish_forecast_run(conn, id_run, nb)
+        publies.append(id_run)
+    # Exécution concurrente démarrée, pas encore publiée
+    en_cours = start_forecast_run(conn)
+
+    assert purge_forecast_runs(conn, keep_runs=2) == publies[:2]
+    assert _runs(db_cursor) == publies[2:] + [en_cours]
+    db_cursor.execute("SELECT id_run FROM FORECAST_RUN WHERE est_courante")
+    assert db_cursor.fetchone()[0] == publies[-1]
+
+
+def test_purge_drops_abandoned_runs(db_cursor):
+    conn = db_cursor.connection
+    abandonnee = start_forecast_run(conn)
+    db_cursor.execute("UPDATE FORECAST_RUN SET genere_le = NOW() - INTERVAL '2 days' WHERE id_run = %s",
+                      (abandonnee,))
+    courante = start_forecast_run(conn)
+    publish_forecast_run(conn, courante, 10)
+
+    assert purge_forecast_runs(conn, keep_runs=1, stale_hours=24) == [abandonnee]
+    db_cursor.execute("SELECT to_regclass(%s)", (f"fact_prevision_run_{abandonnee}",))
+    assert db_cursor.fetchone()[0] is None
+    assert _runs(db_cursor) == [courante]
@@ -0,0 +1,39 @@
+"""Table des taux de change (cresus/fx_rates.py)"""
+
+import numpy as np
+import pandas as pd
+
+from cresus.fx_rates import FxRateTable
+
+
+def rate_table():
+    taux = pd.DataFrame({
+        "date": ["2024-01-02", "2024-01-03", "2024-01-05"],
+        "code_iso_source": ["USD", "USD", "USD"],
+        "code_iso_cible": ["EUR", "EUR", "EUR"],
+        "taux": [0.91, 0.92, 0.90],
+    })
+    return FxRateTable.from_dataframe(taux, currencies=["EUR", "USD", "GBP"])
+
+
+def test_last_known_rate_and_inverse():
+    table = rate_table()
+    assert table.rate("2024-01-04", "USD", "EUR") == 0.92
+    assert table.rate("2024-02-01", "USD", "EUR") == 0.90
+    assert np.isclose(table.rate("2024-01-02", "EUR", "USD"), 1 / 0.91)
+
+
+def test_before_first_quote_or_unknown_currency_has_no_rate():
+    table = rate_table()
+    assert np.isnan(table.rate("2023-12-31", "USD", "EUR"))
+    assert np.isnan(table.rate("2024-01-03", "GBP", "EUR"))
+    assert np.isnan(table.rate("2024-01-03", "JPY", "EUR"))
+
+
+def test_same_currency_rate_is_one_whatever_the_date():
+    table = rate_table()
+    dates = ["2023-06-30", "2024-01-03", "2030-01-01", None]
+    assert table.rates_for(dates, "EUR", "EUR").tolist() == [1.0] * 4
+    assert table.rates_for(dates, pd.Categorical(["GBP"] * 4), "GBP").tolist() == [1.0] * 4
+    assert table.convert([150.0], ["2023-06-30"], "EUR").tolist() == [150.0]
+    assert np.isnan(table.rate("2023-06-30", "JPY", "JPY"))
@@ -0,0 +1,25 @@
+"""Catalogue des devises du générateur (etl/generate_data.py)"""
+
+import json
+import sys
+
+import pytest
+
+from conftest import ROOT_DIR
+
+sys.path.insert(0, str(ROOT_DIR / "etl"))
+import generate_data  # noqa: E402
+
+
+def test_devises_config_without_eur_is_rejected(tmp_path):
+    config = tmp_path / "devises.json"
+    config.write_text(json.dumps([{"code_iso": "USD", "libelle_devise": "Dollar US", "taux_eur": 1.08}]))
+    with pytest.raises(ValueError, match="EUR"):
+        generate_data.load_devises(config)
+
+
+def test_eur_must_be_among_selected_devises(tmp_path):
+    devises = [{"code_iso": "USD", "libelle_devise": "Dollar US"}, {"code_iso": "EUR", "libelle_devise": "Euro"}]
+    with pytest.raises(ValueError, match="EUR"):
+        generate_data.generate_dim_devise(tmp_path, devises, 1)
+    assert len(generate_data.generate_dim_devise(tmp_path, devises, 2)) == 2
@@ -0,0 +1,64 @@
+"""Clé métier et upsert incrémental de FACT_FLUX_TRESORERIE (cresus/incremental.py)"""
+
+import numpy as np
+import pandas as pd
+
+from cresus.incremental import upsert_facts
+from cresus.transformations import prepare_fact_flux_tresorerie
+
+
+def raw_facts():
+    """Flux tels que lus dans fact_flux_tresorerie.csv (dont deux flux identiques le même jour)"""
+    return pd.DataFrame({
+        "date_operation": ["2024-01-02", "2024-01-02", "2024-01-02", "2024-01-03"],
+        "montant_transaction": ["1500.00", "-320.50", "-320.50", "980.10"],
+        "montant_consolide_eur": [np.nan] * 4,
+        "type_operation": ["Virement reçu", "Frais bancaires", "Frais bancaires", "Dépôt"],
+        "statut": ["Réalisé"] * 4,
+        "id_compte": [1, 1, 1, 1],
+        "id_devise": [1, 1, 1, 1],
+        "id_scenario": [1, 1, 1, 1],
+        "id_temps": [2, 2, 2, 3],
+        "id_contrepartie": [1, 2, 2, 1],
+    })
+
+
+def corrected_facts():
+    """Même fichier, montant du premier flux corrigé à la source"""
+    df = raw_facts()
+    df.loc[0, "montant_transaction"] = "1550.00"
+    return df
+
+
+def test_corrected_amount_keeps_business_key():
+    avant = prepare_fact_flux_tresorerie(raw_facts())
+    apres = prepare_fact_flux_tresorerie(corrected_facts())
+
+    assert avant["cle_metier"].is_unique
+    assert (avant["cle_metier"].to_numpy() == apres["cle_metier"].to_numpy()).all()
+    modifies = avant["hash_contenu"].to_numpy() != apres["hash_contenu"].to_numpy()
+    assert modifies.tolist() == [True, False, False, False]
+
+
+def _insert_dimensions(cursor):
+    cursor.execute("INSERT INTO DIM_DEVISE (id_devise, code_iso, libelle_devise) VALUES (1, 'EUR', 'Euro')")
+    cursor.execute("INSERT INTO DIM_FILIALE (id_filiale, nom_filiale, pays, region) "
+                   "VALUES (1, 'ZF Banque France', 'France', 'Europe')")
+    cursor.execute("INSERT INTO DIM_SCENARIO (id_scenario, nom_scenario) VALUES (1, 'Réalisé')")
+    cursor.execute("INSERT INTO DIM_CONTREPARTIE (id_contrepartie, nom_contrepartie, type_contrepartie) "
+                   "VALUES (1, 'Client A', 'Client'), (2, 'Banque B', 'Banque partenaire')")
+    cursor.execute("INSERT INTO DIM_TEMPS (id_temps, jour, mois, annee) VALUES (2, 2, 1, 2024), (3, 3, 1, 2024)")
+    cursor.execute("INSERT INTO DIM_COMPTE (id_compte, numero_compte, type_compte, id_devise, id_filiale) "
+                   "VALUES (1, 'FR76 **** **** **** 0001', 'Courant', 1, 1)")
+
+
+def test_reload_with_corrected_amount_updates_row(db_cursor):
+    _insert_dimensions(db_cursor)
+    assert upsert_facts(db_cursor, prepare_fact_flux_tresorerie(raw_facts())) == 4
+
+    # Rechargement du fichier corrigé : une seule ligne réécrite, aucun flux ajouté
+    assert upsert_facts(db_cursor, prepare_fact_flux_tresorerie(corrected_facts())) == 1
+    db_cursor.execute("SELECT COUNT(*), SUM(montant_transaction) FROM FACT_FLUX_TRESORERIE")
+    nb_lignes, total = db_cursor.fetchone()
+    assert nb_lignes == 4
+    assert float(total) == 1550.00 - 320.50 - 320.50 + 980.10
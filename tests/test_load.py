@@ -0,0 +1,20 @@
+"""Chargement de FACT_FLUX_TRESORERIE (cresus/load.py)"""
+
+import numpy as np
+import pytest
+
+from cresus.load import load_facts
+from cresus.transformations import prepare_fact_flux_tresorerie
+from test_incremental import _insert_dimensions, raw_facts
+
+
+@pytest.mark.parametrize("upsert", [True, False])
+def test_missing_consolidated_amount_loaded_as_null(db_cursor, upsert):
+    _insert_dimensions(db_cursor)
+    df = prepare_fact_flux_tresorerie(raw_facts())
+    # Flux sans taux de change applicable
+    df.loc[df.index[0], "montant_consolide_eur"] = np.nan
+
+    assert load_facts(db_cursor, df, upsert=upsert) == 4
+    db_cursor.execute("SELECT COUNT(*) FROM FACT_FLUX_TRESORERIE WHERE montant_consolide_eur IS NULL")
+    assert db_cursor.fetchone()[0] == 1